@@ -0,0 +1,256 @@
+import hashlib
+import json
+from flask import Blueprint, Response, jsonify, request
+from figure_cache import chart_registry, figure_key, get_figure_json
+from palette_catalog import (get_palette_catalog, palette_metadata, catalog_version, get_palette,
+                             PALETTE_KINDS, COLOR_FORMATS, MAX_COLORS)
+from palette_export import export_files, stream_zip, EXPORT_FORMATS, EXPORT_VERSION
+from palette_metrics import catalog_metrics, CVD_MATRICES
+from palette_cvd import simulated_figure_json, NORMAL_VISION
+from palette_similarity import similar_palettes, palettes_near_color, parse_color, SIMILAR_LIMIT, NEAR_COLOR_RADIUS
+from palette_assignment import assign_colors, MAX_CATEGORIES, BEAM_WIDTH
+
+
+# Browsers keep a response this long before checking its ETag; shared caches (the reverse proxy) longer
+API_MAX_AGE = 3600
+API_SHARED_MAX_AGE = 86400
+
+# Largest number of palettes in one batch request
+MAX_BATCH = 500
+
+# Largest number of palettes a similarity query returns, and the largest radius of a near color
+MAX_SIMILAR = 100
+MAX_RADIUS = 50
+
+# Widest beam of a color assignment
+MAX_BEAM = 16
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+
+# Helpers ---------------------------------------------------------
+def _error(message, status):
+    return jsonify(error=message), status
+
+def _cached(etag, content=None, mimetype='application/json'):
+    # content is a string, an iterable of strings (streamed) or a function that returns one,
+    # so a revalidation is answered without building the response
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(content() if callable(content) else content, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = API_MAX_AGE
+    response.cache_control.s_maxage = API_SHARED_MAX_AGE
+    return response
+
+def _color_args(args):
+    # Returns (format, n, error)
+    color_format = args.get('format', 'hex')
+    if color_format not in COLOR_FORMATS:
+        return None, None, _error(f'format must be one of {COLOR_FORMATS}', 400)
+    n = args.get('n')
+    if n is not None:
+        try:
+            n = int(n)
+        except (TypeError, ValueError):
+            return None, None, _error('n must be an integer', 400)
+        if not 1 <= n <= MAX_COLORS:
+            return None, None, _error(f'n must be between 1 and {MAX_COLORS}', 400)
+    return color_format, n, None
+
+def _number_arg(args, name, default, low, high, kind=int):
+    # Returns (value, error)
+    value = args.get(name, default)
+    try:
+        value = kind(value)
+    except (TypeError, ValueError):
+        return None, _error(f'{name} must be a number', 400)
+    if not low <= value <= high:
+        return None, _error(f'{name} must be between {low} and {high}', 400)
+    return value, None
+
+def _etag(*content):
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+# Figure of a chart for a palette and a template -------------------
+@api.get('/figure/<page>/<chart>')
+def figure(page, chart):
+    entry = chart_registry.get(page, {}).get(chart)
+    if entry is None:
+        return _error(f'Unknown chart {page}/{chart}', 404)
+
+    # Only registered palettes and templates are built, so the cache can not be flooded
+    palette = request.args.get('palette') if entry['palettes'] != (None,) else None
+    template = request.args.get('template') if entry['templates'] != (None,) else None
+    if palette not in entry['palettes'] and palette not in entry['on_demand']:
+        return _error(f'Unknown palette {palette!r} for {page}/{chart}', 404)
+    if template not in entry['templates']:
+        return _error(f'Unknown template {template!r} for {page}/{chart}', 404)
+
+    # cvd shows the figure as seen with a color vision deficiency, simulated from the cached figure
+    deficiency = request.args.get('cvd', NORMAL_VISION)
+    if deficiency != NORMAL_VISION and deficiency not in CVD_MATRICES:
+        return _error(f'cvd must be among {(NORMAL_VISION, *CVD_MATRICES)}', 400)
+
+    # The figure key hashes everything the figure is built from, so it is a strong ETag
+    key = figure_key(page, chart, palette, template)
+    if deficiency != NORMAL_VISION:
+        return _cached(_etag(key, deficiency),
+                       lambda: simulated_figure_json(key, page, chart, palette, template, deficiency))
+    return _cached(key, lambda: get_figure_json(page, chart, palette, template, key))
+
+# Metadata of every palette ------------------------------------------
+@api.get('/palettes')
+def palettes():
+    return _cached(catalog_version(), lambda: json.dumps(palette_metadata()))
+
+# Perceptual metrics of every palette, keyed by id --------------------
+@api.get('/palettes/metrics')
+def palettes_metrics():
+    return _cached(_etag(catalog_version(), 'metrics'), lambda: json.dumps(catalog_metrics()))
+
+# One palette as hex, rgb or float colors, optionally resampled to n colors
+@api.get('/palettes/<kind>/<name>')
+def palette(kind, name):
+    palette_id = f'{kind}/{name}'
+    if palette_id not in get_palette_catalog():
+        return _error(f'Unknown palette {palette_id}', 404)
+    color_format, n, error = _color_args(request.args)
+    if error:
+        return error
+    return _cached(_etag(catalog_version(), palette_id, color_format, n),
+                   lambda: json.dumps(get_palette(palette_id, color_format, n)))
+
+# Palettes that look like a palette, across all types ----------------
+@api.get('/palettes/<kind>/<name>/similar')
+def palette_similar(kind, name):
+    # GET /api/palettes/sequential/Viridis/similar?k=10; '<name>_r' looks for the reversed palette
+    palette_id = f'{kind}/{name}'
+    if palette_id.removesuffix('_r') not in get_palette_catalog():
+        return _error(f'Unknown palette {palette_id}', 404)
+    k, error = _number_arg(request.args, 'k', SIMILAR_LIMIT, 1, MAX_SIMILAR)
+    if error:
+        return error
+    return _cached(_etag(catalog_version(), 'similar', palette_id, k),
+                   lambda: json.dumps(similar_palettes(palette_id, k)))
+
+# Colors of a palette assigned to n categories -----------------------
+@api.get('/palettes/<kind>/<name>/assign')
+def palette_assign(kind, name):
+    # GET /api/palettes/qualitative/Bold/assign?n=12&background=white&beam=4; the colors farthest
+    # apart come first, with lighter and darker variants when n is larger than the palette
+    palette_id = f'{kind}/{name}'
+    if palette_id not in get_palette_catalog():
+        return _error(f'Unknown palette {palette_id}', 404)
+    n, error = _number_arg(request.args, 'n', None, 1, MAX_CATEGORIES)
+    if error:
+        return error
+    beam_width, error = _number_arg(request.args, 'beam', BEAM_WIDTH, 1, MAX_BEAM)
+    if error:
+        return error
+    background = request.args.get('background')
+    if background is not None:
+        try:
+            parse_color(background)
+        except ValueError:
+            return _error("background must be a hex color, 'rgb(255, 255, 255)' or 'white'", 400)
+
+    def content():
+        colors = tuple(get_palette(palette_id)['colors'])
+        assigned, min_delta_e, background_delta_e = assign_colors(colors, n, background, beam_width)
+        return json.dumps({'id': palette_id, 'n': n, 'background': background, 'colors': assigned,
+                           'min_delta_e': min_delta_e, 'background_delta_e': background_delta_e})
+    return _cached(_etag(catalog_version(), 'assign', palette_id, n, background, beam_width), content)
+
+# Palettes with a color near a color ---------------------------------
+@api.get('/palettes/near-color')
+def palettes_near():
+    # GET /api/palettes/near-color?color=ff0000&radius=5&kind=qualitative&limit=50;
+    # the radius is a ΔE in OKLab scaled by 100
+    color, kind = request.args.get('color', ''), request.args.get('kind')
+    try:
+        parse_color(color)
+    except ValueError:
+        return _error("color must be a hex color ('ff0000' or '#ff0000') or 'rgb(255, 0, 0)'", 400)
+    if kind is not None and kind not in PALETTE_KINDS:
+        return _error(f'kind must be among {PALETTE_KINDS}', 400)
+    radius, error = _number_arg(request.args, 'radius', NEAR_COLOR_RADIUS, 0, MAX_RADIUS, float)
+    if error:
+        return error
+    limit, error = _number_arg(request.args, 'limit', SIMILAR_LIMIT, 1, MAX_SIMILAR)
+    if error:
+        return error
+
+    def content():
+        matches, n_matches = palettes_near_color(color, radius, kind, limit)
+        return json.dumps({'color': color, 'radius': radius, 'n_matches': n_matches, 'palettes': matches})
+    return _cached(_etag(catalog_version(), 'near-color', color, radius, kind, limit), content)
+
+# Many palettes in one request, streamed as JSON lines ---------------
+@api.route('/palettes/batch', methods=['GET', 'POST'])
+def palette_batch():
+    # GET /api/palettes/batch?ids=sequential/Viridis,diverging/RdBu&format=rgb&n=8 can be cached;
+    # POST takes the same fields as a JSON body for long lists
+    if request.method == 'POST':
+        args = request.get_json(silent=True) or {}
+        ids = args.get('ids', [])
+    else:
+        args = request.args
+        ids = [palette_id for value in args.getlist('ids') for palette_id in value.split(',') if palette_id]
+    if not isinstance(ids, list) or not ids or not all(isinstance(palette_id, str) for palette_id in ids):
+        return _error('ids must list at least one palette', 400)
+    if len(ids) > MAX_BATCH:
+        return _error(f'At most {MAX_BATCH} palettes per request', 400)
+    color_format, n, error = _color_args(args)
+    if error:
+        return error
+
+    catalog = get_palette_catalog()
+    def lines():
+        # Unknown palettes get an error line, so the other palettes still arrive
+        for palette_id in ids:
+            if palette_id in catalog:
+                yield json.dumps(get_palette(palette_id, color_format, n)) + '\n'
+            else:
+                yield json.dumps({'id': palette_id, 'error': 'Unknown palette'}) + '\n'
+
+    return _cached(_etag(catalog_version(), ids, color_format, n), lines(), mimetype='application/x-ndjson')
+
+# Any selection of palettes as a ZIP of CSS, JSON, matplotlib and GIMP files
+@api.route('/palettes/export.zip', methods=['GET', 'POST'])
+def palette_export():
+    # GET /api/palettes/export.zip?kinds=sequential&formats=css,gpl&n=16; ids selects single palettes,
+    # no selection exports every palette. POST takes the same fields as a JSON body
+    if request.method == 'POST':
+        args = request.get_json(silent=True) or {}
+        ids, kinds, formats = args.get('ids', []), args.get('kinds', []), args.get('formats', [])
+    else:
+        args = request.args
+        ids, kinds, formats = ([item for value in args.getlist(field) for item in value.split(',') if item]
+                               for field in ('ids', 'kinds', 'formats'))
+    if not all(isinstance(value, list) and all(isinstance(item, str) for item in value) for value in (ids, kinds, formats)):
+        return _error('ids, kinds and formats must be lists of strings', 400)
+
+    catalog = get_palette_catalog()
+    unknown = [palette_id for palette_id in ids if palette_id not in catalog]
+    if unknown:
+        return _error(f'Unknown palettes {unknown}', 404)
+    if not set(kinds) <= set(PALETTE_KINDS):
+        return _error(f'kinds must be among {PALETTE_KINDS}', 400)
+    if not set(formats) <= set(EXPORT_FORMATS):
+        return _error(f'formats must be among {tuple(EXPORT_FORMATS)}', 400)
+    _, n, error = _color_args(args)
+    if error:
+        return error
+
+    if not ids:
+        ids = [palette_id for palette_id, entry in catalog.items() if not kinds or entry['kind'] in kinds]
+    formats = formats or list(EXPORT_FORMATS)
+
+    # The archive is compressed one file at a time while it is sent, never held in memory
+    response = _cached(_etag(catalog_version(), EXPORT_VERSION, ids, formats, n),
+                       lambda: stream_zip(export_files(ids, formats, n)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename=palettes.zip'
+    return response
@@ -1,11 +1,15 @@
 # See [The dash examples index](https://dash-example-index.herokuapp.com/) for more examples.
+import os
 import dash
 from dash import Dash, dcc, html, Input, Output, State 
+from flask import request
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import pandas as pd
 from chart_functions import *
 from sidebar import sidebar
+from figure_cache import start_warm_up
+from api import api
 
 
 # Create app object=================================================================
@@ -17,6 +21,21 @@ app = Dash(__name__,
                                  "/assets/styles.css"])
 #===================================================================================
 
+# Cache the bundled geometry in the browser; the level files have a content hash in their name
+@app.server.after_request
+def add_geometry_cache_headers(response):
+    if request.path.startswith('/assets/geo/'):
+        if request.path.endswith('.geojson'):
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+# Read-only figure API with ETags, so browsers and the reverse proxy can cache figures; it is served
+# under the prefix of the Dash routes, where assets/figure_api.js and the export links look for it
+app.server.register_blueprint(api, url_prefix=app.config.routes_pathname_prefix + 'api')
+#===================================================================================
+
 # Create components================================================================
 
 # Create menu button for opening and closing the sidebar
@@ -71,6 +90,10 @@ def toggle_sidebar(n, is_open):
         return not is_open
     return is_open
 
+# Pre-render the figures of every page in the background (see figure_cache.py)
+if os.environ.get('WARM_FIGURE_CACHE'):
+    start_warm_up()
+
 
 if __name__ == "__main__":
     app.run_server(debug=False, port=8000)
\ No newline at end of file
@@ -0,0 +1,21 @@
+/* Load cached figures from the figure API (api.py) in clientside callbacks.
+   GET responses carry an ETag and Cache-Control, so the browser and proxies can reuse them.
+   cvd (optional) loads the figures as seen with a color vision deficiency. */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figure_api: {
+        load: function (page, charts, palette, template, cvd) {
+            var config = JSON.parse(document.getElementById('_dash-config').textContent);
+            return Promise.all(charts.map(function (chart) {
+                var params = new URLSearchParams();
+                if (palette) { params.set('palette', palette); }
+                if (template) { params.set('template', template); }
+                if (cvd && cvd !== 'none') { params.set('cvd', cvd); }
+                var url = config.requests_pathname_prefix + 'api/figure/' + page + '/' + chart + '?' + params;
+                return fetch(url).then(function (response) {
+                    /* A chart that can not be loaded keeps its figure */
+                    return response.ok ? response.json() : window.dash_clientside.no_update;
+                });
+            }));
+        }
+    }
+});
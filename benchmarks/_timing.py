@@ -0,0 +1,28 @@
+import os
+import sys
+import time
+
+# The benchmarks import the app modules from the repository root, which read ./data and ./assets
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+# Best time of a function, in ms --------------------------------------
+def best_ms(function, repeat=5, number=None):
+    # number calls per round; by default enough calls for about 0.2 s per round
+    if number is None:
+        start = time.perf_counter()
+        function()
+        number = max(1, int(0.2 / max(time.perf_counter() - start, 1e-6)))
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        rounds.append((time.perf_counter() - start) / number)
+    return 1000 * min(rounds)
+
+# One line per compared pair -------------------------------------------
+def report(name, old_ms, new_ms, old_label='old', new_label='new'):
+    print(f'{name:32s} {old_label} {old_ms:9.3f} ms   {new_label} {new_ms:9.3f} ms   x{old_ms / new_ms:6.1f}')
@@ -0,0 +1,54 @@
+# Build time of the dict figure specs (figure_specs.py) against the go.Figure builders they replace
+# (chart_functions.py), serialized the way Dash sends them. Run from anywhere:
+#     python benchmarks/bench_figure_specs.py
+# _timing sets up the import path of the app modules, so it comes first
+from _timing import best_ms, report
+import pandas as pd
+import plotly.colors as pc
+import plotly.express as px
+import chart_functions as cf
+import figure_specs as fs
+from figure_cache import serialize_figure
+
+
+def main():
+    tips, stocks = px.data.tips(), px.data.stocks()
+    stocks['date'] = pd.to_datetime(stocks['date'])
+    cpi = pd.read_csv('./data/Consumer Price Index for All Urban Consumers (CPI-U) Gasoline 2013-2023.csv',
+                      low_memory=False, index_col=0)
+    cpi.index = cpi.index.astype(str)
+    seattle = pd.read_csv('./data/seattle_weather_2014-2023.csv')
+    temp = seattle[seattle['year'] == 2023].pivot_table(values='tmax', index='n_month', columns='day')
+    pivot = seattle.pivot_table(values='tmax', index='day', columns='n_month')
+    pivot = pivot.fillna(pivot.mean())
+    names = [trace.name for trace in pc.cyclical.swatches_cyclical().data]
+    bold, viridis, rdbu = pc.qualitative.Bold, pc.sequential.Viridis, pc.diverging.RdBu
+
+    # name -> (go.Figure builder, dict spec builder) with the same arguments
+    pairs = {
+        'colorscale bar': (lambda: cf.create_colorscale_bar('Viridis', viridis, len(viridis), 'white', 'plotly'),
+                           lambda: fs.colorscale_bar_spec('Viridis', viridis, len(viridis), 'white', 'plotly')),
+        'colorscale bar (qualitative)': (lambda: cf.create_colorscale_bar_v('Bold', bold, len(bold), 'white', 'plotly'),
+                                         lambda: fs.colorscale_bar_v_spec('Bold', bold, len(bold), 'white', 'plotly')),
+        'template colorway bar': (lambda: cf.create_colorscale_bar_for_template('seaborn'),
+                                  lambda: fs.colorscale_bar_for_template_spec('seaborn')),
+        'area with gradient': (lambda: cf.create_area_chart_with_gradient(stocks, 'date', 'AAPL', viridis, 'white', 'plotly'),
+                               lambda: fs.area_chart_with_gradient_spec(stocks, 'date', 'AAPL', viridis, 'white', 'plotly')),
+        'heatmap': (lambda: cf.create_heatmap(cpi, rdbu, 'white', 'plotly'),
+                    lambda: fs.heatmap_spec(cpi, rdbu, 'white', 'plotly')),
+        'heatmap (temperatures)': (lambda: cf.create_heatmap_temp(temp, 'plotly'),
+                                   lambda: fs.heatmap_temp_spec(temp, 'plotly')),
+        'pie': (lambda: cf.create_pie_chart(tips, 'tip', 'day', bold, 'white', 'plotly'),
+                lambda: fs.pie_chart_spec(tips, 'tip', 'day', bold, 'white', 'plotly')),
+        'polar swatches': (lambda: cf.create_polar_subplots(names),
+                           lambda: fs.polar_subplots_spec(names)),
+        'contour': (lambda: cf.create_contour_plot(pivot.columns, pivot.index, pivot.values, 'jet'),
+                    lambda: fs.contour_plot_spec(pivot.columns, pivot.index, pivot.values, 'jet')),
+    }
+    for name, (build_figure, build_spec) in pairs.items():
+        report(name, best_ms(lambda: serialize_figure(build_figure())), best_ms(lambda: serialize_figure(build_spec())),
+               'go.Figure', 'spec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Payload and first-render time of the choropleth maps for every bundled geometry level
+# (build_geometry.py), at the widths the pages draw them. Run from anywhere:
+#     python benchmarks/bench_geometry.py [--browser]
+# The first-render time needs a browser: with --browser the maps are drawn by plotly.js in headless
+# Chromium through playwright (pip install playwright && playwright install chromium)
+# _timing sets up the import path of the app modules, so it comes first
+from _timing import best_ms
+import argparse
+import gzip
+import json
+import os
+import pandas as pd
+import plotly
+import plotly.colors as pc
+import chart_functions as cf
+from figure_cache import serialize_figure
+
+BASE_URL = 'http://bench.local/'
+
+
+def payload(path):
+    with open(path, 'rb') as f:
+        content = f.read()
+    return len(content), len(gzip.compress(content))
+
+def build_map(df, width_px):
+    return cf.create_map(df, 'iso_alpha3', 'GDP per capita (US$)', pc.sequential.Viridis, 'white', width_px=width_px)
+
+def level_figures(df):
+    # The map at every geometry level
+    figures = {}
+    for name, level in cf.geometry_levels.items():
+        figures[name] = build_map(df, None).update_traces(geojson=f"/assets/geo/{level['file']}")
+    return figures
+
+def render_times(figures, repeat=5):
+    # ms from Plotly.newPlot to the drawn map, with the geometry fetched from the bundled files
+    from playwright.sync_api import sync_playwright
+    page_html = ('<html><body><div id="graph" style="width:%dpx;height:350px"></div><script>%s</script>'
+                 '</body></html>' % (cf.graph_width_px(4), plotly.offline.get_plotlyjs()))
+
+    def serve(route):
+        path = route.request.url[len(BASE_URL):]
+        if path.startswith('assets/geo/'):
+            route.fulfill(path=os.path.join('.', path), content_type='application/json')
+        else:
+            route.fulfill(body=page_html, content_type='text/html')
+
+    times = {}
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch()
+        page = browser.new_page()
+        page.route('**/*', serve)
+        for name, figure in figures.items():
+            runs = []
+            for _ in range(repeat):
+                page.goto(BASE_URL)
+                runs.append(page.evaluate('''async (figure) => {
+                    const start = performance.now();
+                    await Plotly.newPlot('graph', figure.data, figure.layout, figure.config);
+                    return performance.now() - start;
+                }''', dict(json.loads(serialize_figure(figure)), config=cf.config_mode)))
+            times[name] = min(runs)
+        browser.close()
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description='Payload and first-render time of the choropleth maps.')
+    parser.add_argument('--browser', action='store_true', help='also time the first render in headless Chromium')
+    args = parser.parse_args()
+
+    df = pd.read_csv('./data/All_Europe_2023.csv')
+    base_raw, base_gzip = payload(os.path.join('./assets/geo', 'europe_110m.json'))
+    print(f'{"base map":12s} {base_raw:7d} B raw  {base_gzip:6d} B gzip')
+    for name, level in cf.geometry_levels.items():
+        raw, compressed = payload(os.path.join('./assets/geo', level['file']))
+        print(f'{name:12s} {raw:7d} B raw  {compressed:6d} B gzip  tolerance {level["tolerance"]}°')
+
+    for page, columns in (('sequential', 4), ('diverging', 5)):
+        width_px = cf.graph_width_px(columns)
+        content = serialize_figure(build_map(df, width_px))
+        print(f'map at {width_px} px ({page} page): {cf.get_geojson_url(width_px)}; figure {len(content)} B, '
+              f'{len(gzip.compress(content.encode()))} B gzip, built in '
+              f'{best_ms(lambda: serialize_figure(build_map(df, width_px))):.1f} ms')
+
+    if args.browser:
+        try:
+            times = render_times(level_figures(df))
+        except ImportError:
+            print('First render: playwright is not installed')
+            return
+        for name, ms in times.items():
+            print(f'First render {name:8s} {ms:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Build time of the graph_objects builders of chart_functions.py against the plotly express calls they
+# replace (kept as references in px_reference.py), serialized the way Dash sends them. The
+# builders are timed with an empty trace data cache (first build of a dataset) and with a filled one
+# (palette or template change). Run from anywhere:
+#     python benchmarks/bench_px_builders.py
+# _timing sets up the import path of the app modules, so it comes first
+from _timing import best_ms, report
+import numpy as np
+import pandas as pd
+import plotly.colors as pc
+import plotly.express as px
+import chart_functions as cf
+from figure_cache import serialize_figure
+import px_reference as ref
+
+
+def main():
+    tips = px.data.tips()
+    sorted_tips = tips.copy()
+    sorted_tips['day'] = pd.Categorical(sorted_tips['day'], categories=['Thur', 'Fri', 'Sat', 'Sun'], ordered=True)
+    sorted_tips = sorted_tips.sort_values('day')
+    europe = pd.read_csv('./data/All_Europe_2023.csv')
+    life_expectancy = pd.read_csv('./data/Life_Expectancy_Europe_2023.csv', low_memory=False)
+    wind = pd.DataFrame({'direction': np.linspace(0, 360, 24), 'speed': np.random.default_rng(1).uniform(5, 10, 24)})
+    hours = np.arange(0, 24, 1)
+    temperature = pd.DataFrame({'hour': hours, 'temperature': 8 + 9 * (1 + np.sin((hours - 6) * np.pi / 12))})
+    path = [px.Constant('Europe'), 'European Union', 'Countries']
+
+    # name -> (graph_objects builder, px reference, arguments)
+    cases = {
+        'scatter': (cf.create_scatter_plot, ref.px_scatter_plot,
+                    (tips, 'total_bill', 'tip', 'tip', 'total_bill', pc.sequential.Viridis, 'white', 'plotly')),
+        'treemap': (cf.create_treemap, ref.px_treemap,
+                    (europe, path, 'GDP per capita (US$)', 'Sex gap', pc.sequential.Plasma, 2023, 'white', 'plotly')),
+        'map': (cf.create_map, ref.px_map,
+                (europe, 'iso_alpha3', 'GDP per capita (US$)', pc.sequential.Viridis, 'white')),
+        'map with average': (cf.create_map_with_avg_values, ref.px_map_with_avg_values,
+                             (life_expectancy, 'iso_alpha3', 'All', pc.diverging.RdBu, 'white', 'plotly',
+                              life_expectancy['All'].mean(), 'Life expectancy', [75, 80, 85])),
+        'pie': (cf.create_pie_chart, ref.px_pie_chart,
+                (tips, 'tip', 'day', pc.qualitative.Bold, 'white', 'plotly')),
+        'scatter with legend': (cf.create_scatter_plot_with_colorbar, ref.px_scatter_plot_with_colorbar,
+                                (sorted_tips, 'total_bill', 'tip', 'day', 'tip', pc.qualitative.Bold, 'white', 'plotly')),
+        'bar polar': (cf.create_bar_polar_wind, ref.px_bar_polar_wind,
+                      (wind, 'speed', 'direction', pc.cyclical.IceFire, 'plotly', 'white')),
+        'scatter (temperatures)': (cf.create_scatter_temp, ref.px_scatter_temp,
+                                   (temperature, pc.cyclical.Twilight, 'plotly', 'white')),
+    }
+    for name, (build, build_px, args) in cases.items():
+        px_ms = best_ms(lambda: serialize_figure(build_px(*args)))
+
+        def cold():
+            cf._trace_data_cache.clear()
+            cf._frame_fingerprints.clear()
+            return serialize_figure(build(*args))
+
+        report(name, px_ms, best_ms(cold), 'px', 'go')
+        report(name + ', cached', px_ms, best_ms(lambda: serialize_figure(build(*args))), 'px', 'go')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# plotly express versions of the chart builders of chart_functions.py, which now build the figures with
+# graph_objects. tests/test_px_builders.py checks that the figures match them and
+# benchmarks/bench_px_builders.py times the builders against them
+import plotly.express as px
+from chart_functions import layout_params
+
+
+# Reference px builders -----------------------------------------------
+def px_scatter_plot(dff, x, y, color_v, size_v, col_scale, bg_color, template):
+    fig = px.scatter(dff, x=x, y=y, color=color_v, size=size_v, size_max=15, color_continuous_scale=col_scale)
+    fig.update_layout(**layout_params, coloraxis_showscale=False, yaxis_title=None, xaxis_title=None,
+                      paper_bgcolor=bg_color, template=template)
+    return fig
+
+def px_treemap(dff, path_c, values, color_v, col_scale, year, bg_color, template):
+    fig = px.treemap(dff, path=path_c, hover_data=['Male', 'Female'], values=values, color=color_v,
+                     color_continuous_scale=col_scale)
+    fig.update_traces(
+        marker_cornerradius=5,
+        hovertemplate='Country: %{label}<br>'+
+                      'GDP per capita: %{value:,.0f} (US$)<br>'+
+                      'Female Life Expectancy: %{customdata[1]:.1f} years<br>'+
+                      'Male Life Expectancy: %{customdata[0]:.1f} years<br>'+
+                      'Sex gap: %{color:.1f} years<br>'
+                      f'Year: {year}')
+    fig.update_layout(coloraxis_showscale=True, height=300, margin=dict(l=20, t=20, r=20, b=20),
+                      paper_bgcolor=bg_color, template=template)
+    return fig
+
+def px_map(dff, locations, color_v, col_scale, bg_color):
+    fig = px.choropleth(dff, locations=locations, color=color_v, color_continuous_scale=col_scale,
+                        hover_data='Countries', scope='europe')
+    fig.update_geos(center={'lat': 54.5260, 'lon': 10.2551}, bgcolor=bg_color, projection_scale=2,
+                    visible=False, showcountries=False, showcoastlines=False, showland=False)
+    fig.update_traces(hovertemplate='%{customdata}<br>'+'GDP per capita: %{z:,.0f} (US$)')
+    fig.update_layout(**layout_params, coloraxis_showscale=False, paper_bgcolor=bg_color)
+    return fig
+
+def px_map_with_avg_values(dff, locations, color_v, col_scale, bg_color, template, avg_v, title, tickvals_y):
+    fig = px.choropleth(dff, locations=locations, color=color_v, color_continuous_scale=col_scale,
+                        color_continuous_midpoint=avg_v, hover_data='Countries', scope='europe')
+    fig.update_geos(center={'lat': 54.8, 'lon': 7.5}, projection_scale=2, bgcolor=bg_color,
+                    visible=False, showcountries=False, showcoastlines=False, showland=False)
+    fig.update_traces(hovertemplate='%{customdata}<br>'+'Life Expectancy: %{z:.1f} years')
+    fig.update_layout(title=title, title_font_size=18,
+                      coloraxis=dict(colorbar=dict(thickness=15, len=0.8, title='years', tickmode='array',
+                                                   tickvals=tickvals_y, tickformat='.0f')),
+                      margin=dict(l=0, t=70, r=0, b=10), height=550, paper_bgcolor=bg_color, template=template)
+    return fig
+
+def px_pie_chart(df, values, names, col_scale, bg_color, template):
+    fig = px.pie(df, values=values, names=names, color_discrete_sequence=col_scale)
+    fig.update_traces(textinfo='percent+label')
+    fig.update_layout(title=dict(text='Distribution of Tip by Day of the Week', font_size=18, y=0.95, x=0.5),
+                      height=400, showlegend=False, margin=dict(l=10, t=70, r=10, b=30),
+                      paper_bgcolor=bg_color, template=template)
+    return fig
+
+def px_scatter_plot_with_colorbar(dff, x, y, color_v, size_v, col_scale, bg_color, template):
+    fig = px.scatter(dff, x=x, y=y, opacity=1, color=color_v, size=size_v, size_max=13,
+                     color_discrete_sequence=col_scale)
+    fig.update_layout(template=template, paper_bgcolor=bg_color, modebar={'orientation': 'v'},
+                      margin=dict(l=20, t=70, r=20, b=20), height=400,
+                      title='Total Bill and Tip by Day of the Week', title_font_size=18, title_y=0.95, title_x=.05,
+                      legend=dict(orientation='h', y=1.15, x=0.55, title=None))
+    return fig
+
+def px_bar_polar_wind(df, col_r, col_theta, col_scale, template, bg_color):
+    fig = px.bar_polar(df, r=col_r, theta=col_theta, color=col_theta, color_continuous_scale=col_scale)
+    fig.update_traces(hovertemplate='Speed: %{r:.1f} km/h<br>Direction: %{theta:.1f}°')
+    fig.update_layout(title='Wind Speed and Direction', title_x=0.5, title_font_size=20,
+                      template=template, paper_bgcolor=bg_color, margin=dict(l=50, t=70, r=70, b=50), height=400,
+                      coloraxis_colorbar=dict(title='degrees', nticks=4))
+    return fig
+
+def px_scatter_temp(df, color_scale, template, bg_color):
+    fig = px.scatter(df, x='hour', y='temperature', color='hour', size='temperature',
+                     color_continuous_scale=color_scale)
+    fig.update_traces(hovertemplate='Hour of Day: %{x}<br>Temperature: %{y:.1f}°C')
+    fig.update_layout(title='Temperature Variation Over 24 Hours', title_x=0.5, title_font_size=20,
+                      xaxis=dict(title='Hour of Day', tickmode='linear', range=[-0.5, 23.5],
+                                 showgrid=False, zeroline=False),
+                      yaxis_title='Temperature (°C)', template=template, paper_bgcolor=bg_color,
+                      height=400, margin=dict(l=20, t=70, r=20, b=20))
+    return fig
@@ -0,0 +1,171 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+
+
+# Source geometry: Natural Earth 1:110m admin-0 countries (public domain),
+# reduced to the countries found in the data folder
+SOURCE_FILE = './data/europe_110m.geojson'
+OUTPUT_DIR = './assets/geo'
+
+# Simplification tolerance (degrees) for each bundled level, finest first
+GEOMETRY_LEVELS = {'fine': 0.0, 'medium': 0.05, 'low': 0.1, 'coarse': 0.25}
+
+# plotly.js topojson name for scope="europe" at the default resolution
+BASE_TOPOJSON = 'europe_110m.json'
+
+
+# Simplify a line with the Douglas-Peucker algorithm ---------------
+def simplify_line(points, tolerance):
+    points = np.asarray(points, dtype=float)
+    if tolerance <= 0 or len(points) < 3:
+        return points
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        # Distance of the inner points to the segment between start and end
+        segment = points[end] - points[start]
+        offsets = points[start+1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0]*offsets[:, 1] - segment[1]*offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack += [(start, index), (index, end)]
+
+    return points[keep]
+
+# Get every ring of a feature geometry -----------------------------
+def geometry_rings(geometry):
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    return [ring for polygon in polygons for ring in polygon]
+
+# Split a closed ring into arcs at the points where its neighbours change
+def ring_arcs(ring, owners):
+    points = [tuple(p) for p in ring[:-1]]
+    n = len(points)
+    junctions = [i for i in range(n)
+                 if owners[points[i]] != owners[points[i-1]] or owners[points[i]] != owners[points[(i+1) % n]]]
+    if not junctions:
+        # A ring shared with nobody (an island) is split at its first and middle point
+        junctions = [0, n // 2]
+
+    arcs = []
+    for k, start in enumerate(junctions):
+        end = junctions[(k+1) % len(junctions)]
+        arc = points[start:end+1] if end > start else points[start:] + points[:end+1]
+        arcs.append(arc)
+    return arcs
+
+# Simplify all features while keeping shared borders identical ---
+def simplify_features(features, tolerance):
+    # Record which rings every vertex belongs to
+    owners = {}
+    ring_id = 0
+    for feature in features:
+        for ring in geometry_rings(feature['geometry']):
+            for point in ring[:-1]:
+                owners.setdefault(tuple(point), set()).add(ring_id)
+            ring_id += 1
+    owners = {point: frozenset(ids) for point, ids in owners.items()}
+
+    # Every arc is simplified once, in a canonical direction, so neighbours get the same border
+    simplified_arcs = {}
+    def simplify_arc(arc):
+        forward = arc[0] <= arc[-1]
+        key = tuple(arc) if forward else tuple(reversed(arc))
+        if key not in simplified_arcs:
+            simplified_arcs[key] = [tuple(p) for p in simplify_line(key, tolerance)]
+        result = simplified_arcs[key]
+        return result if forward else result[::-1]
+
+    def simplify_ring(ring):
+        points = []
+        for arc in ring_arcs(ring, owners):
+            points += simplify_arc(arc)[:-1]
+        # Keep the original ring if it would collapse
+        if len(points) < 3:
+            return ring
+        return [list(p) for p in points] + [list(points[0])]
+
+    result = []
+    for feature in features:
+        geometry = feature['geometry']
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        polygons = [[simplify_ring(ring) for ring in polygon] for polygon in polygons]
+        coordinates = polygons[0] if geometry['type'] == 'Polygon' else polygons
+        result.append({**feature, 'geometry': {'type': geometry['type'], 'coordinates': coordinates}})
+    return result
+
+# Round the coordinates to the precision a level needs -------------
+def round_coordinates(coordinates, digits):
+    if isinstance(coordinates[0], (int, float)):
+        return [round(coordinates[0], digits), round(coordinates[1], digits)]
+    return [round_coordinates(c, digits) for c in coordinates]
+
+# Build the base map plotly.js loads for a geo subplot --------------
+def base_topojson():
+    # plotly.js fetches '<topojsonURL>europe_110m.json' for scope="europe" even when
+    # the traces bring their own GeoJSON. Our maps hide every base layer, so the
+    # layers only have to exist.
+    empty = {'type': 'GeometryCollection', 'geometries': []}
+    layers = ['countries', 'land', 'subunits', 'coastlines', 'ocean', 'lakes', 'rivers']
+    return {'type': 'Topology', 'arcs': [], 'objects': {layer: empty for layer in layers}}
+
+# Write every level with a content hash in its name ----------------
+def build_geometry(source=SOURCE_FILE, output_dir=OUTPUT_DIR, levels=GEOMETRY_LEVELS):
+    with open(source, encoding='utf-8') as f:
+        collection = json.load(f)
+    os.makedirs(output_dir, exist_ok=True)
+
+    manifest = {}
+    for level, tolerance in levels.items():
+        features = simplify_features(collection['features'], tolerance)
+        # Three decimals (about 100 m) are enough once the shapes are simplified
+        digits = 4 if tolerance == 0 else 3
+        for feature in features:
+            feature['geometry']['coordinates'] = round_coordinates(feature['geometry']['coordinates'], digits)
+        content = json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':'))
+
+        file_name = f"europe_{level}.{hashlib.sha256(content.encode()).hexdigest()[:10]}.geojson"
+        with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+            f.write(content)
+        manifest[level] = {'file': file_name, 'tolerance': tolerance, 'bytes': len(content)}
+        print(f"{level:8s} tolerance={tolerance:<5} {len(content):7d} bytes -> {file_name}")
+
+    # Base map, under the name plotly.js asks for
+    content = json.dumps(base_topojson(), separators=(',', ':'))
+    with open(os.path.join(output_dir, BASE_TOPOJSON), 'w', encoding='utf-8') as f:
+        f.write(content)
+    print(f"{'base':8s} {'':15s} {len(content):7d} bytes -> {BASE_TOPOJSON}")
+
+    # Remove files left over from previous builds
+    current = {entry['file'] for entry in manifest.values()}
+    for file_name in os.listdir(output_dir):
+        if file_name.startswith('europe_') and file_name.endswith('.geojson') and file_name not in current:
+            os.remove(os.path.join(output_dir, file_name))
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the simplified Europe geometry bundled in assets/geo.')
+    parser.add_argument('--source', default=SOURCE_FILE)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    build_geometry(args.source, args.output_dir)
@@ -2,6 +2,15 @@ import plotly.graph_objs as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.io as pio
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from downsampling import (needs_lod, heatmap_lod_updates, decimate_points, lttb_indices, range_bounds,
+                          WEBGL_THRESHOLD, POINT_BUDGET, LTTB_POINTS_PER_PX)
+from raster import raster_heatmap, raster_contour
 
 
 # Create a dictionary to map template names to their background colors
@@ -11,12 +20,200 @@ templates_dict = {'ggplot2': 'rgb(237,237,237)', 'seaborn':'rgb(234,234,242)', '
 templates = list(templates_dict.keys())
 
 # Define config mode for plotly graph
+# topojsonURL points plotly.js at the bundled base map instead of its CDN
 config_mode = {'displaylogo': True, 
-               'modeBarButtonsToRemove': ['zoom', 'pan', 'select', 'zoomIn', 'zoomOut', 'lasso', 'autoScale']}
+               'modeBarButtonsToRemove': ['zoom', 'pan', 'select', 'zoomIn', 'zoomOut', 'lasso', 'autoScale'],
+               'topojsonURL': '/assets/geo/'}
 
 # Define layout parameters
 layout_params = {'margin': dict(l=20, t=20, r=20, b=20), 'height':350}
 
+# Width (px) of the content of a page; a graph in a column n of 12 wide is about n/12 of it.
+# It sets the point budgets, raster sizes and geometry levels of the graphs
+CONTENT_WIDTH_PX = 1080
+
+def graph_width_px(columns=12):
+    return round(CONTENT_WIDTH_PX * columns / 12)
+
+# Bundled Europe geometry, built by build_geometry.py ------------
+with open('./assets/geo/manifest.json', encoding='utf-8') as f:
+    geometry_levels = json.load(f)
+
+def get_geojson_url(width_px=None, lon_span=45):
+    # Use the coarsest level whose simplification stays under one pixel at the width of the map,
+    # the full content width by default (scope="europe" at projection_scale=2 shows about 45 degrees of longitude)
+    degrees_per_px = lon_span / (width_px or graph_width_px())
+    levels = sorted(geometry_levels.values(), key=lambda level: level['tolerance'])
+    fitting = [level for level in levels if level['tolerance'] <= degrees_per_px] or levels[:1]
+    return f"/assets/geo/{fitting[-1]['file']}"
+
+# Fingerprint of the data behind a chart ----------------------------
+def dataset_fingerprint(*datasets):
+    digest = hashlib.sha256()
+    for data in datasets:
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            digest.update(repr(list(data.columns) if isinstance(data, pd.DataFrame) else data.name).encode())
+            digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        else:
+            data = np.ascontiguousarray(data)
+            digest.update(f'{data.dtype}{data.shape}'.encode())
+            digest.update(data.tobytes())
+    return digest.hexdigest()
+
+# Cache the trace data computed from the datasets --------------
+# Number of trace data entries kept; the least recently used are dropped above it
+TRACE_DATA_ITEMS = 64
+
+_trace_data_cache = OrderedDict()
+_frame_fingerprints = OrderedDict()
+_trace_data_lock = threading.Lock()
+
+def frame_fingerprint(dff):
+    # The fingerprint of a frame object is computed once; the entry keeps a reference to the frame,
+    # so its id cannot be reused while cached. Frames are not changed in place after they are built
+    with _trace_data_lock:
+        entry = _frame_fingerprints.get(id(dff))
+        if entry is not None and entry[0] is dff:
+            _frame_fingerprints.move_to_end(id(dff))
+            return entry[1]
+
+    fingerprint = dataset_fingerprint(dff)
+    with _trace_data_lock:
+        _frame_fingerprints[id(dff)] = (dff, fingerprint)
+        while len(_frame_fingerprints) > TRACE_DATA_ITEMS:
+            _frame_fingerprints.popitem(last=False)
+    return fingerprint
+
+def get_trace_data(build, dff, *args):
+    # Entries are keyed on the content of the frame, so equal frames share them
+    key = (build.__name__, frame_fingerprint(dff), args)
+    with _trace_data_lock:
+        data = _trace_data_cache.get(key)
+        if data is not None:
+            _trace_data_cache.move_to_end(key)
+            return data
+
+    data = build(dff, *args)
+    with _trace_data_lock:
+        _trace_data_cache[key] = data
+        while len(_trace_data_cache) > TRACE_DATA_ITEMS:
+            _trace_data_cache.popitem(last=False)
+    return data
+
+# Create hovertemplate the way plotly express labels columns ----
+def px_hovertemplate(labels, prefix=''):
+    # labels is a list of (column, reference); a column used twice keeps its first position and last reference
+    refs = {}
+    for column, ref in labels:
+        refs[column] = ref
+    return prefix + '<br>'.join(f'{column}=%{{{ref}}}' for column, ref in refs.items()) + '<extra></extra>'
+
+# Get the data for a scatter plot with marker size ---------------
+# Above budget rows the points are decimated; sizeref still comes from all rows
+def scatter_data(dff, x, y, color_v, size_v, size_max, budget=None):
+    data = {'x': dff[x].values, 'y': dff[y].values,
+            'color': dff[color_v].values, 'size': dff[size_v].values,
+            'sizeref': dff[size_v].max() / size_max**2,
+            'hovertemplate': px_hovertemplate([(x, 'x'), (y, 'y'), (size_v, 'marker.size'), (color_v, 'marker.color')])}
+    if budget is not None and len(dff) > budget:
+        keep = decimate_points(data['x'], data['y'], budget, color=data['color'])
+        data.update({key: data[key][keep] for key in ('x', 'y', 'color', 'size')})
+    return data
+
+# Get the data for a scatter plot grouped by a category ----------
+def grouped_scatter_data(dff, x, y, color_v, size_v, size_max, budget=None):
+    groups = []
+    for name, group in dff.groupby(color_v, sort=False, observed=True):
+        # Each group gets a share of the budget in proportion to its rows
+        if budget is not None and len(dff) > budget:
+            group = group.iloc[decimate_points(group[x], group[y], max(round(budget * len(group) / len(dff)), 1))]
+        groups.append({'name': name, 'x': group[x].values, 'y': group[y].values, 'size': group[size_v].values,
+                       'hovertemplate': px_hovertemplate([(x, 'x'), (y, 'y'), (size_v, 'marker.size')],
+                                                         prefix=f'{color_v}={name}<br>')})
+    return {'groups': groups, 'sizeref': dff[size_v].max() / size_max**2}
+
+# Get the data for an area chart, reduced with LTTB to budget points
+def area_data(dff, x, y, budget=None, x_range=None):
+    # x must be sorted; x_range limits the rows to a zoomed window
+    start, stop = range_bounds(dff[x].values, x_range)
+    rows = slice(start, stop)
+    if budget is not None and stop - start > budget:
+        rows = start + lttb_indices(dff[x].values[start:stop], dff[y].values[start:stop], budget)
+    xs, ys = dff[x].iloc[rows], dff[y].iloc[rows]
+    # The hover payload is only built for the points that are kept
+    return {'x': xs, 'y': ys, 'customdata': [y]*len(xs)}
+
+def get_area_data(dff, x, y, width_px=None, x_range=None):
+    budget = width_px * LTTB_POINTS_PER_PX if width_px else None
+    # Zoomed windows are not cached, so the cache does not grow while zooming
+    if x_range is not None:
+        return area_data(dff, x, y, budget, x_range)
+    return get_trace_data(area_data, dff, x, y, budget)
+
+# Create a scatter trace, in WebGL for large datasets ------------
+def scatter_trace(webgl, **kwargs):
+    if webgl:
+        # Scattergl has no orientation property
+        kwargs.pop('orientation', None)
+        return go.Scattergl(**kwargs)
+    return go.Scatter(**kwargs)
+
+# Get the data for a choropleth map ------------------------------
+def choropleth_data(dff, locations, color_v, hover_v):
+    return {'locations': dff[locations].values, 'z': dff[color_v].values,
+            'customdata': dff[[hover_v]].values}
+
+# Get the data for a pie chart -----------------------------------
+def pie_data(df, values, names):
+    return {'labels': df[names].values, 'values': df[values].values,
+            'hovertemplate': px_hovertemplate([(names, 'label'), (values, 'value')])}
+
+# Get the data for a bar polar chart -----------------------------
+def bar_polar_data(df, col_r, col_theta):
+    return {'r': df[col_r].values, 'theta': df[col_theta].values}
+
+# Get the nodes of a treemap, aggregated the way px.treemap does it
+def treemap_hierarchy(dff, path, values, color_v, hover_data):
+    # path holds column names from the root down, or ('constant', label) for a px.Constant level
+    levels = pd.DataFrame(
+        {i: (pd.Series(level[1], index=dff.index) if isinstance(level, tuple) else dff[level]).astype(str) 
+         for i, level in enumerate(path)})
+    totals = levels.assign(values=dff[values].values, 
+                           weighted=dff[color_v].values * dff[values].values,
+                           **{f'hover{k}': dff[col].values for k, col in enumerate(hover_data)})
+    
+    # Aggregate every level with one groupby, starting from the leaves
+    nodes = []
+    for depth in range(len(path)-1, -1, -1):
+        # Sorting by the node label first and then its parents gives the px node order
+        keys = list(range(depth, -1, -1))
+        agg = {'values': ('values', 'sum'), 'weighted': ('weighted', 'sum')}
+        for k in range(len(hover_data)):
+            agg[f'hover{k}_n'] = (f'hover{k}', 'nunique')
+            agg[f'hover{k}'] = (f'hover{k}', 'first')
+        level = totals.groupby(keys, sort=True).agg(**agg).reset_index()
+
+        parents = level[0] if depth > 0 else pd.Series('', index=level.index)
+        for i in range(1, depth):
+            parents = parents + '/' + level[i]
+        ids = parents + '/' + level[depth] if depth > 0 else level[depth]
+
+        # Hover values shared by all children are kept, mixed values are shown as (?)
+        customdata = [np.where(level[f'hover{k}_n'] == 1, level[f'hover{k}'].astype(object), '(?)') 
+                      for k in range(len(hover_data))]
+        color = level['weighted'] / level['values']
+        nodes.append(pd.DataFrame({'ids': ids, 'labels': level[depth], 'parents': parents, 
+                                   'values': level['values'], 'color': color,
+                                   **{f'custom{k}': c for k, c in enumerate(customdata + [color.values])}}))
+    
+    nodes = pd.concat(nodes, ignore_index=True)
+    return {'ids': nodes['ids'].values, 'labels': nodes['labels'].values, 'parents': nodes['parents'].values,
+            'values': nodes['values'].values, 'color': nodes['color'].values,
+            'customdata': nodes[[f'custom{k}' for k in range(len(hover_data)+1)]].values}
+
+# Define the axes plotly express creates for a single plot
+xy_axes = {'xaxis': dict(anchor='y', domain=[0.0, 1.0]), 'yaxis': dict(anchor='x', domain=[0.0, 1.0])}
+
 # Create colorscale bar for each palette------------------------
 def create_colorscale_bar(name, colorscale, n_colors, bg_color, template):
     fig = go.Figure()
@@ -40,10 +237,18 @@ def create_colorscale_bar(name, colorscale, n_colors, bg_color, template):
     return fig
 
 # Create scatter plot -------------------------------------------
-def create_scatter_plot(dff, x, y, color_v, size_v, col_scale, bg_color, template):
-    fig = px.scatter(dff, x=x, y=y, 
-                     color=color_v, size=size_v, size_max=15,
-                     color_continuous_scale=col_scale)
+def create_scatter_plot(dff, x, y, color_v, size_v, col_scale, bg_color, template,
+                        webgl_threshold=WEBGL_THRESHOLD, point_budget=POINT_BUDGET):
+    data = get_trace_data(scatter_data, dff, x, y, color_v, size_v, 15, point_budget)
+    fig = go.Figure(
+        scatter_trace(len(dff) > webgl_threshold,
+                      x=data['x'], y=data['y'], 
+                      mode='markers', name='', legendgroup='', showlegend=False, orientation='v',
+                      marker=dict(color=data['color'], coloraxis='coloraxis', 
+                                  size=data['size'], sizemode='area', sizeref=data['sizeref'], symbol='circle'),
+                      hovertemplate=data['hovertemplate'], xaxis='x', yaxis='y'),
+        layout=dict(xy_axes, coloraxis=dict(colorbar_title_text=color_v, colorscale=col_scale),
+                    legend=dict(tracegroupgap=0, itemsizing='constant')))
     
     fig.update_layout(**layout_params, coloraxis_showscale=False,
                       yaxis_title=None, xaxis_title=None,
@@ -53,10 +258,15 @@ def create_scatter_plot(dff, x, y, color_v, size_v, col_scale, bg_color, templat
 
 # Create treemap ------------------------------------------------
 def create_treemap(dff, path_c, values, color_v, col_scale, year, bg_color, template):   
-    fig = px.treemap(
-        dff, path=path_c, hover_data=['Male', 'Female'],
-        values=values, color=color_v,                                              
-        color_continuous_scale=col_scale)
+    path = tuple(('constant', level.value) if isinstance(level, px.Constant) else level for level in path_c)
+    data = get_trace_data(treemap_hierarchy, dff, path, values, color_v, ('Male', 'Female'))
+    fig = go.Figure(
+        go.Treemap(ids=data['ids'], labels=data['labels'], parents=data['parents'], 
+                   values=data['values'], branchvalues='total', customdata=data['customdata'],
+                   marker=dict(colors=data['color'], coloraxis='coloraxis'),
+                   domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), name=''),
+        layout=dict(coloraxis=dict(colorbar_title_text=color_v, colorscale=col_scale),
+                    legend_tracegroupgap=0))
     
     fig.update_traces(
         marker_cornerradius=5,
@@ -74,11 +284,13 @@ def create_treemap(dff, path_c, values, color_v, col_scale, year, bg_color, temp
     return fig
 
 # Create area chart with gradient -------------------------------
-def create_area_chart_with_gradient(dff, x, y, col_scale, bg_color, template):
+# width_px sets the LTTB point budget; x_range limits the chart to a zoomed window
+def create_area_chart_with_gradient(dff, x, y, col_scale, bg_color, template, width_px=None, x_range=None):
+    data = get_area_data(dff, x, y, width_px, x_range)
     fig = go.Figure()
     fig.add_scatter(
-            x=dff[x], y=dff[y], name='', 
-            customdata=[y]*len(dff),
+            x=data['x'], y=data['y'], name='', 
+            customdata=data['customdata'],
             hovertemplate='Company: %{customdata}<br>%{x}<br>'+'Stock price: %{y:.2f}',
             mode='lines', fill='tozeroy',            
             line=dict(color=col_scale[0], width=1.5),
@@ -87,14 +299,22 @@ def create_area_chart_with_gradient(dff, x, y, col_scale, bg_color, template):
     fig.update_layout(**layout_params, xaxis_ticklabelposition='outside right', 
                       paper_bgcolor=bg_color, template=template) 
 
+    # Keep the zoom while refined windows are patched in
+    if width_px and len(dff) > width_px * LTTB_POINTS_PER_PX:
+        fig.update_layout(uirevision='lttb')
+
     return fig
 
 # Create choropleth map -----------------------------------------
-def create_map(dff, locations, color_v, col_scale, bg_color):
-    fig = px.choropleth(
-        dff, locations=locations, color=color_v,
-        color_continuous_scale=col_scale,
-        hover_data='Countries', scope="europe")
+def create_map(dff, locations, color_v, col_scale, bg_color, width_px=None):
+    data = get_trace_data(choropleth_data, dff, locations, color_v, 'Countries')
+    fig = go.Figure(
+        go.Choropleth(locations=data['locations'], z=data['z'], customdata=data['customdata'],
+                      geojson=get_geojson_url(width_px), featureidkey='id',
+                      coloraxis='coloraxis', geo='geo', name=''),
+        layout=dict(geo=dict(domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), scope="europe"),
+                    coloraxis=dict(colorbar_title_text=color_v, colorscale=col_scale),
+                    legend_tracegroupgap=0))
     
     fig.update_geos(
         center={"lat": 54.5260, "lon": 10.2551},
@@ -112,7 +332,11 @@ def create_map(dff, locations, color_v, col_scale, bg_color):
     return fig
 
 # Create heatmap for consumer price index------------------------
-def create_heatmap(df, col_scale, bg_color, template):
+# max_shape=(rows, cols) downsamples larger matrices with the given pooling;
+# x_range and y_range (matrix index units) limit it to a zoomed window.
+# raster=True sends the cells as a PNG image instead of a z array
+def create_heatmap(df, col_scale, bg_color, template, max_shape=None, pooling='mean',
+                   x_range=None, y_range=None, raster=False):
     fig = go.Figure(
         go.Heatmap(x=df.columns, y=df.index, z=df.values,
                    name='', ygap=1, xgap=1,
@@ -130,10 +354,23 @@ def create_heatmap(df, col_scale, bg_color, template):
         yaxis=dict(autorange='reversed', showgrid=False, ticklabelstandoff=5),
         height=550, margin=dict(l=50, t=100, r=10, b=20))
 
+    if raster:
+        traces, layout = raster_heatmap(df, col_scale, max_shape or df.shape, fig.data[0].hovertemplate,
+                                        colorbar=dict(dtick=25, ticksuffix='%'), zmid=0,
+                                        x_range=x_range, y_range=y_range, pooling=pooling)
+        fig = go.Figure(data=traces, layout=fig.layout)
+        fig.update_layout(**layout)
+    elif needs_lod(df.shape, max_shape):
+        trace, layout = heatmap_lod_updates(df, max_shape, pooling, fig.data[0].hovertemplate,
+                                            x_range, y_range)
+        fig.update_traces(**trace)
+        fig.update_layout(**layout)
+
     return fig
 
 # Create heatmap for max temperature in Seattle -----------------
-def create_heatmap_temp(df, template):
+def create_heatmap_temp(df, template, max_shape=None, pooling='mean',
+                        x_range=None, y_range=None):
     fig = go.Figure(
         go.Heatmap(x=df.columns, y=df.index, z=df.values,
                    name='', ygap=1, xgap=1,                   
@@ -150,16 +387,25 @@ def create_heatmap_temp(df, template):
         yaxis=dict(autorange='reversed', showgrid=False, ticklabelstandoff=5),
         height=400, margin=dict(l=50, t=70, r=10, b=20))
 
+    if needs_lod(df.shape, max_shape):
+        trace, layout = heatmap_lod_updates(df, max_shape, pooling, fig.data[0].hovertemplate,
+                                            x_range, y_range)
+        fig.update_traces(**trace)
+        fig.update_layout(**layout)
+
     return fig
 
 #Create choropleth map with average value------------------------
 def create_map_with_avg_values(dff, locations, color_v, col_scale, bg_color, 
-                               template, avg_v, title, tickvals_y):
-    fig = px.choropleth(
-        dff, locations=locations, color=color_v,
-        color_continuous_scale=col_scale,
-        color_continuous_midpoint=avg_v,
-        hover_data="Countries", scope="europe")
+                               template, avg_v, title, tickvals_y, width_px=None):
+    data = get_trace_data(choropleth_data, dff, locations, color_v, 'Countries')
+    fig = go.Figure(
+        go.Choropleth(locations=data['locations'], z=data['z'], customdata=data['customdata'],
+                      geojson=get_geojson_url(width_px), featureidkey='id',
+                      coloraxis='coloraxis', geo='geo', name=''),
+        layout=dict(geo=dict(domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), scope="europe"),
+                    coloraxis=dict(colorbar_title_text=color_v, colorscale=col_scale, cmid=avg_v),
+                    legend_tracegroupgap=0))
 
     fig.update_geos(
         center={"lat": 54.8, "lon": 7.5},
@@ -206,10 +452,13 @@ def create_colorscale_bar_v(name, colorscale, n_colors, bg_color, template):
 
 #Create pie chart------------------------------------------------
 def create_pie_chart(df, values, names, col_scale, bg_color, template):
-    fig=px.pie(df,
-     values=values, 
-     names=names, 
-     color_discrete_sequence=col_scale)
+    data = get_trace_data(pie_data, df, values, names)
+    fig = go.Figure(
+        go.Pie(labels=data['labels'], values=data['values'], 
+               name='', legendgroup='', showlegend=True, 
+               domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]),
+               hovertemplate=data['hovertemplate']),
+        layout=dict(legend_tracegroupgap=0, piecolorway=col_scale))
     
     fig.update_traces(textinfo='percent+label')
 
@@ -225,10 +474,22 @@ def create_pie_chart(df, values, names, col_scale, bg_color, template):
 
 # Create scatter plot with colorbar------------------------------
 def create_scatter_plot_with_colorbar(dff, x, y, color_v, size_v,
-                                      col_scale, bg_color, template):
-    fig = px.scatter(dff, x=x, y=y, opacity=1,
-                     color=color_v, size=size_v, size_max=13,                     
-                     color_discrete_sequence=col_scale)
+                                      col_scale, bg_color, template,
+                                      webgl_threshold=WEBGL_THRESHOLD, point_budget=POINT_BUDGET):
+    data = get_trace_data(grouped_scatter_data, dff, x, y, color_v, size_v, 13, point_budget)
+    traces = [scatter_trace(len(dff) > webgl_threshold,
+                            x=group['x'], y=group['y'], 
+                            mode='markers', name=group['name'], legendgroup=group['name'], 
+                            showlegend=True, orientation='v',
+                            marker=dict(color=col_scale[i % len(col_scale)], opacity=1, 
+                                        size=group['size'], sizemode='area', sizeref=data['sizeref'], symbol='circle'),
+                            hovertemplate=group['hovertemplate'], xaxis='x', yaxis='y') 
+              for i, group in enumerate(data['groups'])]
+    
+    fig = go.Figure(traces, 
+                    layout=dict(xaxis=dict(anchor='y', domain=[0.0, 1.0], title_text=x), 
+                                yaxis=dict(anchor='x', domain=[0.0, 1.0], title_text=y),
+                                legend=dict(title_text=color_v, tracegroupgap=0, itemsizing='constant')))
 
     fig.update_layout(template=template, paper_bgcolor=bg_color,  modebar={"orientation": "v"},
                       margin=dict(l=20, t=70, r=20, b=20), height=400,
@@ -240,12 +501,15 @@ def create_scatter_plot_with_colorbar(dff, x, y, color_v, size_v,
 
 # Create bar polar chart-----------------------------------------
 def create_bar_polar_wind(df, col_r, col_theta, col_scale, template, bg_color):
-    fig = px.bar_polar(
-        df,
-        r=col_r,
-        theta=col_theta,
-        color=col_theta,
-        color_continuous_scale=col_scale)
+    data = get_trace_data(bar_polar_data, df, col_r, col_theta)
+    fig = go.Figure(
+        go.Barpolar(r=data['r'], theta=data['theta'], 
+                    name='', legendgroup='', showlegend=False, subplot='polar',
+                    marker=dict(color=data['theta'], coloraxis='coloraxis', pattern_shape='')),
+        layout=dict(polar=dict(domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), 
+                               angularaxis=dict(direction='clockwise', rotation=90)),
+                    coloraxis=dict(colorbar_title_text=col_theta, colorscale=col_scale),
+                    legend_tracegroupgap=0, barmode='relative'))
     
     fig.update_traces(hovertemplate='Speed: %{r:.1f} km/h<br>Direction: %{theta:.1f}°')
 
@@ -258,11 +522,18 @@ def create_bar_polar_wind(df, col_r, col_theta, col_scale, template, bg_color):
     return fig 
 
 # Create scatter plot for temperature variation -----------------
-def create_scatter_temp(df, color_scale, template, bg_color):
-    fig = px.scatter(
-        df, x='hour', y='temperature',
-        color='hour', size='temperature',
-        color_continuous_scale=color_scale )
+def create_scatter_temp(df, color_scale, template, bg_color,
+                        webgl_threshold=WEBGL_THRESHOLD, point_budget=POINT_BUDGET):
+    data = get_trace_data(scatter_data, df, 'hour', 'temperature', 'hour', 'temperature', 20, point_budget)
+    fig = go.Figure(
+        scatter_trace(len(df) > webgl_threshold,
+                      x=data['x'], y=data['y'], 
+                      mode='markers', name='', legendgroup='', showlegend=False, orientation='v',
+                      marker=dict(color=data['color'], coloraxis='coloraxis', 
+                                  size=data['size'], sizemode='area', sizeref=data['sizeref'], symbol='circle'),
+                      xaxis='x', yaxis='y'),
+        layout=dict(xy_axes, coloraxis=dict(colorbar_title_text='hour', colorscale=color_scale),
+                    legend=dict(tracegroupgap=0, itemsizing='constant')))
     
     fig.update_traces(hovertemplate='Hour of Day: %{x}<br>Temperature: %{y:.1f}°C')
 
@@ -390,21 +661,26 @@ def create_box_plot(df, template):
     return fig
 
 # Create contour plot -------------------------------------------
-def create_contour_plot(x_val, y_val, z_val, colorscale):
+# raster=True draws the bands into a PNG image of max_shape pixels (rows, cols)
+def create_contour_plot(x_val, y_val, z_val, colorscale, size=2, reversescale=False, transpose=False,
+                        coloring='fill', raster=False, max_shape=(540, 860)):
+    hovertemplate = ('Month: %{y}<br>Day: %{x}<br>Temperature: %{z:.1f}°C<extra></extra>' if transpose
+                     else 'Day: %{y}<br>Month: %{x}<br>Temperature: %{z:.1f}°C<extra></extra>')
     fig = go.Figure(
         go.Contour(
             x=x_val,
             y=y_val,
             z=z_val, 
-            hovertemplate='Day: %{y}<br>Month: %{x}<br>Temperature: %{z:.1f}°C<extra></extra>',            
+            hovertemplate=hovertemplate,            
             colorscale=colorscale, 
-            reversescale=False,
-            transpose=False,
+            reversescale=reversescale,
+            transpose=transpose,
             contours=dict(
                 showlabels=True, 
                 start=z_val.min(),
                 end=z_val.max(),
-                size=2),                  # Adjust contour interval for clarity            
+                size=size,                # Adjust contour interval for clarity            
+                coloring=coloring),
             colorbar=dict(title='t°C', tickformat='.0f')
         ))
 
@@ -412,12 +688,19 @@ def create_contour_plot(x_val, y_val, z_val, colorscale):
     fig.update_layout( 
         height=600, margin=dict(l=50, t=50, r=50, b=50),
         title='Average Annual Maximum Temperatures in Seattle (2014-2023)', title_font_size=18,
-        xaxis_title='Month',
-        yaxis_title='Day',
+        xaxis_title='Day' if transpose else 'Month',
+        yaxis_title='Month' if transpose else 'Day',
         xaxis_tickmode='linear',
         paper_bgcolor='white',
         template='plotly_white')
 
+    if raster:
+        traces, layout = raster_contour(x_val, y_val, z_val, colorscale, z_val.min(), z_val.max(), size,
+                                        max_shape, hovertemplate, colorbar=dict(title='t°C', tickformat='.0f'),
+                                        coloring=coloring, reversescale=reversescale, transpose=transpose)
+        fig = go.Figure(data=traces, layout=fig.layout)
+        fig.update_layout(**layout)
+
     return fig
 
 
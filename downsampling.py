@@ -0,0 +1,206 @@
+import numpy as np
+
+
+# Pooling methods for reducing a matrix to the rendered resolution
+POOLING_METHODS = ('mean', 'max')
+
+# Number of labelled ticks on an axis of a downsampled heatmap
+N_TICKS = 12
+
+# Scatter plots switch to WebGL above this many rows and are decimated above the point budget
+WEBGL_THRESHOLD = 10_000
+POINT_BUDGET = 50_000
+
+# Line charts keep this many points per pixel of width
+LTTB_POINTS_PER_PX = 2
+
+
+# Split n rows or columns into at most max_bins contiguous blocks -
+def block_edges(n, max_bins):
+    bins = max(1, min(n, max_bins))
+    return np.linspace(0, n, bins+1).round().astype(int)
+
+# Pool a matrix block by block, ignoring missing values -----------
+def pool_matrix(z, max_rows, max_cols, method='mean'):
+    if method not in POOLING_METHODS:
+        raise ValueError(f"pooling must be one of {POOLING_METHODS}, got {method!r}")
+
+    z = np.asarray(z, dtype=float)
+    row_edges = block_edges(z.shape[0], max_rows)
+    col_edges = block_edges(z.shape[1], max_cols)
+    rows, cols = row_edges[:-1], col_edges[:-1]
+
+    if method == 'max':
+        # fmax skips NaN unless the whole block is missing
+        pooled = np.fmax.reduceat(np.fmax.reduceat(z, rows, axis=0), cols, axis=1)
+    else:
+        valid = ~np.isnan(z)
+        sums = np.add.reduceat(np.add.reduceat(np.where(valid, z, 0.0), rows, axis=0), cols, axis=1)
+        counts = np.add.reduceat(np.add.reduceat(valid.astype(np.int64), rows, axis=0), cols, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pooled = sums / counts
+
+    return pooled, row_edges, col_edges
+
+# Check if a matrix is larger than the rendered resolution --------
+def needs_lod(shape, max_shape):
+    return max_shape is not None and (shape[0] > max_shape[0] or shape[1] > max_shape[1])
+
+# Convert an axis range (in matrix index units) to a slice --------
+def window_bounds(axis_range, n):
+    if axis_range is None:
+        return 0, n
+    # Cell i covers [i-0.5, i+0.5]; the range may be reversed
+    lo, hi = min(axis_range), max(axis_range)
+    start = int(np.clip(np.floor(lo + 0.5), 0, n-1))
+    stop = int(np.clip(np.ceil(hi + 0.5), start+1, n))
+    return start, stop
+
+# Tick positions and labels for a window of an index axis ---------
+def index_ticks(labels, start, stop, n_ticks=N_TICKS):
+    positions = np.unique(np.linspace(start, stop-1, min(n_ticks, stop-start)).round().astype(int))
+    return dict(tickmode='array', tickvals=positions, ticktext=[str(labels[p]) for p in positions])
+
+# Downsample the visible window of a DataFrame for a heatmap ------
+def heatmap_window(df, max_shape, pooling='mean', x_range=None, y_range=None):
+    # x and y are matrix index units, so zoom ranges map straight back to rows and columns
+    r0, r1 = window_bounds(y_range, df.shape[0])
+    c0, c1 = window_bounds(x_range, df.shape[1])
+    z, row_edges, col_edges = pool_matrix(df.values[r0:r1, c0:c1], *max_shape, method=pooling)
+
+    # Each cell sits at the centre of the rows and columns it covers
+    trace = {'x': c0 + (col_edges[:-1] + col_edges[1:] - 1) / 2,
+             'y': r0 + (row_edges[:-1] + row_edges[1:] - 1) / 2,
+             'z': z}
+    return trace, index_ticks(df.columns, c0, c1), index_ticks(df.index, r0, r1)
+
+# Read the x and y ranges of a zoom from relayoutData -------------
+def relayout_ranges(relayout_data, window=None):
+    # window holds the ranges of the previous zoom, so an event on one axis keeps the other
+    ranges = dict(window or {})
+    changed = False
+    for axis in ('xaxis', 'yaxis'):
+        if f'{axis}.autorange' in relayout_data:
+            ranges[axis] = None
+            changed = True
+        elif f'{axis}.range[0]' in relayout_data:
+            ranges[axis] = [relayout_data[f'{axis}.range[0]'], relayout_data[f'{axis}.range[1]']]
+            changed = True
+        elif f'{axis}.range' in relayout_data:
+            ranges[axis] = list(relayout_data[f'{axis}.range'])
+            changed = True
+    return ranges, changed
+
+# Trace and layout updates that switch a heatmap to its downsampled form
+def heatmap_lod_updates(df, max_shape, pooling, hovertemplate, x_range=None, y_range=None):
+    trace, xaxis, yaxis = heatmap_window(df, max_shape, pooling, x_range, y_range)
+    # Cells cover blocks of rows and columns, so hover shows their centre position and pooled value
+    trace['hovertemplate'] = (hovertemplate.replace('%{x}', '%{x:.0f}').replace('%{y}', '%{y:.0f}')
+                              .replace('%{z}', f'%{{z}} ({pooling})'))
+    # uirevision keeps the zoom while refined tiles are patched in
+    return trace, {'xaxis': xaxis, 'yaxis': yaxis, 'uirevision': 'lod'}
+
+# Convert dates and categories to numbers for binning -------------
+def as_numeric(values):
+    values = np.asarray(values)
+    if values.dtype.kind in 'mM':
+        return values.astype('int64').astype(float)
+    if values.dtype.kind in 'biuf':
+        return values.astype(float)
+    return np.unique(values.astype(str), return_inverse=True)[1].astype(float)
+
+# Pick up to budget points, keeping sparse regions and the color extremes
+def decimate_points(x, y, budget, color=None, seed=0):
+    x, y = as_numeric(x), as_numeric(y)
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+
+    # The lowest and highest color values set the colorscale range, so they always stay and the
+    # budget keeps room for them; colors that are all missing keep the first point instead
+    extremes = []
+    if color is not None:
+        color = as_numeric(color)
+        extremes = [0] if np.isnan(color).all() else list(dict.fromkeys([np.nanargmin(color), np.nanargmax(color)]))
+    extremes = np.array(extremes[:budget], dtype=int)
+    room = budget - len(extremes)
+
+    # Bin the points on a grid with about a quarter of the budget in cells
+    side = max(int(np.sqrt(budget / 4)), 1)
+    def bin_index(values):
+        finite = np.isfinite(values)
+        lo, hi = (values[finite].min(), values[finite].max()) if finite.any() else (0, 0)
+        scaled = (np.where(finite, values, lo) - lo) / (hi - lo) * side if hi > lo else np.zeros(n)
+        return np.clip(scaled.astype(int), 0, side-1)
+    cells = bin_index(x) * side + bin_index(y)
+
+    # Every occupied cell keeps one point; the rest of the budget follows the density
+    counts = np.bincount(cells, minlength=side*side)
+    occupied = np.count_nonzero(counts)
+    quota = np.minimum(counts, 1 + np.floor(counts * max(room - occupied, 0) / n).astype(int))
+
+    # Rank the points of each cell in a random (but repeatable) order and keep the first ones
+    order = np.lexsort((np.random.default_rng(seed).random(n), cells))
+    starts = np.cumsum(counts) - counts
+    rank = np.empty(n, dtype=int)
+    rank[order] = np.arange(n) - starts[cells[order]]
+    keep = rank < quota[cells]
+    keep[extremes] = False
+
+    # With a budget below the number of occupied cells, the points ranked first in their cells stay
+    kept = np.flatnonzero(keep)
+    if len(kept) > room:
+        kept = np.sort(kept[np.argsort(rank[kept], kind='stable')[:room]])
+    return np.union1d(kept, extremes)
+
+# Largest-Triangle-Three-Buckets: pick n_out points that keep the shape of a line
+def lttb_indices(x, y, n_out):
+    x, y = as_numeric(x), as_numeric(y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # The first and last points are kept; the others are split into n_out-2 buckets
+    edges = np.linspace(1, n-1, n_out-1).astype(int)
+    starts, stops = edges[:-1], edges[1:]
+    sizes = stops - starts
+
+    # Bucket averages, and every bucket padded into one row of a 2-D array
+    mean_x = np.add.reduceat(x[1:-1], starts-1) / sizes
+    mean_y = np.add.reduceat(y[1:-1], starts-1) / sizes
+    columns = np.minimum(starts[:, None] + np.arange(sizes.max()), stops[:, None] - 1)
+    bucket_x, bucket_y = x[columns], y[columns]
+
+    # The third point of bucket i is the average of bucket i+1 (the last point for the last bucket)
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    # Each bucket depends on the point picked in the one before, so buckets are visited in order
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n-1
+    a = 0
+    for i in range(len(starts)):
+        area = np.abs((x[a] - next_x[i]) * (bucket_y[i] - y[a]) - (x[a] - bucket_x[i]) * (next_y[i] - y[a]))
+        a = columns[i, np.argmax(area)]
+        selected[i+1] = a
+    return selected
+
+# Rows of a sorted column inside a range, plus one on each side ---
+def range_bounds(values, value_range):
+    if value_range is None:
+        return 0, len(values)
+    lo, hi = np.asarray(sorted(value_range)).astype(values.dtype)
+    start = max(int(np.searchsorted(values, lo, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(values, hi, side='right')) + 1, len(values))
+    return start, stop
+
+# Read the x range of a zoom from relayoutData --------------------
+def relayout_x_range(relayout_data):
+    # Returns (changed, range); range is None when the axis is reset
+    if 'xaxis.autorange' in relayout_data:
+        return True, None
+    if 'xaxis.range[0]' in relayout_data:
+        return True, [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+    if 'xaxis.range' in relayout_data:
+        return True, list(relayout_data['xaxis.range'])
+    return False, None
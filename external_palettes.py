@@ -0,0 +1,214 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import numpy as np
+from raster import colors_to_rgb
+
+
+logger = logging.getLogger(__name__)
+
+# Folder of the palette catalogs; every file (or top-level folder) is one catalog
+PALETTE_DIR = os.environ.get('PALETTE_CATALOG_DIR', './data/palettes')
+
+# Binary index of the parsed palettes, so unchanged files are not parsed again
+INDEX_FILE = os.environ.get('PALETTE_INDEX_FILE', './cache/palettes/index.npz')
+
+# Change when the parsing changes, so every file is parsed again
+INDEX_VERSION = 1
+
+# Type of the palettes of a file that names none, by format
+DEFAULT_KINDS = {'.json': 'sequential', '.csv': 'sequential', '.gpl': 'qualitative',
+                 '.npy': 'sequential', '.txt': 'sequential'}
+
+# Errors of a malformed file or palette; it is skipped with a warning instead of stopping the app
+PARSE_ERRORS = (OSError, ValueError, TypeError, KeyError, IndexError, AttributeError, csv.Error)
+
+
+# Normalize colors to an (n, 3) array of 0-255 values ----------------
+def normalize_colors(colors):
+    # Colors are hex or rgb() strings, or rows of 0-255 integers or 0-1 floats (with an alpha column)
+    if len(colors) and isinstance(colors[0], str):
+        return colors_to_rgb([color.strip() for color in colors])
+    rgb = np.asarray(colors)[:, :3]
+    if rgb.dtype.kind in 'iu' or rgb.max(initial=0) > 1:
+        return rgb.astype(float)
+    return rgb.astype(float) * 255
+
+# Content hash of a palette; palettes with the same 8-bit colors are duplicates
+def color_hash(rgb):
+    return hashlib.sha256(np.round(rgb).astype(np.uint8).tobytes()).hexdigest()[:16]
+
+def _clean_name(name):
+    # Names become file names of the exports and parts of URLs
+    return re.sub(r'[^A-Za-z0-9_.+-]+', '_', str(name).strip()).strip('_') or 'palette'
+
+# Parsers, one per format; each yields (name, colors, kind, tags) ---
+def _parse_json(path):
+    with open(path) as f:
+        content = json.load(f)
+    if isinstance(content, dict) and 'palettes' in content:
+        content = content['palettes']
+    if isinstance(content, dict) and ('colors' in content or 'hex' in content):
+        content = [content]
+    if isinstance(content, dict):
+        content = [{'name': name, 'colors': colors} for name, colors in content.items()]
+    for palette in content:
+        yield (palette['name'], palette.get('colors', palette.get('hex')),
+               palette.get('kind', palette.get('category')), palette.get('tags', []))
+
+def _parse_csv(path):
+    # One color per row: name,color[,kind][,tags]; tags are separated by spaces
+    palettes = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            name = row['name']
+            if name not in palettes:
+                palettes[name] = ([], row.get('kind') or row.get('category'), (row.get('tags') or '').split())
+            palettes[name][0].append(row['color'])
+    for name, (colors, kind, tags) in palettes.items():
+        yield name, colors, kind, tags
+
+def _parse_gpl(path):
+    name, colors = os.path.splitext(os.path.basename(path))[0], []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('Name:'):
+                name = line[5:].strip()
+            elif line and line[0].isdigit():
+                colors.append([int(value) for value in line.split()[:3]])
+    yield name, colors, None, []
+
+def _parse_colormap(path):
+    # A matplotlib colormap dump: cmap(np.linspace(0, 1, n)) saved with np.save or np.savetxt
+    rows = np.load(path, allow_pickle=False) if path.endswith('.npy') else np.loadtxt(path, ndmin=2)
+    yield os.path.splitext(os.path.basename(path))[0], rows, None, []
+
+PARSERS = {'.json': _parse_json, '.csv': _parse_csv, '.gpl': _parse_gpl, '.npy': _parse_colormap, '.txt': _parse_colormap}
+
+# Parse the palettes of one catalog file ----------------------------
+def parse_file(path, palette_dir=PALETTE_DIR, kinds=()):
+    relative = os.path.relpath(path, palette_dir)
+    parts = relative.split(os.sep)
+    extension = os.path.splitext(path)[1].lower()
+    # The catalog is the top-level folder or the file; a folder named after a type sets the type
+    source = _clean_name(os.path.splitext(parts[0])[0])
+    folder_kind = next((part for part in parts[:-1] if part in kinds), None)
+
+    # A file that can not be read is skipped, and so is a palette with colors that can not be parsed
+    palettes = []
+    try:
+        for name, colors, kind, tags in PARSERS[extension](path):
+            try:
+                kind = str(kind or folder_kind or DEFAULT_KINDS[extension]).lower()
+                # The colors are kept at the precision of the index, so a palette is the same parsed or read from it
+                rgb = normalize_colors(colors).astype(np.float32).astype(float)
+            except PARSE_ERRORS as error:
+                logger.warning('Skipped palette %r of %s: %s', name, relative, error)
+                continue
+            if len(rgb) < 2 or (kinds and kind not in kinds):
+                continue
+            palettes.append({'name': _clean_name(name), 'kind': kind, 'source': source,
+                             'tags': [str(tag) for tag in tags], 'file': relative, 'rgb': rgb})
+    except PARSE_ERRORS as error:
+        logger.warning('Skipped the rest of %s: %s', relative, error)
+    return palettes
+
+# Read and write the binary index -----------------------------------
+def _read_index(index_file):
+    try:
+        with np.load(index_file, allow_pickle=False) as index:
+            meta = json.loads(str(index['meta']))
+            if meta['version'] != INDEX_VERSION:
+                return {}, []
+            rgb = np.split(index['colors'].astype(float), index['offsets'][1:-1])
+    except (OSError, KeyError, ValueError):
+        return {}, []
+    return meta['files'], [{**palette, 'rgb': colors} for palette, colors in zip(meta['palettes'], rgb)]
+
+def _write_index(index_file, files, palettes):
+    os.makedirs(os.path.dirname(index_file) or '.', exist_ok=True)
+    # All colors in one array with the offsets of the palettes; the rest is JSON
+    offsets = np.cumsum([0] + [len(palette['rgb']) for palette in palettes])
+    colors = np.concatenate([palette['rgb'] for palette in palettes]) if palettes else np.zeros((0, 3))
+    meta = {'version': INDEX_VERSION, 'files': files,
+            'palettes': [{key: value for key, value in palette.items() if key != 'rgb'} for palette in palettes]}
+    temp_file = f'{index_file}.{os.getpid()}.npz'
+    np.savez(temp_file, colors=colors.astype(np.float32), offsets=offsets, meta=np.array(json.dumps(meta)))
+    os.replace(temp_file, index_file)
+
+# Load the palettes of every catalog file ---------------------------
+def load_external_palettes(palette_dir=PALETTE_DIR, index_file=INDEX_FILE, kinds=(), exclude_hashes=(),
+                           taken_names=(), report=None):
+    # Returns the palettes in file order, without duplicates of each other or of exclude_hashes;
+    # taken_names are the (kind, name) pairs of the palettes already known
+    if not os.path.isdir(palette_dir):
+        return []
+    start = time.perf_counter()
+    files = {}
+    for folder, _, names in os.walk(palette_dir):
+        for name in names:
+            if os.path.splitext(name)[1].lower() in PARSERS:
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                files[os.path.relpath(path, palette_dir)] = [stat.st_size, stat.st_mtime_ns]
+
+    # Only the files that changed since the index was written are parsed
+    old_files, old_palettes = _read_index(index_file)
+    kept = {relative for relative, stat in files.items() if old_files.get(relative) == stat}
+    by_file = {}
+    for palette in old_palettes:
+        if palette['file'] in kept:
+            by_file.setdefault(palette['file'], []).append(palette)
+    changed = sorted(set(files) - kept)
+    for relative in changed:
+        by_file[relative] = parse_file(os.path.join(palette_dir, relative), palette_dir, kinds)
+    palettes = [palette for relative in sorted(by_file) for palette in by_file[relative]]
+    for palette in palettes:
+        palette.setdefault('hash', color_hash(palette['rgb']))
+    if changed or set(old_files) != set(files):
+        try:
+            _write_index(index_file, files, palettes)
+        except OSError as error:
+            logger.warning('Could not write the palette index %s: %s', index_file, error)
+
+    # The first palette with some colors wins; names taken within a type get the catalog as prefix,
+    # then a number if the prefixed name is taken too
+    seen, names, unique = set(exclude_hashes), set(taken_names), []
+    for palette in palettes:
+        if palette['hash'] in seen:
+            continue
+        seen.add(palette['hash'])
+        name = palette['name']
+        if (palette['kind'], name) in names:
+            name = f"{palette['source']}.{palette['name']}"
+            number = 2
+            while (palette['kind'], name) in names:
+                name = f"{palette['source']}.{palette['name']}.{number}"
+                number += 1
+            palette = {**palette, 'name': name}
+        names.add((palette['kind'], name))
+        unique.append(palette)
+
+    if report:
+        report(f'Loaded {len(unique)} palettes ({len(palettes) - len(unique)} duplicates) from {len(files)} files, '
+               f'{len(changed)} parsed, in {time.perf_counter() - start:.2f} s')
+    return unique
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index the palette catalogs of a folder.')
+    parser.add_argument('--palette-dir', default=PALETTE_DIR)
+    parser.add_argument('--index-file', default=INDEX_FILE)
+    parser.add_argument('--rebuild', action='store_true', help='parse every file again')
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.index_file):
+        os.remove(args.index_file)
+    from palette_catalog import PALETTE_KINDS
+    load_external_palettes(args.palette_dir, args.index_file, PALETTE_KINDS, report=print)
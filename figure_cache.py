@@ -0,0 +1,361 @@
+import argparse
+import atexit
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import plotly
+import plotly.io as pio
+from chart_functions import templates, dataset_fingerprint
+
+
+# Folder of the figure cache, shared by every worker process
+CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', './cache/figures')
+CACHE_FILE = 'figures.sqlite'
+
+# Size limit of the compressed figures; the least recently used are evicted above it
+MAX_BYTES = int(os.environ.get('FIGURE_CACHE_MAX_MB', 512)) * 1024**2
+
+# Number of serialized figures kept in memory by every process
+MEMORY_ITEMS = 256
+
+# Bound the number of figures built at the same time by the warm-up, the static export and the swatches
+MAX_WORKERS = 4
+
+# Change to invalidate every cached figure, e.g. when the data files change format
+CACHE_VERSION = 1
+
+# Modules the builders draw their figures with; their sources are part of every figure key
+CHART_MODULES = ('chart_functions', 'figure_specs', 'raster', 'downsampling')
+
+# Seconds between two writes of the shared counters and figure hits of a process
+FLUSH_SECONDS = 10
+
+# The access time of a figure is written again only when it is older than this many seconds
+ACCESS_RESOLUTION = 60
+
+# Seconds after which the warm-up claim of a process that did not finish it is taken over
+WARM_UP_TIMEOUT = 3600
+
+# Charts that only depend on a palette and a template: page -> chart -> settings
+chart_registry = {}
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_connections = threading.local()
+_counts = defaultdict(int)
+# Counts not written to the cache yet: cache folder -> (counters, hits per figure key)
+_pending = defaultdict(lambda: (defaultdict(int), defaultdict(int)))
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+# Register a chart of a page ------------------------------------
+def register_chart(page, chart, build, palettes=(None,), chart_templates=tuple(templates), colors=None, data=(),
+                   reversible=False, on_demand=()):
+    # build(palette, template) returns a go.Figure or a figure dict;
+    # palettes=(None,) or chart_templates=(None,) is used for charts that do not depend on them.
+    # colors(palette) gives the colors of a palette and data the datasets the chart shows,
+    # so a figure is built again when either changes.
+    # A reversible chart also takes '<palette>_r', which its builder draws with the colors reversed.
+    # on_demand palettes (the external catalogs) are served too, but left out of the warm-up and the
+    # static export, so their number does not multiply the figures built ahead
+    palettes, on_demand = tuple(palettes), tuple(on_demand)
+    if reversible:
+        palettes += tuple(f'{palette}_r' for palette in palettes)
+        on_demand += tuple(f'{palette}_r' for palette in on_demand)
+    chart_registry.setdefault(page, {})[chart] = {
+        'build': build, 'palettes': palettes, 'on_demand': frozenset(on_demand), 'templates': tuple(chart_templates),
+        'colors': colors, 'fingerprint': dataset_fingerprint(*data), 'code': code_fingerprint(build),
+        'reversible': reversible}
+
+# Fingerprint of the code of a builder ------------------------------
+@lru_cache(maxsize=None)
+def chart_modules_fingerprint(modules=CHART_MODULES):
+    # Sources of the chart modules, read once per process
+    digest = hashlib.sha256()
+    for name in modules:
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def code_fingerprint(build):
+    # The source of the builder (its bytecode when the source is not available) and of the chart
+    # modules, so a deploy that changes how a figure is drawn invalidates it
+    try:
+        code = inspect.getsource(build).encode()
+    except (OSError, TypeError):
+        code = build.__code__.co_code
+    return hashlib.sha256(code + chart_modules_fingerprint().encode()).hexdigest()
+
+# Content hash of everything a figure depends on --------------------
+def figure_key(page, chart, palette, template):
+    entry = chart_registry[page][chart]
+    build = entry['build']
+    content = [CACHE_VERSION, plotly.__version__,
+               f'{build.__module__}.{build.__qualname__}', entry['code'], palette, template,
+               entry['colors'](palette) if entry['colors'] and palette is not None else None,
+               entry['fingerprint']]
+    return hashlib.sha256(json.dumps(content, default=str).encode()).hexdigest()
+
+# SQLite connection of the current process and thread ---------------
+def _connect(cache_dir=CACHE_DIR):
+    # Connections can not be shared with forked processes, so they are kept per process id
+    key = (os.getpid(), cache_dir)
+    connections = getattr(_connections, 'by_key', None)
+    if connections is None:
+        connections = _connections.by_key = {}
+    if key not in connections:
+        os.makedirs(cache_dir, exist_ok=True)
+        connection = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE), timeout=30, isolation_level=None)
+        # WAL lets the workers read while one of them writes
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('''CREATE TABLE IF NOT EXISTS figures (
+                                  key TEXT PRIMARY KEY, page TEXT, chart TEXT, value BLOB, size INTEGER,
+                                  created REAL, accessed REAL, hits INTEGER DEFAULT 0)''')
+        connection.execute('CREATE INDEX IF NOT EXISTS figures_accessed ON figures (accessed)')
+        connection.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)')
+        # One row while a process warms the cache up
+        connection.execute('CREATE TABLE IF NOT EXISTS warm_up (id INTEGER PRIMARY KEY CHECK (id = 1), '
+                           'pid INTEGER, started REAL)')
+        connections[key] = connection
+    return connections[key]
+
+# Count cache requests in this process and, with a cache folder, for all workers
+def _count(name, n=1, cache_dir=None):
+    # The shared counts are kept in the process and written by flush_counts
+    with _pending_lock:
+        _counts[name] += n
+        if cache_dir is not None:
+            _pending[cache_dir][0][name] += n
+
+def _add_counters(connection, counters):
+    connection.executemany('INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?',
+                           [(name, n, n) for name, n in counters.items()])
+
+# Write the counts of this process to the cache ----------------------
+def flush_counts(force=False):
+    # Runs at most every FLUSH_SECONDS, so disk hits do not each take the write lock of the workers
+    global _last_flush
+    with _pending_lock:
+        if not _pending or not force and time.monotonic() - _last_flush < FLUSH_SECONDS:
+            return
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+
+    for cache_dir, (counters, hits) in pending.items():
+        connection = _connect(cache_dir)
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            _add_counters(connection, counters)
+            connection.executemany('UPDATE figures SET hits = hits + ? WHERE key = ?',
+                                   [(n, key) for key, n in hits.items()])
+
+atexit.register(flush_counts, force=True)
+
+# Serialize a figure the way Dash sends it ------------------------
+def serialize_figure(fig):
+    return pio.to_json(fig, validate=False)
+
+# Read and write compressed figures ---------------------------------
+def read_figure(key, cache_dir=CACHE_DIR):
+    connection = _connect(cache_dir)
+    row = connection.execute('SELECT value, accessed FROM figures WHERE key = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    # The access time only orders the eviction, so it is written when it is stale; the hits go with the counters
+    now = time.time()
+    if now - row[1] > ACCESS_RESOLUTION:
+        connection.execute('UPDATE figures SET accessed = ? WHERE key = ?', (now, key))
+    with _pending_lock:
+        _pending[cache_dir][1][key] += 1
+    return zlib.decompress(row[0]).decode('utf-8')
+
+def write_figure(key, page, chart, content, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    value = zlib.compress(content.encode('utf-8'))
+    connection = _connect(cache_dir)
+    now = time.time()
+    # One transaction: readers see the old figure or the new one, never a partial write
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('INSERT OR REPLACE INTO figures (key, page, chart, value, size, created, accessed) '
+                           'VALUES (?, ?, ?, ?, ?, ?, ?)', (key, page, chart, value, len(value), now, now))
+        evict(connection, max_bytes)
+
+# Remove the least recently used figures above the size limit -------
+def evict(connection, max_bytes=MAX_BYTES):
+    total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM figures').fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    # Go down to 90% of the limit, so eviction does not run on every write
+    removed = 0
+    for key, size in connection.execute('SELECT key, size FROM figures ORDER BY accessed').fetchall():
+        if total <= 0.9 * max_bytes:
+            break
+        connection.execute('DELETE FROM figures WHERE key = ?', (key,))
+        total -= size
+        removed += 1
+    # Eviction runs in a write transaction already, so its counter is written right away
+    _count('evictions', removed)
+    _add_counters(connection, {'evictions': removed})
+    return removed
+
+# Build a figure and store it in the cache --------------------------
+def render_figure(page, chart, palette, template, cache_dir=CACHE_DIR):
+    build = chart_registry[page][chart]['build']
+    content = serialize_figure(build(palette, template))
+    write_figure(figure_key(page, chart, palette, template), page, chart, content, cache_dir)
+    return content
+
+# Get the JSON of a figure from memory, from the cache or by building it
+def get_figure_json(page, chart, palette, template, key=None):
+    key = key or figure_key(page, chart, palette, template)
+    with _memory_lock:
+        content = _memory.get(key)
+        if content is not None:
+            _memory.move_to_end(key)
+            _count('memory_hits')
+
+    if content is None:
+        content = read_figure(key)
+        if content is not None:
+            _count('disk_hits', cache_dir=CACHE_DIR)
+        else:
+            _count('misses', cache_dir=CACHE_DIR)
+            content = render_figure(page, chart, palette, template)
+        with _memory_lock:
+            _memory[key] = content
+            while len(_memory) > MEMORY_ITEMS:
+                _memory.popitem(last=False)
+        flush_counts()
+    return content
+
+# Get a figure as a dict ---------------------------------------------
+def get_figure(page, chart, palette, template):
+    # Every caller gets its own copy, so callbacks can change it
+    return json.loads(get_figure_json(page, chart, palette, template))
+
+# Hit rates of this process and of all workers ----------------------
+def cache_stats(cache_dir=CACHE_DIR):
+    flush_counts(force=True)
+    connection = _connect(cache_dir)
+    entries, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM figures').fetchone()
+    shared = dict(connection.execute('SELECT name, value FROM counters').fetchall())
+    process = dict(_counts)
+
+    def hit_rate(counts, hits):
+        n_hits = sum(counts.get(name, 0) for name in hits)
+        n_requests = n_hits + counts.get('misses', 0)
+        return n_hits / n_requests if n_requests else None
+
+    # Memory hits are only counted per process; the shared counters start at the cache on disk
+    return {'entries': entries, 'bytes': size, 'max_bytes': MAX_BYTES,
+            'process': {**process, 'hit_rate': hit_rate(process, ('memory_hits', 'disk_hits'))},
+            'shared': {**shared, 'hit_rate': hit_rate(shared, ('disk_hits',))}}
+
+# Warm-up: pre-render every palette and template combination ------
+def _load_pages():
+    # Creating the app imports the pages, which register their charts;
+    # forked workers already have the registry of the parent
+    if not chart_registry:
+        importlib.import_module('app')
+
+def _render_job(page, chart, palette, template, cache_dir):
+    start = time.perf_counter()
+    content = render_figure(page, chart, palette, template, cache_dir)
+    return page, chart, time.perf_counter() - start, len(content)
+
+def warm_up(pages=None, max_workers=MAX_WORKERS, cache_dir=CACHE_DIR, report=print):
+    jobs = [(page, chart, palette, template)
+            for page in (pages or list(chart_registry))
+            for chart, entry in chart_registry[page].items()
+            for palette in entry['palettes'] for template in entry['templates']]
+
+    # Figures already in the cache are skipped, so after a data change only the affected charts are built
+    cached = {row[0] for row in _connect(cache_dir).execute('SELECT key FROM figures')}
+    missing = [job for job in jobs if figure_key(*job) not in cached]
+    report(f'Pre-rendering {len(missing)} of {len(jobs)} figures with {max_workers} processes into {cache_dir}')
+
+    start = time.perf_counter()
+    stats = defaultdict(lambda: [0, 0.0, 0])
+    if missing:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_load_pages) as pool:
+            futures = [pool.submit(_render_job, *job, cache_dir) for job in missing]
+            for done, future in enumerate(as_completed(futures), 1):
+                page, chart, seconds, size = future.result()
+                chart_stats = stats[(page, chart)]
+                chart_stats[0] += 1
+                chart_stats[1] += seconds
+                chart_stats[2] += size
+                if done % 100 == 0 or done == len(missing):
+                    report(f'{done:6d}/{len(missing)} figures  {time.perf_counter() - start:7.1f} s')
+
+    for (page, chart), (count, seconds, size) in stats.items():
+        report(f'{page:12s} {chart:26s} {count:5d} figures  {1000*seconds/count:7.1f} ms  {size/count/1024:7.1f} KB')
+    entries, size = _connect(cache_dir).execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM figures').fetchone()
+    report(f'Done in {time.perf_counter() - start:.1f} s; {entries} figures, {size/1024**2:.1f} MB compressed')
+    return stats
+
+# Only one process warms the cache up ------------------------------
+def claim_warm_up(cache_dir=CACHE_DIR):
+    # BEGIN IMMEDIATE makes the check and the claim one step, so of the workers starting together
+    # (e.g. under gunicorn) only one gets it; a claim older than WARM_UP_TIMEOUT is taken over
+    connection = _connect(cache_dir)
+    now = time.time()
+    with connection:
+        connection.execute('BEGIN IMMEDIATE')
+        row = connection.execute('SELECT started FROM warm_up').fetchone()
+        if row is not None and now - row[0] < WARM_UP_TIMEOUT:
+            return False
+        connection.execute('INSERT OR REPLACE INTO warm_up (id, pid, started) VALUES (1, ?, ?)', (os.getpid(), now))
+    return True
+
+def release_warm_up(cache_dir=CACHE_DIR):
+    _connect(cache_dir).execute('DELETE FROM warm_up WHERE pid = ?', (os.getpid(),))
+
+def _claimed_warm_up(cache_dir=CACHE_DIR, **kwargs):
+    try:
+        warm_up(cache_dir=cache_dir, **kwargs)
+    finally:
+        release_warm_up(cache_dir)
+
+# Run the warm-up in the background of the app ---------------------
+def start_warm_up(cache_dir=CACHE_DIR, **kwargs):
+    # Processes of the warm-up pool import the app too and never warm up; of the app processes,
+    # the one that claims the warm-up runs it
+    if multiprocessing.parent_process() is not None or not claim_warm_up(cache_dir):
+        return None
+    thread = threading.Thread(target=_claimed_warm_up, kwargs=dict(kwargs, cache_dir=cache_dir),
+                              name='figure-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render the figures of every page into the figure cache.')
+    parser.add_argument('pages', nargs='*', help='pages to warm up (default: all)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--stats', action='store_true', help='print the cache size and hit rates instead')
+    args = parser.parse_args()
+
+    # The pages register their charts in the figure_cache module, not in __main__
+    os.environ.pop('WARM_FIGURE_CACHE', None)
+    _load_pages()
+    figure_cache = importlib.import_module('figure_cache')
+    if args.stats:
+        print(json.dumps(figure_cache.cache_stats(args.cache_dir), indent=2))
+    else:
+        figure_cache.warm_up(args.pages, args.workers, args.cache_dir)
@@ -0,0 +1,266 @@
+from functools import lru_cache
+import plotly.colors as pc
+import plotly.io as pio
+from chart_functions import layout_params, get_area_data
+from downsampling import LTTB_POINTS_PER_PX
+from downsampling import needs_lod, heatmap_lod_updates
+from raster import raster_heatmap, raster_contour
+
+# Plain dict versions of the go.Figure builders in chart_functions.
+# Dash serializes dict figures as they are, so plotly's property validators
+# never run; the specs must produce the same JSON as the go.Figure builders.
+
+
+# Resolve a template once and reuse its JSON ---------------------
+@lru_cache(maxsize=None)
+def get_template_json(template):
+    return pio.templates[template].to_plotly_json()
+
+# Named colorscales, as plotly's colorscale validator resolves them
+@lru_cache(maxsize=None)
+def get_named_colorscales():
+    return {name.lower(): colors
+            for module in (pc.sequential, pc.diverging, pc.cyclical)
+            for name, colors in vars(module).items()
+            if isinstance(colors, list) and not name.endswith('_r') and not name.startswith('_')}
+
+# Convert a list of colors or a colorscale name to [[position, color], ...]
+def to_colorscale(colorscale):
+    if isinstance(colorscale, str):
+        name = colorscale.lower()
+        named_colorscales = get_named_colorscales()
+        if name in named_colorscales:
+            colorscale = named_colorscales[name]
+        else:
+            colorscale = named_colorscales[name[:-2]][::-1]
+    if isinstance(colorscale[0], (list, tuple)):
+        return [list(step) for step in colorscale]
+    d = len(colorscale) - 1
+    return [[(1.0 * i) / (1.0 * d), color] for i, color in enumerate(colorscale)]
+
+# Create the figure dict with the resolved template --------------
+def figure_spec(data, layout, template=None):
+    if template is not None:
+        layout['template'] = get_template_json(template)
+    return {'data': data, 'layout': layout}
+
+# Switch a heatmap spec to its downsampled form -------------------
+def apply_heatmap_lod(heatmap, layout, df, max_shape, pooling, x_range=None, y_range=None):
+    if needs_lod(df.shape, max_shape):
+        trace, axes = heatmap_lod_updates(df, max_shape, pooling, heatmap['hovertemplate'],
+                                           x_range, y_range)
+        heatmap.update(trace)
+        layout['xaxis'].update(axes.pop('xaxis'))
+        layout['yaxis'].update(axes.pop('yaxis'))
+        layout.update(axes)
+
+# Create colorscale bar for each palette------------------------
+def colorscale_bar_spec(name, colorscale, n_colors, bg_color, template):
+    bar = {'type': 'bar', 'orientation': 'h',
+           'x': [1]*n_colors, 'y': list(range(len(colorscale))), 'customdata': list(colorscale),
+           'hovertemplate': 'Color: %{customdata}<extra></extra>',
+           'marker': {'color': list(colorscale)}}
+
+    layout = {'modebar': {'orientation': 'v'},
+              'height': 60+(50*n_colors),
+              'margin': dict(l=30, t=50, r=30, b=10),
+              'title': {'text': f"<b>{name} <br><sub> {n_colors} colors", 'x': 0.07},
+              'paper_bgcolor': bg_color,
+              'yaxis': dict(visible=False, showgrid=False),
+              'xaxis': dict(visible=False, showgrid=False, range=[0, 1])}
+
+    return figure_spec([bar], layout, template)
+
+# Create colorscale bar for each qualitative palette-------------
+def colorscale_bar_v_spec(name, colorscale, n_colors, bg_color, template):
+    bar = {'type': 'bar', 'name': '',
+           'x': list(range(1, n_colors+1)), 'y': [1]*n_colors, 'customdata': list(colorscale),
+           'hovertemplate': 'Number: %{x}<br>Color: %{customdata}',
+           'marker': {'color': list(colorscale)}}
+
+    layout = {'height': 80,
+              'margin': dict(l=10, t=40, r=10, b=10),
+              'title': {'text': f"<b>{name} Colorscale - {n_colors} colors", 'x': 0.03},
+              'plot_bgcolor': bg_color, 'paper_bgcolor': bg_color,
+              'yaxis': dict(visible=False, showgrid=False),
+              'xaxis': dict(visible=False, showgrid=False)}
+
+    return figure_spec([bar], layout, template)
+
+# Create colorscale bar for each template -----------------
+def colorscale_bar_for_template_spec(template_name, type='colorway'):
+    template_layout = get_template_json(template_name)['layout']
+    if type == 'colorway':
+        colorway = template_layout['colorway']
+        title = f'{template_name} colorway'
+    elif type == 'colorscale':
+        colorway = template_layout['colorscale']['sequential']
+        title = f'{template_name} sequential colorscale'
+    # Get plot_bgcolor from template
+    plot_bgcolor = template_layout['plot_bgcolor']
+
+    bar = {'type': 'bar', 'name': template_name,
+           'x': list(range(len(colorway))), 'y': [1]*len(colorway), 'customdata': colorway,
+           'hovertemplate': 'Index: %{x}<br>Color: %{customdata}<extra></extra>',
+           'marker': {'color': list(range(len(colorway))),
+                      'colorscale': to_colorscale(colorway),
+                      'showscale': False}}
+
+    layout = {'title': {'text': title, 'y': 0.93},
+              'height': 100, 'bargap': 0,
+              'margin': dict(l=10, t=20, r=10, b=0),
+              'plot_bgcolor': plot_bgcolor, 'paper_bgcolor': plot_bgcolor,
+              'yaxis': dict(visible=False, showgrid=False, range=[-0.5, 1.5]),
+              'xaxis': dict(visible=False, showgrid=False)}
+
+    return figure_spec([bar], layout, template_name)
+
+# Create area chart with gradient -------------------------------
+def area_chart_with_gradient_spec(dff, x, y, col_scale, bg_color, template, width_px=None, x_range=None):
+    data = get_area_data(dff, x, y, width_px, x_range)
+    area = {'type': 'scatter', 'name': '',
+            'x': data['x'], 'y': data['y'],
+            'customdata': data['customdata'],
+            'hovertemplate': 'Company: %{customdata}<br>%{x}<br>'+'Stock price: %{y:.2f}',
+            'mode': 'lines', 'fill': 'tozeroy',
+            'line': dict(color=col_scale[0], width=1.5),
+            'fillgradient': dict(type='vertical', colorscale=to_colorscale(col_scale))}
+
+    layout = {**layout_params, 'xaxis': {'ticklabelposition': 'outside right'},
+              'paper_bgcolor': bg_color}
+    if width_px and len(dff) > width_px * LTTB_POINTS_PER_PX:
+        layout['uirevision'] = 'lttb'
+
+    return figure_spec([area], layout, template)
+
+# Create heatmap for consumer price index------------------------
+def heatmap_spec(df, col_scale, bg_color, template, max_shape=None, pooling='mean',
+                 x_range=None, y_range=None, raster=False):
+    heatmap = {'type': 'heatmap', 'name': '',
+               'x': df.columns.values, 'y': df.index.values, 'z': df.values,
+               'ygap': 1, 'xgap': 1,
+               'colorscale': to_colorscale(col_scale), 'zmid': 0,
+               'colorbar': {'dtick': 25, 'ticksuffix': '%'},
+               'texttemplate': "%{text:.1f}",
+               'hovertemplate': 'Year: %{y}<br>Month: %{x}<br>Change: %{z} %'}
+
+    layout = {'title': {'text': 'US Consumer Price Index 2013-2023, Motor Fuel <br><sub>(12-month percentage change)<br>',
+                        'y': 0.95, 'font': {'size': 18}},
+              'paper_bgcolor': bg_color,
+              'xaxis': dict(side='top', showgrid=False, ticklabelstandoff=5),
+              'yaxis': dict(autorange='reversed', showgrid=False, ticklabelstandoff=5),
+              'height': 550, 'margin': dict(l=50, t=100, r=10, b=20)}
+
+    if raster:
+        data, axes = raster_heatmap(df, col_scale, max_shape or df.shape, heatmap['hovertemplate'],
+                                    colorbar=heatmap['colorbar'], zmid=0, x_range=x_range, y_range=y_range,
+                                    pooling=pooling)
+        layout['xaxis'].update(axes.pop('xaxis'))
+        layout['yaxis'].update(axes.pop('yaxis'))
+        layout.update(axes)
+        return figure_spec(data, layout, template)
+
+    apply_heatmap_lod(heatmap, layout, df, max_shape, pooling, x_range, y_range)
+    return figure_spec([heatmap], layout, template)
+
+# Create heatmap for max temperature in Seattle -----------------
+def heatmap_temp_spec(df, template, max_shape=None, pooling='mean',
+                      x_range=None, y_range=None):
+    heatmap = {'type': 'heatmap', 'name': '',
+               'x': df.columns.values, 'y': df.index.values, 'z': df.values,
+               'ygap': 1, 'xgap': 1,
+               'colorbar': {'ticksuffix': '°C'},
+               'hovertemplate': 'Month: %{y}<br>Day: %{x}<br>Max Temperature: %{z} °C'}
+
+    layout = {'title': {'text': 'Maximum Temperatures in Seattle by Day and Month, 2023',
+                        'y': 0.95, 'font': {'size': 18}},
+              'xaxis': dict(side='top', showgrid=False, ticklabelstandoff=5, tickmode='linear'),
+              'yaxis': dict(autorange='reversed', showgrid=False, ticklabelstandoff=5),
+              'height': 400, 'margin': dict(l=50, t=70, r=10, b=20)}
+
+    apply_heatmap_lod(heatmap, layout, df, max_shape, pooling, x_range, y_range)
+    return figure_spec([heatmap], layout, template)
+
+# Create pie chart------------------------------------------------
+def pie_chart_spec(df, values, names, col_scale, bg_color, template):
+    # Same trace plotly express builds for a pie without color grouping
+    pie = {'type': 'pie', 'name': '', 'legendgroup': '', 'showlegend': True,
+           'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+           'labels': df[names].values, 'values': df[values].values,
+           'hovertemplate': f'{names}=%{{label}}<br>{values}=%{{value}}<extra></extra>',
+           'textinfo': 'percent+label'}
+
+    layout = {'legend': {'tracegroupgap': 0},
+              'piecolorway': list(col_scale),
+              'title': dict(text='Distribution of Tip by Day of the Week',
+                            font={'size': 18}, y=0.95, x=0.5),
+              'height': 400, 'showlegend': False,
+              'margin': dict(l=10, t=70, r=10, b=30),
+              'paper_bgcolor': bg_color}
+
+    return figure_spec([pie], layout, template)
+
+# Create subplots for cyclical swatches -----------------
+def polar_subplots_spec(palette_names, cols=7, theta_step=5, template='plotly', bg_color='#E5ECF6'):
+    # Split the width between the columns the same way make_subplots does
+    spacing = 0.02
+    widths = [(1.0 - spacing*(cols-1)) / cols] * cols
+    domains = [[sum(widths[:c]) + c*spacing, sum(widths[:c]) + c*spacing + widths[c]] for c in range(cols)]
+    domains = [[max(0.0, x0), min(1.0, x1)] for x0, x1 in domains]
+    theta = list(range(0, 360, theta_step))
+
+    data, annotations = [], []
+    layout = {}
+    for i, color_name in enumerate(palette_names):
+        data.append({'type': 'barpolar', 'subplot': 'polar' if i == 0 else f'polar{i+1}', 'name': color_name,
+                     'r': [1]*len(theta), 'theta': theta, 'width': 5,
+                     'marker': {'color': theta, 'colorscale': to_colorscale(color_name)},
+                     'hoverinfo': 'skip'})
+        annotations.append({'font': {'size': 16}, 'showarrow': False, 'text': color_name,
+                            'x': sum(domains[i]) / 2.0, 'xanchor': 'center', 'xref': 'paper',
+                            'y': 0.95, 'yanchor': 'bottom', 'yref': 'paper'})
+
+    # Apply the polar layout settings to every column, as update_polars does
+    for i, domain in enumerate(domains):
+        layout['polar' if i == 0 else f'polar{i+1}'] = {
+            'domain': {'x': domain, 'y': [0.0, 1.0]},
+            'hole': 0.4,
+            'radialaxis': dict(visible=False),
+            'angularaxis': dict(visible=False, rotation=90, direction='clockwise')}
+
+    layout.update({'annotations': annotations,
+                   'height': 220,
+                   'margin': dict(l=10, t=20, r=10, b=0),
+                   'paper_bgcolor': bg_color,
+                   'showlegend': False,
+                   'modebar': {'orientation': 'v'}})
+
+    return figure_spec(data, layout, template)
+
+# Create contour plot -------------------------------------------
+def contour_plot_spec(x_val, y_val, z_val, colorscale, size=2, reversescale=False, transpose=False,
+                      coloring='fill', raster=False, max_shape=(540, 860)):
+    contour = {'type': 'contour',
+               'x': x_val.values, 'y': y_val.values, 'z': z_val,
+               'hovertemplate': ('Month: %{y}<br>Day: %{x}<br>Temperature: %{z:.1f}°C<extra></extra>' if transpose
+                                 else 'Day: %{y}<br>Month: %{x}<br>Temperature: %{z:.1f}°C<extra></extra>'),
+               'colorscale': to_colorscale(colorscale),
+               'reversescale': reversescale,
+               'transpose': transpose,
+               'contours': dict(showlabels=True, start=z_val.min(), end=z_val.max(), size=size, coloring=coloring),
+               'colorbar': dict(title={'text': 't°C'}, tickformat='.0f')}
+
+    layout = {'height': 600, 'margin': dict(l=50, t=50, r=50, b=50),
+              'title': {'text': 'Average Annual Maximum Temperatures in Seattle (2014-2023)', 'font': {'size': 18}},
+              'xaxis': {'title': {'text': 'Day' if transpose else 'Month'}, 'tickmode': 'linear'},
+              'yaxis': {'title': {'text': 'Month' if transpose else 'Day'}},
+              'paper_bgcolor': 'white'}
+
+    if raster:
+        data, axes = raster_contour(x_val, y_val, z_val, colorscale, z_val.min(), z_val.max(), size,
+                                    max_shape, contour['hovertemplate'], colorbar=contour['colorbar'],
+                                    coloring=coloring, reversescale=reversescale, transpose=transpose)
+        layout['yaxis'].update(axes['yaxis'])
+        return figure_spec(data, layout, 'plotly_white')
+
+    return figure_spec([contour], layout, 'plotly_white')
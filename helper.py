@@ -1,5 +1,19 @@
 import dash_bootstrap_components as dbc
-from dash import dcc, html
+import dash_daq as daq
+import plotly.express as px
+from dash import dcc, html, no_update, get_relative_path
+from palette_catalog import get_palette_catalog, search_palettes, resample_palette, format_colors, palette_code, SEARCH_LIMIT
+from palette_metrics import sort_palettes, metrics_summary, METRICS, SORT_METRICS
+from palette_cvd import cvd_options, NORMAL_VISION
+from palette_similarity import similar_palettes
+from palette_builder import interpolate_palette, validate_palette, BUILDER_SPACES, MAX_ANCHORS, MAX_BUILDER_COLORS
+
+
+# Number of palettes a palette dropdown holds before the user searches
+PALETTE_WINDOW = 12
+
+# Largest number of colors in the CSS gradient of a palette without a rendered swatch
+GRADIENT_STOPS = 16
 
 
 # Create dropdown with options
@@ -14,6 +28,179 @@ def create_dropdown(id, options, clearable=False, value='', optionHeight=32, cla
     
     return dropdown
 
+# Create a dropdown label with the name and the swatch of a palette, cut from the
+# sprite atlas of its type (rendered by swatch_assets.py into assets/swatch_atlas.css)
+def create_swatch_label(kind, name, rgb=None, title=None):
+    if rgb is None:
+        # Reversed palettes show the swatch of their palette, flipped by a 'swatches-reversed' parent
+        swatch = html.Div(className=f"swatch swatch-{kind} swatch-{kind}-{name.removesuffix('_r')}")
+    else:
+        # Palettes of the external catalogs have no rendered swatch; they are drawn as a CSS gradient,
+        # in blocks like the swatches unless they have too many colors
+        n_colors = min(len(rgb), GRADIENT_STOPS)
+        colors = format_colors(resample_palette(rgb, n_colors, kind))
+        if len(rgb) <= GRADIENT_STOPS:
+            stops = ', '.join(f'{color} {100*i/n_colors:.4g}% {100*(i+1)/n_colors:.4g}%' for i, color in enumerate(colors))
+        else:
+            stops = ', '.join(colors)
+        swatch = html.Div(className='swatch', style={'background-image': f'linear-gradient(to right, {stops})'})
+    label = html.Div([
+        html.Span(name, style={'flex': 'none', 'width': '100px', 'font-size': '13px', 'overflow': 'hidden', 'text-overflow': 'ellipsis'}),
+        swatch,
+        ], title=title, style={'display': 'flex', 'align-items': 'center', 'padding-top': '2px'})
+
+    return label
+
+# Options of a palette dropdown: the first palettes of a type, or those that match the search;
+# the selected palette is always among them, so the dropdown keeps it
+def palette_options(kind, search_value=None, value=None, sort='name'):
+    # sort is 'name' or a metric of palette_metrics.py; the matches are sorted before they are cut
+    limit = SEARCH_LIMIT if search_value else PALETTE_WINDOW
+    ids, n_matches = search_palettes(search_value or '', kind, limit=limit if sort == 'name' else None)
+    if sort != 'name':
+        ids = sort_palettes(ids, sort)[:limit]
+    n_more = n_matches - len(ids)
+    catalog = get_palette_catalog()
+    if value and f'{kind}/{value}' in catalog and f'{kind}/{value}' not in ids:
+        ids.insert(0, f'{kind}/{value}')
+
+    options = [{'label': create_swatch_label(kind, catalog[palette_id]['name'],
+                                             catalog[palette_id]['rgb'] if catalog[palette_id]['external'] else None,
+                                             metrics_summary(palette_id, kind)),
+                'value': catalog[palette_id]['name'],
+                'search': ' '.join([catalog[palette_id]['name'], *catalog[palette_id]['tags']])}
+               for palette_id in ids]
+    if n_more:
+        # The hint matches the search, so the dropdown does not filter it out
+        options.append({'label': f'{n_more} more palettes, type to search', 'value': '',
+                        'search': search_value or '', 'disabled': True})
+    return options
+
+# Create dropdown of the palettes of a type, filtered on the server by its search_value
+def create_palette_dropdown(id, kind, value):
+    return create_dropdown(id, palette_options(kind, value=value), value=value)
+
+# Create dropdown that sorts the palettes of a type by name or by a perceptual metric
+def create_sort_dropdown(id, kind):
+    options = [{'label': 'Name', 'value': 'name'}] + [{'label': METRICS[metric][0], 'value': metric}
+                                                      for metric in SORT_METRICS[kind]]
+    dropdown = html.Div([
+        html.H6('Sort by', className='mx-2 mb-0 text-nowrap'),
+        dcc.Dropdown(id=id, options=options, value='name', clearable=False, searchable=False, style={'width': '100%'}),
+        ], className='d-flex align-items-center mb-3')
+
+    return dropdown
+
+# Create dropdown that shows the figures as seen with a color vision deficiency
+def create_cvd_dropdown(id):
+    return create_dropdown(id, cvd_options(), value=NORMAL_VISION)
+
+# Create the palette builder of a page: anchor colors edited one at a time with the color picker,
+# interpolated on the server (palette_builder.py)
+def create_palette_builder(kind, anchors, n_colors):
+    anchor_controls = dbc.Col([
+        html.H6('Anchor colors'),
+        dbc.RadioItems(id=f'builder-{kind}-anchor', options=anchor_options(anchors), value=0, inline=True),
+        dbc.ButtonGroup([
+            dbc.Button('Add', id=f'builder-{kind}-add', n_clicks=0, outline=True, color='secondary'),
+            dbc.Button('Remove', id=f'builder-{kind}-remove', n_clicks=0, outline=True, color='secondary'),
+            ], size='sm', className='my-2'),
+        daq.ColorPicker(id=f'builder-{kind}-picker', value={'hex': anchors[0]}, size=200),
+        ], width=4)
+
+    palette_controls = dbc.Col([
+        html.H6('Number of colors'),
+        dcc.Slider(id=f'builder-{kind}-n', min=2, max=MAX_BUILDER_COLORS, step=1, value=n_colors,
+                   marks={i: str(i) for i in (2, 8, 16, 24, MAX_BUILDER_COLORS)}, tooltip={'placement': 'bottom'}),
+        html.H6('Interpolation'),
+        dbc.RadioItems(id=f'builder-{kind}-space', options=[{'label': label, 'value': space}
+                                                            for space, (label, _, _) in BUILDER_SPACES.items()],
+                       value='oklab', inline=True),
+        html.Div(id=f'builder-{kind}-preview', className='my-2'),
+        html.Div(id=f'builder-{kind}-metrics'),
+        html.Div([html.Div(id=f'builder-{kind}-code'), dcc.Clipboard(target_id=f'builder-{kind}-code')], className='d-flex'),
+        ], width=8)
+
+    builder = html.Div([
+        dbc.Button('Build a palette', id=f'builder-{kind}-toggle', n_clicks=0, size='sm', outline=True, color='secondary',
+                   className='mb-2'),
+        dbc.Collapse(dbc.Card([dbc.Row([anchor_controls, palette_controls]),
+                               dcc.Store(id=f'builder-{kind}-anchors', data=list(anchors))], body=True),
+                     id=f'builder-{kind}-collapse', is_open=False),
+        ], className='mb-3')
+
+    return builder
+
+# Options of the anchor colors of the palette builder, shown as their colors
+def anchor_options(anchors):
+    return [{'label': html.Span(title=color, style={'display': 'inline-block', 'width': '18px', 'height': '18px',
+                                                    'background-color': color, 'border': '1px solid #888'}),
+             'value': i} for i, color in enumerate(anchors)]
+
+# Edit the anchor colors of the palette builder; returns the anchors, their options, the selected one
+# and the color of the picker
+def edit_anchors(trigger, picked, index, anchors):
+    anchors = list(anchors)
+    if trigger.endswith('-anchor'):
+        return no_update, no_update, no_update, {'hex': anchors[index]}
+    if trigger.endswith('-picker'):
+        anchors[index] = picked['hex']
+        return anchors, anchor_options(anchors), no_update, no_update
+    if trigger.endswith('-add') and len(anchors) < MAX_ANCHORS:
+        # The new anchor is the color halfway to the next one
+        following = anchors[min(index + 1, len(anchors) - 1)]
+        anchors.insert(index + 1, interpolate_palette((anchors[index], following), 3)[1])
+        index += 1
+    elif trigger.endswith('-remove') and len(anchors) > 2:
+        anchors.pop(index)
+        index = min(index, len(anchors) - 1)
+    return anchors, anchor_options(anchors), index, {'hex': anchors[index]}
+
+# Preview, metrics and code of a built palette
+def create_builder_output(kind, colors, metrics):
+    preview = html.Div([html.Div(title=color, style={'flex': '1', 'height': '30px', 'background-color': color})
+                        for color in colors], style={'display': 'flex'})
+    scores = html.Small(' · '.join(f'{METRICS[key][0]}: {metrics[key]:.3g}' for key in SORT_METRICS[kind]))
+    warnings = [dbc.Alert(warning, color='warning', className='py-1 px-2 my-1 small')
+                for warning in validate_palette(kind, metrics)]
+    code = dcc.Markdown(f'''
+            ```python
+            {list(colors)}
+            ```
+            ''')
+    return preview, html.Div([scores, *warnings]), code
+
+# Create a switch that reverses the selected palette
+def create_reverse_switch(id, on=False):
+    switch = html.Div([
+        html.H6('Reverse', className='mx-2'),
+        daq.BooleanSwitch(id=id, on=on),
+        ], className='d-flex justify-content-center p-1')
+
+    return switch
+
+# Get the palette names of a type in alphabetical order, without the reversed '_r' copies;
+# they include the palettes of the external catalogs
+def palette_names(kind, exclude=(), external=None):
+    # external=False gives the plotly palettes only and external=True the palettes of the catalog files
+    catalog = get_palette_catalog()
+    ids, _ = search_palettes('', kind, limit=None)
+    return [catalog[palette_id]['name'] for palette_id in ids
+            if catalog[palette_id]['name'] not in exclude and external in (None, catalog[palette_id]['external'])]
+
+# Name of the palette as plotly calls it, with '_r' when it is reversed
+def reversed_palette(palette_name, reverse):
+    return f'{palette_name}_r' if reverse else palette_name
+
+# Get the colors of a palette; '<name>_r' reverses the colors of <name> when the figure is built
+def palette_colors(kind, palette_name):
+    entry = get_palette_catalog().get(f'{kind}/{palette_name}')
+    if entry is not None and entry['external']:
+        return format_colors(entry['rgb'])
+    if palette_name.endswith('_r'):
+        return palette_colors(kind, palette_name[:-2])[::-1]
+    return getattr(getattr(px.colors, kind), palette_name)
+
 # Generate a list of badges dynamically 
 def create_badges(badge_info):  
     badges = [ dbc.Badge(info["text"], 
@@ -69,7 +256,7 @@ def create_info_button_popover(id, popover_content, width='300px'):
 
 
 # Create a modal window with parameters
-def create_modal_save_options(id_modal, id_code_clipboard, id_array_clipboard, id_button):
+def create_modal_save_options(id_modal, id_code_clipboard, id_array_clipboard, id_button, export_kind=None):
     div_code = html.Div([
         html.Div(id=id_code_clipboard),       
         dcc.Clipboard(target_id=id_code_clipboard),
@@ -88,7 +275,9 @@ def create_modal_save_options(id_modal, id_code_clipboard, id_array_clipboard, i
                     html.H6('Lists of CSS colors:'),
                     div_array,
                     html.H6('Python Code:'),
-                    div_code
+                    div_code,
+                    *create_similar_section(export_kind),
+                    *create_bulk_export(export_kind)
                     ]),
                 dbc.ModalFooter(dbc.Button("Close", id=id_button, n_clicks=0))
                 ],
@@ -106,3 +295,35 @@ def create_modal_save_options(id_modal, id_code_clipboard, id_array_clipboard, i
     
     return modal
 
+# Section of the palettes that look like the selected one, filled by a callback of the page
+def create_similar_section(kind):
+    if kind is None:
+        return []
+    return [
+        html.H6('Similar palettes:'),
+        html.Div(id=f'similar-{kind}', style={'overflow-x': 'auto'}),
+        ]
+
+# List the palettes that look like a palette, across all types (palette_similarity.py)
+def create_similar_palettes(kind, palette_name):
+    catalog = get_palette_catalog()
+    rows = []
+    for match in similar_palettes(f'{kind}/{palette_name}'):
+        entry = catalog[match['id']]
+        # A palette that looks alike when it is reversed is listed reversed, with a flipped swatch
+        name = f"{entry['name']}_r" if match['reversed'] else entry['name']
+        title = f"{entry['kind']}/{name} · RMS ΔE {match['distance']:.3g}"
+        label = create_swatch_label(entry['kind'], name, entry['rgb'] if entry['external'] else None, title)
+        rows.append(html.Div(label, className='swatches-reversed' if match['reversed'] else None))
+    return rows
+
+# Link to the ZIP of every palette of a type (api.py), in all export formats
+def create_bulk_export(kind):
+    if kind is None:
+        return []
+    return [
+        html.H6('Bulk export:'),
+        html.A(dbc.Button(f'Download all {kind} palettes (.zip)', size='sm', outline=True, color='secondary'),
+               href=get_relative_path(f'/api/palettes/export.zip?kinds={kind}'), download=f'{kind}_palettes.zip'),
+        ]
+
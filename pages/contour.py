@@ -8,6 +8,8 @@ import pandas as pd
 import numpy as np
 from chart_functions import *
 from helper import *
+from figure_specs import contour_plot_spec
+from figure_cache import register_chart, get_figure
 
 
 # Create app page===============================================================
@@ -16,7 +18,7 @@ dash.register_page(__name__,  name='Contour')
 
 
 # Get data for the example plots
-df_seattle = pd.read_csv('.\data\seattle_weather_2014-2023.csv')
+df_seattle = pd.read_csv('./data/seattle_weather_2014-2023.csv')
 # Create pivot table to structure data for contour plot
 pivot_table = df_seattle.pivot_table(values='tmax', index='day', columns='n_month')
 # Replace NaN values with the average temperature for clarity
@@ -27,6 +29,10 @@ z = pivot_table.values
 x = pivot_table.columns
 y = pivot_table.index
 
+# Grids with more cells than this are drawn as a PNG image of the size of the plot (rows, columns)
+contour_raster = z.size > 1_000_000
+contour_max_shape = (540, graph_width_px())
+
 # Create components================================================================
 
 # Get list all named color scales
@@ -34,6 +40,13 @@ named_colorscales = px.colors.named_colorscales()
 
 #Create dropdown with options for color scales 
 dropdown_contour = create_dropdown('dropdown-countour-scale', named_colorscales, value='jet')
+
+# Create the contour plot for a colorscale (also pre-rendered by figure_cache.py); it has no template
+def build_contour(palette_name, template):
+    return contour_plot_spec(x, y, z, palette_name, raster=contour_raster, max_shape=contour_max_shape)
+
+register_chart('contour', 'contour-plot', build_contour, named_colorscales, chart_templates=(None,), 
+               colors=px.colors.get_colorscale, data=[z, x, y])
 dropdown_templates_contour = create_dropdown('dropdown-template-contour', templates, value='plotly_white')
 
 # Create the range slider for changing the size of the contour plot
@@ -178,8 +191,8 @@ def export_data_as_csv(n_clicks):
     Input('dropdown-countour-scale', 'value'),       
 )
 def update_contour(palette_name):   
-    # Create the contour plot figure    
-    contour_plot = create_contour_plot(x, y, z, palette_name)
+    # Get the contour plot figure from the cache
+    contour_plot = get_figure('contour', 'contour-plot', palette_name, None)
 
     return contour_plot, 2, False, False, 'fill'
 
@@ -191,9 +204,16 @@ def update_contour(palette_name):
     Input('transpose-contour', 'on'),
     Input('reversed-contour', 'on'),
     Input('radiogroup-coloring', 'value'),
+    State('dropdown-countour-scale', 'value'),
     prevent_initial_call=True
 )
-def update_interval(interval, transpose, reversed, coloring_method):        
+def update_interval(interval, transpose, reversed, coloring_method, palette_name):        
+    # The image of a rasterized contour is drawn again with all the settings
+    if contour_raster:
+        return contour_plot_spec(x, y, z, palette_name, size=interval, reversescale=reversed,
+                                 transpose=transpose, coloring=coloring_method, raster=True,
+                                 max_shape=contour_max_shape)
+
     # Create the path object to update the figure
     patch_contour = Patch()
 
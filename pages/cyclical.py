@@ -1,5 +1,6 @@
+from functools import partial
 import dash
-from dash import Dash, dcc, html, Input, Output, State, Patch, callback
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback, clientside_callback, no_update
 import dash_bootstrap_components as dbc
 import dash_daq as daq
 import plotly.express as px
@@ -7,6 +8,9 @@ import pandas as pd
 import numpy as np
 from chart_functions import *
 from helper import *
+from figure_specs import polar_subplots_spec
+from figure_cache import register_chart
+from palette_cvd import cvd_patches, simulate_figure
 
 
 # Create app page===============================================================
@@ -38,35 +42,29 @@ data_temperature = pd.DataFrame({
 
 # Create components================================================================
 
-# Get list all qualitative color scales names excluding internal attributes and 'swatches'
-swatches = [scale_name for scale_name in dir(px.colors.cyclical) 
-            if not scale_name.startswith("_") and not scale_name.startswith("swatches")]
+# Get list all cyclical color scales names; reversed palettes are chosen with the reverse switch.
+# The palettes of the catalog files are built on demand, not pre-rendered
+swatches = palette_names('cyclical', external=False)
+external_swatches = palette_names('cyclical', external=True)
 
-# Create Dropdown options for color swatches
-cyclical_dropdown_options = []
-
-# Assume the images are in the 'assets' folder
-for swatch_name in swatches:      
-    img_src = f"/assets/cyclical_swatches/{swatch_name}.png"   
-    cyclical_dropdown_options.append(
-        {'label': html.Div(html.Img(src=img_src, style={'width': '500px', 'height': '30px'}),
-                           style={'display': 'flex', 'padding-top': '2px'}),
-         'value': swatch_name })
-    
-# Create dropdown with options for color scales and templates
-dropdown_cyclical = create_dropdown('dropdown-cyclical-scale', cyclical_dropdown_options, value='IceFire_r')
+# Create dropdown with options for color scales and templates; palettes are searched on the server
+dropdown_cyclical = create_palette_dropdown('dropdown-cyclical-scale', 'cyclical', value='IceFire')
 dropdown_templates_cyclical = create_dropdown('dropdown-template-cyclical', templates, value='plotly')
+reverse_switch_cyclical = create_reverse_switch('reverse-cyclical', on=True)
+sort_cyclical = create_sort_dropdown('sort-cyclical', 'cyclical')
+cvd_cyclical = create_cvd_dropdown('cvd-cyclical')
 
 # Create buttons and modal window
 btn_save_options_cyclical = create_save_button('btn-save-options-cyclical')
 modal_save_options_cyclical = create_modal_save_options('modal-save-cyclical', 
                                                            'code-cyclical', 
                                                            'array-cyclical', 
-                                                           'btn-close-cyclical')
+                                                           'btn-close-cyclical',
+                                                           export_kind='cyclical')
 
 # Create subplots with color swatches
 palette_names = [i['name'] for i in px.colors.cyclical.swatches_cyclical().data]
-polar_sub = create_polar_subplots(palette_names) 
+polar_sub = polar_subplots_spec(palette_names) 
 
 # Define badge information 
 badge_info_cyclical = [    
@@ -81,9 +79,10 @@ badges_cyclical = create_badges(badge_info_cyclical)
 
 # Create page layout=================================================================
 layout = dbc.Container([
-    dbc.Row([dbc.Col(dropdown_cyclical, width=5),              
-             dbc.Col(dropdown_templates_cyclical, width=4),
-             dbc.Col([btn_save_options_cyclical, modal_save_options_cyclical], width=3), 
+    dbc.Row([dbc.Col([dropdown_cyclical, sort_cyclical], width=5),              
+             dbc.Col(reverse_switch_cyclical, width=2),
+             dbc.Col([dropdown_templates_cyclical, cvd_cyclical], width=3),
+             dbc.Col([btn_save_options_cyclical, modal_save_options_cyclical], width=2), 
         ]),
     dbc.Row([
         dbc.Col(
@@ -104,6 +103,26 @@ layout = dbc.Container([
         ]),    
 ])
 
+# Create figures for a palette and a template (also pre-rendered by figure_cache.py)
+def build_barpolar(palette_name, template):
+    return create_bar_polar_wind(data_wind, 'speed', 'direction', col_scale=palette_colors('cyclical', palette_name), 
+                                 bg_color=templates_dict.get(template), template=template)
+
+def build_scatter_temp(palette_name, template):
+    return create_scatter_temp(data_temperature, palette_colors('cyclical', palette_name), 
+                               template, templates_dict.get(template))
+
+def build_swatches(palette_name, template):
+    # The swatches show every palette, so they only depend on the template
+    return polar_subplots_spec(palette_names, template=template, bg_color=templates_dict.get(template))
+
+cyclical_colors = partial(palette_colors, 'cyclical')
+register_chart('cyclical', 'barpolar-wind', build_barpolar, swatches, colors=cyclical_colors, data=[data_wind],
+               reversible=True, on_demand=external_swatches)
+register_chart('cyclical', 'scatter-plot-temperature', build_scatter_temp, swatches, colors=cyclical_colors, 
+               data=[data_temperature], reversible=True, on_demand=external_swatches)
+register_chart('cyclical', 'swatches', build_swatches)
+
 # Callbacks=========================================================================
 
 # Callback for Modal Window
@@ -119,32 +138,86 @@ def toggle_modal(n1, n2, is_open):
         return not is_open
     return is_open
 
-# Callback for updating figures
+# List the palettes that look like the selected one when the export modal opens
 @callback(
+    Output('similar-cyclical', 'children'),
+    Input('modal-save-cyclical', 'is_open'),
+    State('dropdown-cyclical-scale', 'value'),
+    State('reverse-cyclical', 'on'),
+    prevent_initial_call=True
+)
+def show_similar_cyclical_palettes(is_open, palette_name, reverse):
+    if not is_open:
+        return no_update
+    return create_similar_palettes('cyclical', reversed_palette(palette_name, reverse))
+
+# Search and sort the palettes on the server, so the layout only holds the first few
+@callback(
+    Output('dropdown-cyclical-scale', 'options'),
+    Input('dropdown-cyclical-scale', 'search_value'),
+    Input('dropdown-cyclical-scale', 'value'),
+    Input('sort-cyclical', 'value'),
+    prevent_initial_call=True
+)
+def search_cyclical_palettes(search_value, palette_name, sort):
+    return palette_options('cyclical', search_value, palette_name, sort)
+
+# Flip the swatches of the dropdown while the palette is reversed
+clientside_callback(
+    """function (reverse) {
+        return reverse ? 'mb-3 swatches-reversed' : 'mb-3';
+    }""",
+    Output('dropdown-cyclical-scale', 'className'),
+    Input('reverse-cyclical', 'on'),
+)
+
+# Show the figures as seen with a color vision deficiency; the cached figures give the paths
+# of their colors, so only the colors are patched and nothing is built again
+@callback(
+    Output('barpolar-wind', 'figure', allow_duplicate=True),
+    Output('scatter-plot-temperature', 'figure', allow_duplicate=True),
+    Output('swatches', 'figure', allow_duplicate=True),
+    Input('cvd-cyclical', 'value'),
+    State('dropdown-cyclical-scale', 'value'),
+    State('reverse-cyclical', 'on'),
+    State('dropdown-template-cyclical', 'value'),
+    prevent_initial_call=True
+)
+def simulate_cyclical_figures(deficiency, palette_name, reverse, template):
+    return cvd_patches('cyclical', ['barpolar-wind', 'scatter-plot-temperature', 'swatches'],
+                       reversed_palette(palette_name, reverse), template, deficiency)
+
+# Load the figures from the figure API, which browsers and proxies can cache
+clientside_callback(
+    """function (palette, reverse, template, cvd) {
+        return window.dash_clientside.figure_api.load('cyclical', ['barpolar-wind', 'scatter-plot-temperature', 'swatches'], 
+                                                      reverse ? palette + '_r' : palette, template, cvd);
+    }""",
     Output('barpolar-wind', 'figure'), 
     Output('scatter-plot-temperature', 'figure'), 
+    Output('swatches', 'figure'),
+    Input('dropdown-cyclical-scale', 'value'), 
+    Input('reverse-cyclical', 'on'),
+    Input('dropdown-template-cyclical', 'value'),
+    State('cvd-cyclical', 'value'),
+)
+
+# Callback for updating the saving options
+@callback(
     Output('code-cyclical', 'children'),
     Output('array-cyclical', 'children'), 
-    Output('swatches', 'figure'),
     Input('dropdown-cyclical-scale', 'value'), 
+    Input('reverse-cyclical', 'on'),
     Input('dropdown-template-cyclical', 'value'),
   
 )
-def update_output_for_figures(palette_name, template,):    
-    # Access the selected colorscale dynamically    
-    colorscale = getattr(px.colors.cyclical, palette_name)  
+def update_output_for_figures(palette_name, reverse, template,):    
+    # Access the selected colorscale dynamically, reversed if the switch is on
+    palette_name = reversed_palette(palette_name, reverse)
+    colorscale = palette_colors('cyclical', palette_name)  
 
     # Construct the full name dynamically
-    full_palette_name = f'px.colors.cyclical.{palette_name}'    
-       
-    # Get the background color
-    bg_color = templates_dict.get(template)     
-    
-    # Create the barpolar plot figure
-    barpolar_plot = create_bar_polar_wind(data_wind, 'speed', 'direction',
-                                          col_scale=colorscale, bg_color=bg_color, template=template)  
-    # Create the scatter plot figure
-    scatter_temp = create_scatter_temp(data_temperature, colorscale, template, bg_color) 
+    import_line, full_palette_name = palette_code('cyclical', palette_name)
 
     # Create Markdown objects for saving options
     md_array = html.Div(
@@ -157,11 +230,9 @@ def update_output_for_figures(palette_name, template,):
     md_code = html.Div(
         dcc.Markdown(f'''
             ```python
-            import plotly.express as px 
+            {import_line}
             {full_palette_name}
             ```
             ''')) 
-   
-    pb = create_polar_subplots(palette_names).update_layout(template=template, paper_bgcolor=bg_color)  
     
-    return barpolar_plot, scatter_temp, md_code, md_array, pb
\ No newline at end of file
+    return md_code, md_array
\ No newline at end of file
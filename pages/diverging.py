@@ -1,39 +1,40 @@
+from functools import partial
 import dash
-from dash import Dash, dcc, html, Input, Output, State, Patch, callback
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback, clientside_callback, no_update
 import dash_bootstrap_components as dbc
 import dash_daq as daq
 import plotly.express as px
 import pandas as pd
 from chart_functions import *
 from helper import *
+from figure_specs import colorscale_bar_v_spec, heatmap_spec
+from figure_cache import register_chart, get_figure
+from palette_cvd import cvd_patches, simulate_figure, simulate_colors
+from downsampling import needs_lod, heatmap_lod_updates, relayout_ranges
 
 dash.register_page(__name__, name='Diverging')
 
 # Get data for the example plots
 
-df_cpi = pd.read_csv(".\data\Consumer Price Index for All Urban Consumers (CPI-U) Gasoline 2013-2023.csv", low_memory=False, index_col=0)
+df_cpi = pd.read_csv("./data/Consumer Price Index for All Urban Consumers (CPI-U) Gasoline 2013-2023.csv", low_memory=False, index_col=0)
 df_cpi.index = df_cpi.index.astype(str)
 
-df_europe = pd.read_csv('.\data\Life_Expectancy_Europe_2023.csv', low_memory=False)
+df_europe = pd.read_csv('./data/Life_Expectancy_Europe_2023.csv', low_memory=False)
 tickvals_y = df_europe ['All'].agg(['min', 'mean', 'max']).to_list()
 avg_lifeExp = df_europe ['All'].mean()
 map_title=f'Life Expectancy in Europe <br><sub>Average life expectancy in 2023 was {avg_lifeExp:.0f} years'
 
+# Larger matrices are pooled to about the pixel size of the heatmap (rows, columns)
+heatmap_max_shape = (430, graph_width_px(7))
+heatmap_pooling = 'mean'
+# Matrices with more cells than this are sent as a PNG image
+heatmap_raster = df_cpi.size > 1_000_000
 
-# Get list all qualitative color scales names excluding internal attributes, 'swatches', and 'swatches_continuous' 
-swatches = [scale_name for scale_name in dir(px.colors.diverging) 
-            if not scale_name.startswith("_") and scale_name not in ['swatches', 'swatches_continuous']]
 
-# Create Dropdown options for color swatches
-diverging_dropdown_options = []
-
-# Assume the images are in the 'assets' folder
-for swatch_name in swatches:      
-    img_src = f"/assets/diverging_swatches/{swatch_name}.png"   
-    diverging_dropdown_options.append(
-        {'label': html.Div(html.Img(src=img_src, style={'width': '500px', 'height': '30px'}),
-                           style={'display': 'flex', 'padding-top': '2px'}),
-         'value': swatch_name })
+# Get list all diverging color scales names; reversed palettes are chosen with the reverse switch.
+# The palettes of the catalog files are built on demand, not pre-rendered
+swatches = palette_names('diverging', external=False)
+external_swatches = palette_names('diverging', external=True)
 
 # Define badge information 
 badge_info_diverging = [ 
@@ -47,9 +48,12 @@ badge_info_diverging = [
 # Create badges for each badge information
 badges_diverging = create_badges(badge_info_diverging)
  
-# Create dropdown with options for color scales and templates
-dropdown_diverging = create_dropdown('dropdown-diverging-scale', diverging_dropdown_options, value='Spectral')
+# Create dropdown with options for color scales and templates; palettes are searched on the server
+dropdown_diverging = create_palette_dropdown('dropdown-diverging-scale', 'diverging', value='Spectral')
 dropdown_templates_diverging = create_dropdown('dropdown-template-diverging', templates, value='plotly')
+reverse_switch_diverging = create_reverse_switch('reverse-diverging')
+sort_diverging = create_sort_dropdown('sort-diverging', 'diverging')
+cvd_diverging = create_cvd_dropdown('cvd-diverging')
 
 
 # Create buttons and modal window
@@ -58,23 +62,26 @@ modal_save_options_diverging = create_modal_save_options(
                                     'modal-save-diverging',
                                     'code-diverging', 
                                     'array-diverging', 
-                                    'btn-close-diverging')
+                                    'btn-close-diverging',
+                                    export_kind='diverging')
 
     
 # Create app layout=================================================================
 layout = dbc.Container([
     dbc.Row([
-        dbc.Col(dropdown_diverging, width=5),         
-        dbc.Col([html.H6('Show Values', className='mx-2'),
-                daq.BooleanSwitch(id='boolean-switch', on=False)],
-            width=2, className='d-flex justify-content-center p-1'),
-        dbc.Col(dropdown_templates_diverging, width=3),
+        dbc.Col([dropdown_diverging, sort_diverging], width=5),         
+        dbc.Col([reverse_switch_diverging,
+                 html.H6('Show Values', className='mx-2'),
+                 daq.BooleanSwitch(id='boolean-switch', on=False)],
+            width=3, className='d-flex justify-content-center p-1'),
+        dbc.Col([dropdown_templates_diverging, cvd_diverging], width=2),
         dbc.Col([btn_save_options_diverging, modal_save_options_diverging], width=2), 
         ]),
     dbc.Row(dbc.Col(dbc.Card(dcc.Graph(id='color-bar-diverging', config=config_mode), body=True), width=12)),
     dbc.Row([
         dbc.Col([      
-            dbc.Card(dcc.Graph(id='hmap-diverging', config=config_mode), body=True)], 
+            dbc.Card(dcc.Graph(id='hmap-diverging', config=config_mode), body=True),
+            dcc.Store(id='hmap-diverging-window')], 
             width=7),
         dbc.Col([                            
             dbc.Card(dcc.Graph(id='map-diverging', config=config_mode), body=True)],
@@ -90,6 +97,33 @@ layout = dbc.Container([
 ])
 
 
+# Create figures for a palette and a template (also pre-rendered by figure_cache.py)
+def build_colorscale_bar(palette_name, template):
+    colorscale = palette_colors('diverging', palette_name)
+    return colorscale_bar_v_spec(palette_name, colorscale, len(colorscale), templates_dict.get(template), template)
+
+def build_heatmap(palette_name, template, window=None):
+    window = window or {}
+    return heatmap_spec(df_cpi, col_scale=palette_colors('diverging', palette_name), 
+                        bg_color=templates_dict.get(template), template=template,
+                        max_shape=heatmap_max_shape, pooling=heatmap_pooling,
+                        x_range=window.get('xaxis'), y_range=window.get('yaxis'), raster=heatmap_raster)
+
+def build_map(palette_name, template):
+    return create_map_with_avg_values(df_europe, locations="iso_alpha3", color_v="All",
+                                      bg_color=templates_dict.get(template), template=template, 
+                                      col_scale=palette_colors('diverging', palette_name), 
+                                      avg_v=avg_lifeExp, title=map_title, tickvals_y=tickvals_y, width_px=graph_width_px(5))
+
+diverging_colors = partial(palette_colors, 'diverging')
+register_chart('diverging', 'hmap-diverging', build_heatmap, swatches, colors=diverging_colors, data=[df_cpi],
+               reversible=True, on_demand=external_swatches)
+register_chart('diverging', 'map-diverging', build_map, swatches, colors=diverging_colors, data=[df_europe],
+               reversible=True, on_demand=external_swatches)
+register_chart('diverging', 'color-bar-diverging', build_colorscale_bar, swatches, colors=diverging_colors,
+               reversible=True, on_demand=external_swatches)
+
+
 # Callback ========================================================================
 
 # Callback for Modal Window
@@ -105,30 +139,89 @@ def toggle_modal(n1, n2, is_open):
         return not is_open
     return is_open
 
-# Callback for updating the heatmap and map
+# List the palettes that look like the selected one when the export modal opens
 @callback(
-    Output('hmap-diverging', 'figure'),
+    Output('similar-diverging', 'children'),
+    Input('modal-save-diverging', 'is_open'),
+    State('dropdown-diverging-scale', 'value'),
+    State('reverse-diverging', 'on'),
+    prevent_initial_call=True
+)
+def show_similar_diverging_palettes(is_open, palette_name, reverse):
+    if not is_open:
+        return no_update
+    return create_similar_palettes('diverging', reversed_palette(palette_name, reverse))
+
+# Search and sort the palettes on the server, so the layout only holds the first few
+@callback(
+    Output('dropdown-diverging-scale', 'options'),
+    Input('dropdown-diverging-scale', 'search_value'),
+    Input('dropdown-diverging-scale', 'value'),
+    Input('sort-diverging', 'value'),
+    prevent_initial_call=True
+)
+def search_diverging_palettes(search_value, palette_name, sort):
+    return palette_options('diverging', search_value, palette_name, sort)
+
+# Flip the swatches of the dropdown while the palette is reversed
+clientside_callback(
+    """function (reverse) {
+        return reverse ? 'mb-3 swatches-reversed' : 'mb-3';
+    }""",
+    Output('dropdown-diverging-scale', 'className'),
+    Input('reverse-diverging', 'on'),
+)
+
+# Show the figures as seen with a color vision deficiency; the cached figures give the paths
+# of their colors, so only the colors are patched and nothing is built again
+@callback(
+    Output('hmap-diverging', 'figure', allow_duplicate=True),
+    Output('map-diverging', 'figure', allow_duplicate=True),
+    Output('color-bar-diverging', 'figure', allow_duplicate=True),
+    Input('cvd-diverging', 'value'),
+    State('dropdown-diverging-scale', 'value'),
+    State('reverse-diverging', 'on'),
+    State('dropdown-template-diverging', 'value'),
+    prevent_initial_call=True
+)
+def simulate_diverging_figures(deficiency, palette_name, reverse, template):
+    return cvd_patches('diverging', ['hmap-diverging', 'map-diverging', 'color-bar-diverging'],
+                       reversed_palette(palette_name, reverse), template, deficiency)
+
+# Load the map and colorbar from the figure API, which browsers and proxies can cache
+clientside_callback(
+    """function (palette, reverse, template, cvd) {
+        return window.dash_clientside.figure_api.load('diverging', ['map-diverging', 'color-bar-diverging'], 
+                                                      reverse ? palette + '_r' : palette, template, cvd);
+    }""",
     Output('map-diverging', 'figure'), 
     Output('color-bar-diverging', 'figure'),
+    Input('dropdown-diverging-scale', 'value'),
+    Input('reverse-diverging', 'on'),
+    Input('dropdown-template-diverging', 'value'), 
+    State('cvd-diverging', 'value'),
+)
+
+# Callback for updating the heatmap
+@callback(
+    Output('hmap-diverging', 'figure'),
     Output('code-diverging', 'children'),
     Output('array-diverging', 'children'),
     Input('dropdown-diverging-scale', 'value'),
+    Input('reverse-diverging', 'on'),
     Input('dropdown-template-diverging', 'value'), 
     State('boolean-switch', 'on'),  
+    State('hmap-diverging-window', 'data'),
+    State('cvd-diverging', 'value'),
 )
-def update_output_for_figures(palette_name, template, on):    
-    # Access the selected colorscale dynamically
-    colorscale = getattr(px.colors.diverging, palette_name)     
+def update_output_for_figures(palette_name, reverse, template, on, window, deficiency):    
+    # Access the selected colorscale dynamically, reversed if the switch is on
+    palette_name = reversed_palette(palette_name, reverse)
+    colorscale = palette_colors('diverging', palette_name)     
     
     # Construct the full name dynamically
-    full_palette_name = f'px.colors.diverging.{palette_name}'  
-    
-    # Get the number of colors
-    n_colors = len(colorscale)
+    import_line, full_palette_name = palette_code('diverging', palette_name)
     
-    # Get the background color
-    bg_color = templates_dict.get(template)
-
     # Create Markdown objects for saving options
     md_array = html.Div(
             dcc.Markdown(f'''
@@ -140,38 +233,94 @@ def update_output_for_figures(palette_name, template, on):
     md_code = html.Div(
         dcc.Markdown(f'''
             ```python
-            import plotly.express as px 
+            {import_line}
             {full_palette_name}
             ```
             '''))   
     
-    # Create the colorbar for the selected colorscale
-    cb = create_colorscale_bar_v(palette_name, colorscale, n_colors, bg_color, template)
-
-    # Create the heatmap figure
-    h_map = create_heatmap(df_cpi, col_scale=colorscale, bg_color=bg_color, template=template)
-    if on:
-        h_map['data'][0]['text'] = df_cpi.values
-    
-    # Create the map figure
-    d_map = create_map_with_avg_values(df_europe, locations="iso_alpha3", color_v="All",
-                                       bg_color=bg_color, template=template, col_scale=colorscale, 
-                                       avg_v=avg_lifeExp, title=map_title, tickvals_y=tickvals_y)
+    # Get the heatmap figure; a zoomed heatmap is built for its window
+    if window is None:
+        h_map = get_figure('diverging', 'hmap-diverging', palette_name, template)
+    else:
+        h_map = build_heatmap(palette_name, template, window)
+    h_map = simulate_figure(h_map, deficiency)
+    if on and not heatmap_raster:
+        h_map['data'][0]['text'] = h_map['data'][0]['z']
     
-    return h_map, d_map, cb, md_code, md_array
+    return h_map, md_code, md_array
     
 # Callback for toggle the boolean switch
 @callback(
     Output('hmap-diverging', 'figure', allow_duplicate=True),   
     Input('boolean-switch', 'on'),
+    State('hmap-diverging-window', 'data'),
     prevent_initial_call=True
 )  
-def toggle_boolean_switch(n):  
+def toggle_boolean_switch(n, window):  
+    # A rasterized heatmap has no cells to write the values on
+    if heatmap_raster:
+        return no_update
+
     patch_hm = Patch()
 
     if n:
-        patch_hm['data'][0]['text'] = df_cpi.values
+        if needs_lod(df_cpi.shape, heatmap_max_shape):
+            window = window or {}
+            trace, _ = heatmap_lod_updates(df_cpi, heatmap_max_shape, heatmap_pooling, '',
+                                           window.get('xaxis'), window.get('yaxis'))
+            patch_hm['data'][0]['text'] = trace['z']
+        else:
+            patch_hm['data'][0]['text'] = df_cpi.values
         return patch_hm
     else:
         patch_hm['data'][0]['text'] = None
         return patch_hm
+
+# Callback for refining the heatmap to the zoomed window
+@callback(
+    Output('hmap-diverging', 'figure', allow_duplicate=True),
+    Output('hmap-diverging-window', 'data'),
+    Input('hmap-diverging', 'relayoutData'),
+    State('hmap-diverging-window', 'data'),
+    State('boolean-switch', 'on'),
+    State('dropdown-diverging-scale', 'value'),
+    State('reverse-diverging', 'on'),
+    State('cvd-diverging', 'value'),
+    prevent_initial_call=True
+)
+def refine_heatmap(relayout_data, window, on, palette_name, reverse, deficiency):
+    # Small matrices are sent in full, so there is nothing to refine
+    if not relayout_data or not needs_lod(df_cpi.shape, heatmap_max_shape):
+        return no_update, no_update
+
+    window, changed = relayout_ranges(relayout_data, window)
+    if not changed:
+        return no_update, no_update
+
+    # A rasterized heatmap gets a new image of the window with its hover and colorbar traces,
+    # drawn with the colors of the selected color vision deficiency
+    if heatmap_raster:
+        colors = simulate_colors(palette_colors('diverging', reversed_palette(palette_name, reverse)), deficiency)
+        h_map = heatmap_spec(df_cpi, colors, None, None,
+                             max_shape=heatmap_max_shape, pooling=heatmap_pooling,
+                             x_range=window.get('xaxis'), y_range=window.get('yaxis'), raster=True)
+        patch_hm = Patch()
+        patch_hm['data'] = h_map['data']
+        for axis in ('xaxis', 'yaxis'):
+            patch_hm['layout'][axis]['tickvals'] = h_map['layout'][axis]['tickvals']
+            patch_hm['layout'][axis]['ticktext'] = h_map['layout'][axis]['ticktext']
+        return patch_hm, window
+
+    # Only the visible rows and columns are pooled, so the payload stays the same size at any zoom
+    trace, layout = heatmap_lod_updates(df_cpi, heatmap_max_shape, heatmap_pooling, '',
+                                        window.get('xaxis'), window.get('yaxis'))
+    patch_hm = Patch()
+    for key in ('x', 'y', 'z'):
+        patch_hm['data'][0][key] = trace[key]
+    if on:
+        patch_hm['data'][0]['text'] = trace['z']
+    for axis in ('xaxis', 'yaxis'):
+        patch_hm['layout'][axis]['tickvals'] = layout[axis]['tickvals']
+        patch_hm['layout'][axis]['ticktext'] = layout[axis]['ticktext']
+
+    return patch_hm, window
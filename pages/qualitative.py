@@ -1,9 +1,15 @@
+from functools import partial
 import dash
-from dash import Dash, dcc, html, Input, Output, State, Patch, callback, ctx
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback, clientside_callback, ctx
 import dash_bootstrap_components as dbc
 import pandas as pd
 from chart_functions import *
 from helper import *
+from figure_cache import register_chart, get_figure
+from palette_cvd import cvd_patches, simulate_figure, simulate_colors
+from palette_builder import build_palette, palette_patches
+from palette_assignment import assign_colors
+from figure_specs import colorscale_bar_v_spec, pie_chart_spec
 
 
 # Create app page===============================================================
@@ -20,20 +26,11 @@ df_tips['day'] = pd.Categorical(df_tips['day'], categories=custom_order, ordered
 # Sort the dataframe based on the custom order
 sorted_df = df_tips.sort_values('day')
 
-# Get list all qualitative color scales names excluding internal attributes, 'swatches', and 'swatches_continuous' 
-swatches = [scale_name for scale_name in dir(px.colors.qualitative) 
-            if not scale_name.startswith("_") and scale_name not in ['swatches', 'swatches_continuous']]
+# Get list all qualitative color scales names; reversed palettes are chosen with the reverse switch.
+# The palettes of the catalog files are built on demand, not pre-rendered
+swatches = palette_names('qualitative', external=False)
+external_swatches = palette_names('qualitative', external=True)
 
-# Create Dropdown options for color swatches
-qualitative_dropdown_options = []
-
-for swatch_name in swatches:      
-    img_src = f"/assets/qualitative_swatches/{swatch_name}.png"   
-    qualitative_dropdown_options.append(
-        {'label': html.Div(html.Img(src=img_src, style={'width': '500px', 'height': '30px'}),
-                           style={'display': 'flex', 'padding-top': '2px'}),
-         'value': swatch_name })
-    
 # Define badge information 
 badge_info_qualitative = [ 
     {"text": "Pie Charts", "href": "https://plotly.com/python/pie-charts/"},
@@ -53,13 +50,18 @@ btn_save_options_qualitative = create_save_button('btn-save-options-qualitative'
 modal_save_options_qualitative = create_modal_save_options('modal-save-qualitative', 
                                                            'code-qualitative', 
                                                            'array-qualitative', 
-                                                           'btn-close-qualitative')
+                                                           'btn-close-qualitative',
+                                                           export_kind='qualitative')
 
 btn_info_qualitative = create_info_button_popover('slider-info', popover_range_slider_content)
 
-# Create dropdown with options for color scales and templates
-dropdown_qualitative = create_dropdown('dropdown-qualitative-scale', qualitative_dropdown_options, value='Bold')
+# Create dropdown with options for color scales and templates; palettes are searched on the server
+dropdown_qualitative = create_palette_dropdown('dropdown-qualitative-scale', 'qualitative', value='Bold')
 dropdown_templates_qualitative = create_dropdown('dropdown-template-qualitative', templates, value='plotly')
+reverse_switch_qualitative = create_reverse_switch('reverse-qualitative')
+sort_qualitative = create_sort_dropdown('sort-qualitative', 'qualitative')
+cvd_qualitative = create_cvd_dropdown('cvd-qualitative')
+builder_qualitative = create_palette_builder('qualitative', anchors=('#1f77b4', '#d62728', '#2ca02c'), n_colors=6)
 
 # Create the range slider
 two_side_slider = dcc.RangeSlider(
@@ -96,10 +98,12 @@ layout = dbc.Container([
     dcc.Store(id='store-chosen-colors'),
     
     dbc.Row([
-        dbc.Col(dropdown_qualitative, width=5),        
-        dbc.Col(dropdown_templates_qualitative, width=4),
-        dbc.Col([btn_save_options_qualitative, modal_save_options_qualitative], width=3),
+        dbc.Col([dropdown_qualitative, sort_qualitative], width=5),        
+        dbc.Col(reverse_switch_qualitative, width=2),
+        dbc.Col([dropdown_templates_qualitative, cvd_qualitative], width=3),
+        dbc.Col([btn_save_options_qualitative, modal_save_options_qualitative], width=2),
         ]),    
+    dbc.Row(dbc.Col(builder_qualitative, width=12)),
 
     dbc.Row(dbc.Col([dbc.Card(dcc.Graph(id='color-bar-qualitative', config=config_mode), body=True),
                      html.Div(two_side_slider, className='m-3')], width=12)),
@@ -109,8 +113,12 @@ layout = dbc.Container([
             html.Div(id='output-range-slider-value'), 
             btn_info_qualitative], 
             width=3, class_name='d-flex justify-content-space-between'),        
-        dbc.Col(id='output-range-slider-colors', width=8),
-        dbc.Col(dbc.Button('Apply', id='apply-colors', n_clicks=0), width=1 , class_name='align-content-center'),
+        dbc.Col(id='output-range-slider-colors', width=7),
+        dbc.Col([dbc.Button('Apply', id='apply-colors', n_clicks=0),
+                 dbc.Button('Most distinct', id='distinct-colors', n_clicks=0, outline=True, className='ms-2'),
+                 dbc.Tooltip('Pick the colors of the palette farthest apart for the categories of the charts, '
+                             'away from the background', target='distinct-colors')],
+                width=2, class_name='align-content-center'),
         ], class_name='mb-3'),  
 
     dbc.Row([
@@ -152,6 +160,98 @@ def toggle_modal(n1, n2, is_open):
         return not is_open
     return is_open
 
+# Create figures for a palette and a template (also pre-rendered by figure_cache.py)
+def build_colorscale_bar(palette_name, template):
+    colorscale = palette_colors('qualitative', palette_name)
+    return colorscale_bar_v_spec(palette_name, colorscale, len(colorscale), 
+                                 bg_color=templates_dict.get(template), template=template)
+
+def build_pie_chart(palette_name, template):
+    return pie_chart_spec(df_tips, values='tip', names='day', col_scale=palette_colors('qualitative', palette_name),
+                          bg_color=templates_dict.get(template), template=template)
+
+def build_scatter_plot(palette_name, template):
+    return create_scatter_plot_with_colorbar(sorted_df, x='total_bill',  y='tip',  color_v='day', size_v='tip', 
+                                             col_scale=palette_colors('qualitative', palette_name), 
+                                             bg_color=templates_dict.get(template), template=template)
+
+qualitative_colors = partial(palette_colors, 'qualitative')
+register_chart('qualitative', 'color-bar-qualitative', build_colorscale_bar, swatches, colors=qualitative_colors,
+               reversible=True, on_demand=external_swatches)
+register_chart('qualitative', 'pie-qualitative', build_pie_chart, swatches, colors=qualitative_colors, data=[df_tips],
+               reversible=True, on_demand=external_swatches)
+register_chart('qualitative', 'scatter-qualitative', build_scatter_plot, swatches, colors=qualitative_colors, 
+               data=[sorted_df], reversible=True, on_demand=external_swatches)
+
+# List the palettes that look like the selected one when the export modal opens
+@callback(
+    Output('similar-qualitative', 'children'),
+    Input('modal-save-qualitative', 'is_open'),
+    State('dropdown-qualitative-scale', 'value'),
+    State('reverse-qualitative', 'on'),
+    prevent_initial_call=True
+)
+def show_similar_qualitative_palettes(is_open, palette_name, reverse):
+    if not is_open:
+        return dash.no_update
+    return create_similar_palettes('qualitative', reversed_palette(palette_name, reverse))
+
+# Search and sort the palettes on the server, so the layout only holds the first few
+@callback(
+    Output('dropdown-qualitative-scale', 'options'),
+    Input('dropdown-qualitative-scale', 'search_value'),
+    Input('dropdown-qualitative-scale', 'value'),
+    Input('sort-qualitative', 'value'),
+    prevent_initial_call=True
+)
+def search_qualitative_palettes(search_value, palette_name, sort):
+    return palette_options('qualitative', search_value, palette_name, sort)
+
+# Flip the swatches of the dropdown while the palette is reversed
+clientside_callback(
+    """function (reverse) {
+        return reverse ? 'mb-3 swatches-reversed' : 'mb-3';
+    }""",
+    Output('dropdown-qualitative-scale', 'className'),
+    Input('reverse-qualitative', 'on'),
+)
+
+# Show the figures as seen with a color vision deficiency; the cached figures give the paths
+# of their colors, so only the colors are patched and nothing is built again. While the builder
+# is open the charts show the built palette, so that palette is simulated; otherwise the chosen
+# colors the charts show are simulated, as update_output applies them
+@callback(
+    Output('color-bar-qualitative', 'figure', allow_duplicate=True),
+    Output('pie-qualitative', 'figure', allow_duplicate=True),
+    Output('scatter-qualitative', 'figure', allow_duplicate=True),
+    Input('cvd-qualitative', 'value'),
+    State('dropdown-qualitative-scale', 'value'),
+    State('reverse-qualitative', 'on'),
+    State('dropdown-template-qualitative', 'value'),
+    State('builder-qualitative-collapse', 'is_open'),
+    State('builder-qualitative-anchors', 'data'),
+    State('builder-qualitative-n', 'value'),
+    State('builder-qualitative-space', 'value'),
+    State('store-chosen-colors', 'data'),
+    prevent_initial_call=True
+)
+def simulate_qualitative_figures(deficiency, palette_name, reverse, template, builder_open, anchors, n_colors, space,
+                                 chosen_colors):
+    palette_name = reversed_palette(palette_name, reverse)
+    if builder_open:
+        colors, _ = build_palette(tuple(anchors), n_colors, space)
+        return qualitative_palette_patches('Custom', colors, palette_name, template, deficiency)
+
+    patch_bar, patch_pie, patch_scatter = cvd_patches(
+        'qualitative', ['color-bar-qualitative', 'pie-qualitative', 'scatter-qualitative'], palette_name, template, deficiency)
+    # The chosen colors are assigned after the palette colors, so they win
+    if chosen_colors:
+        shown = simulate_colors(chosen_colors, deficiency)
+        patch_pie['layout']['piecolorway'] = shown
+        for i, color in enumerate(shown[:4]):
+            patch_scatter.data[i].marker.color = color
+    return patch_bar, patch_pie, patch_scatter
+
 # Callback for updating the output of the colorscale bar and range slider
 @callback(
     Output('color-bar-qualitative', 'figure'),    
@@ -163,18 +263,18 @@ def toggle_modal(n1, n2, is_open):
     Output('code-qualitative', 'children'),
     Output('array-qualitative', 'children'),
     Input('dropdown-qualitative-scale', 'value'),  
+    Input('reverse-qualitative', 'on'),
     Input('dropdown-template-qualitative', 'value'), 
     State('store-chosen-colors', 'data'),              # Save the choosen colors in the store
+    State('cvd-qualitative', 'value'),
 )
-def update_output(palette_name, template, colors):    
-    # Access the selected colorscale dynamically
-    colorscale = getattr(px.colors.qualitative, palette_name)     
+def update_output(palette_name, reverse, template, colors, deficiency):    
+    # Access the selected colorscale dynamically, reversed if the switch is on
+    palette_name = reversed_palette(palette_name, reverse)
+    colorscale = palette_colors('qualitative', palette_name)     
     
     # Construct the full name dynamically
-    full_palette_name = f'px.colors.qualitative.{palette_name}' 
-
-     # Get the background color
-    bg_color = templates_dict.get(template) 
+    import_line, full_palette_name = palette_code('qualitative', palette_name)
 
     # Get the number of colors
     n_colors = len(colorscale)
@@ -193,37 +293,42 @@ def update_output(palette_name, template, colors):
     md_code = html.Div(
         dcc.Markdown(f'''
             ```python
-            import plotly.express as px 
+            {import_line}
             {full_palette_name}
             ```
             '''))         
    
-    # Create the colorscale bar for the selected colorscale
-    colorscale_bar = create_colorscale_bar_v(palette_name, colorscale, n_colors, bg_color, template)  
-
-    # Create the pie chart
-    pie_chart = create_pie_chart(df_tips, values='tip', names='day', col_scale=colorscale,
-                                 bg_color=bg_color, template=template) 
-
-    # Create the scatter plot
-    scatter_plot = create_scatter_plot_with_colorbar(sorted_df, x='total_bill',  y='tip',  color_v='day', size_v='tip', 
-                                                     col_scale=colorscale, bg_color=bg_color, template=template)
+    # Get the colorscale bar, pie chart and scatter plot from the cache
+    colorscale_bar = get_figure('qualitative', 'color-bar-qualitative', palette_name, template)
+    pie_chart = get_figure('qualitative', 'pie-qualitative', palette_name, template)
+    scatter_plot = get_figure('qualitative', 'scatter-qualitative', palette_name, template)
     
-    if ctx.triggered_id == 'dropdown-qualitative-scale':
+    if ctx.triggered_id in ('dropdown-qualitative-scale', 'reverse-qualitative'):
         colors = None
 
     elif colors:
-        pie_chart.update_layout(piecolorway=colors)
+        pie_chart['layout']['piecolorway'] = colors
         if len(colors) <= 4:            
             for i in range(len(colors)):
-                scatter_plot.data[i].marker.color = colors[i]
+                scatter_plot['data'][i]['marker']['color'] = colors[i]
         else: 
             for i in range(4):
-                scatter_plot.data[i].marker.color = colors[i]
+                scatter_plot['data'][i]['marker']['color'] = colors[i]
+
+    # The figures are shown as seen with the selected color vision deficiency
+    for figure in (colorscale_bar, pie_chart, scatter_plot):
+        simulate_figure(figure, deficiency)
     
     return  colorscale_bar, colorscale ,n_colors, marks, pie_chart, scatter_plot, md_code, md_array
 
 
+# Show the chosen colors with a copy button
+def chosen_colors_output(colors):
+    return html.Div([dcc.Markdown(f"```python\nColors: {colors}\n```", id='range-output', 
+                                  style={'height': '55px', 'overflowY': 'scroll'}),
+                     dcc.Clipboard(id='copy-array', target_id='range-output')], 
+                    className='d-flex justify-content-start')
+
 # Callback for updating the output of the range slider
 @callback(
     Output('output-range-slider-value', 'children'),
@@ -241,10 +346,7 @@ def update_output(colors, values):
     return (dcc.Markdown(f"```python\nSelected range: {values}\n```", 
                          style={'height': '55px', 'width': '250px', 'textAlign': 'center', }), 
                          
-            html.Div([dcc.Markdown(f"```python\nColors: {range_colors}\n```", id='range-output', 
-                                   style={'height': '55px', 'overflowY': 'scroll'}),
-                      dcc.Clipboard(id='copy-array', target_id='range-output')], 
-                className='d-flex justify-content-start'),  
+            chosen_colors_output(range_colors),
 
             range_colors)
 
@@ -275,6 +377,34 @@ def update_pie_and_scatter(colors, n):
 
 
 
+# Assign the most distinct colors of the palette to the categories of the charts, in order and away
+# from the background of the template; the charts are patched as the Apply button does
+@callback(
+    Output('store-chosen-colors', 'data', allow_duplicate=True),
+    Output('output-range-slider-colors', 'children', allow_duplicate=True),
+    Output('pie-qualitative', 'figure', allow_duplicate=True),
+    Output('scatter-qualitative', 'figure', allow_duplicate=True),
+    Input('distinct-colors', 'n_clicks'),
+    State('dropdown-qualitative-scale', 'value'),
+    State('reverse-qualitative', 'on'),
+    State('dropdown-template-qualitative', 'value'),
+    State('cvd-qualitative', 'value'),
+    prevent_initial_call=True
+)
+def assign_distinct_colors(n, palette_name, reverse, template, deficiency):
+    colors = palette_colors('qualitative', reversed_palette(palette_name, reverse))
+    colors, _, _ = assign_colors(tuple(colors), df_tips['day'].nunique(), templates_dict.get(template))
+    shown = simulate_colors(colors, deficiency)
+
+    patch_pie = Patch()
+    patch_pie['layout']['piecolorway'] = shown
+    patch_scatter = Patch()
+    for i, color in enumerate(shown):
+        patch_scatter.data[i].marker.color = color
+
+    return list(colors), chosen_colors_output(list(colors)), patch_pie, patch_scatter
+
+
 # Callback for update the hole size in pie
 @callback(
     Output('pie-qualitative', 'figure', allow_duplicate=True),    
@@ -309,10 +439,11 @@ def update_scatter(opacity):
     Output('slider-pie', 'value'),
     Output('slider-scatter', 'value'),        
     Input('dropdown-qualitative-scale', 'value'), 
+    Input('reverse-qualitative', 'on'),
     Input('dropdown-template-qualitative', 'value'),
     prevent_initial_call=True  
 ) 
-def reset_slider_value(color, template):     
+def reset_slider_value(color, reverse, template):     
     # Reset the slider values to the initial state
      return 0, 1, 
 
@@ -321,10 +452,77 @@ def reset_slider_value(color, template):
 @callback(    
     Output('range-slider', 'value', allow_duplicate=True),        
     Input('dropdown-qualitative-scale', 'value'),     
+    Input('reverse-qualitative', 'on'),
       prevent_initial_call=True  
 ) 
-def reset_slider_value(color):     
+def reset_slider_value(color, reverse):     
     # Reset the slider values to the initial state
      return [1, 4]
-    
-   
+
+# Palette builder ===================================================================
+
+# Open and close the palette builder
+@callback(
+    Output('builder-qualitative-collapse', 'is_open'),
+    Input('builder-qualitative-toggle', 'n_clicks'),
+    State('builder-qualitative-collapse', 'is_open'),
+    prevent_initial_call=True
+)
+def toggle_qualitative_builder(n, is_open):
+    return not is_open
+
+# Edit the anchor colors: the picker changes the selected anchor, the buttons add and remove anchors
+@callback(
+    Output('builder-qualitative-anchors', 'data'),
+    Output('builder-qualitative-anchor', 'options'),
+    Output('builder-qualitative-anchor', 'value'),
+    Output('builder-qualitative-picker', 'value'),
+    Input('builder-qualitative-picker', 'value'),
+    Input('builder-qualitative-anchor', 'value'),
+    Input('builder-qualitative-add', 'n_clicks'),
+    Input('builder-qualitative-remove', 'n_clicks'),
+    State('builder-qualitative-anchors', 'data'),
+    prevent_initial_call=True
+)
+def edit_qualitative_anchors(picked, index, n_add, n_remove, anchors):
+    return edit_anchors(ctx.triggered_id, picked, index, anchors)
+
+# Build a palette from the anchors and show it on the charts; closing the builder brings the selected
+# palette back. The builds are cached per anchor set and only the colors of the charts are patched
+@callback(
+    Output('builder-qualitative-preview', 'children'),
+    Output('builder-qualitative-metrics', 'children'),
+    Output('builder-qualitative-code', 'children'),
+    Output('color-bar-qualitative', 'figure', allow_duplicate=True),
+    Output('pie-qualitative', 'figure', allow_duplicate=True),
+    Output('scatter-qualitative', 'figure', allow_duplicate=True),
+    Input('builder-qualitative-anchors', 'data'),
+    Input('builder-qualitative-n', 'value'),
+    Input('builder-qualitative-space', 'value'),
+    Input('builder-qualitative-collapse', 'is_open'),
+    State('dropdown-qualitative-scale', 'value'),
+    State('reverse-qualitative', 'on'),
+    State('dropdown-template-qualitative', 'value'),
+    State('cvd-qualitative', 'value'),
+    prevent_initial_call=True
+)
+def build_qualitative_palette(anchors, n_colors, space, is_open, palette_name, reverse, template, deficiency):
+    palette_name = reversed_palette(palette_name, reverse)
+    if not is_open:
+        name, colors = palette_name, palette_colors('qualitative', palette_name)
+        outputs = (dash.no_update, dash.no_update, dash.no_update)
+    else:
+        name, (colors, metrics) = 'Custom', build_palette(tuple(anchors), n_colors, space)
+        outputs = create_builder_output('qualitative', colors, metrics)
+    return (*outputs, *qualitative_palette_patches(name, colors, palette_name, template, deficiency))
+
+# Patches that show the colorscale bar, pie chart and scatter plot with other colors
+def qualitative_palette_patches(name, colors, palette_name, template, deficiency):
+    # The colorscale bar has one bar per color, so its trace is replaced; its hover keeps the real colors
+    bar = simulate_figure(colorscale_bar_v_spec(name, colors, len(colors), templates_dict.get(template), template), deficiency)
+    patch_bar = Patch()
+    patch_bar['data'][0] = bar['data'][0]
+    patch_bar['layout']['title'] = bar['layout']['title']
+    return (patch_bar,
+            *palette_patches('qualitative', ['pie-qualitative', 'scatter-qualitative'], palette_name, template,
+                             simulate_colors(colors, deficiency)))
@@ -1,11 +1,17 @@
+from functools import partial
 import dash
-from dash import Dash, dcc, html, Input, Output, State, Patch, callback
+from dash import Dash, dcc, html, Input, Output, State, Patch, callback, clientside_callback, no_update, ctx
 import dash_bootstrap_components as dbc
 import dash_daq as daq
 import plotly.express as px
 import pandas as pd
 from chart_functions import *
 from helper import *
+from figure_cache import register_chart, get_figure
+from palette_cvd import cvd_patches, simulate_figure, simulate_colors
+from palette_builder import build_palette, palette_patches
+from figure_specs import area_chart_with_gradient_spec
+from downsampling import relayout_x_range, LTTB_POINTS_PER_PX
 
 # Create app page================================================================
 dash.register_page(__name__, name='Sequential')
@@ -16,8 +22,13 @@ dash.register_page(__name__, name='Sequential')
 df_tips = px.data.tips()
 df_stock = px.data.stocks()
 df_stock['date'] = pd.to_datetime(df_stock['date'])
+
+# Width of the area chart and the map, a third of the page each; it sets the point budget of the
+# area chart and the geometry level of the map
+area_width_px = graph_width_px(4)
+map_width_px = graph_width_px(4)
 #df_gap = px.data.gapminder().query("year == 2007 and continent == 'Europe'")
-df_europe = pd.read_csv('.\data\All_Europe_2023.csv')
+df_europe = pd.read_csv('./data/All_Europe_2023.csv')
 
 # Create components================================================================
 
@@ -31,43 +42,41 @@ badge_info_sequential = [
 # Create badges for each badge information
 badges_sequential = create_badges(badge_info_sequential)
 
-# Get list all qualitative color scales names excluding internal attributes, 'swatches', and 'swatches_continuous' 
-swatches = [scale_name for scale_name in dir(px.colors.sequential) 
-            if not scale_name.startswith("_") and scale_name not in ['swatches', 'swatches_continuous', 'RdBu', 'RdBu_r']]
-
-# Create Dropdown options for color swatches
-sequential_dropdown_options = []
+# Get list all sequential color scales names; reversed palettes are chosen with the reverse switch.
+# The palettes of the catalog files are built on demand, not pre-rendered
+swatches = palette_names('sequential', exclude=['RdBu'], external=False)
+external_swatches = palette_names('sequential', external=True)
 
-# Assume the images are in the 'assets' folder
-for swatch_name in swatches:      
-    img_src = f"/assets/sequential_swatches/{swatch_name}.png"   
-    sequential_dropdown_options.append(
-        {'label': html.Div(html.Img(src=img_src, style={'width': '500px', 'height': '30px'}),
-                           style={'display': 'flex', 'padding-top': '2px'}),
-         'value': swatch_name })
-    
-# Create dropdown with options for color scales and templates
-dropdown_sequential = create_dropdown('dropdown-sequential-scale', sequential_dropdown_options, value='Turbo')
+# Create dropdown with options for color scales and templates; palettes are searched on the server
+dropdown_sequential = create_palette_dropdown('dropdown-sequential-scale', 'sequential', value='Turbo')
 dropdown_templates_sequential = create_dropdown('dropdown-template-sequential', templates, value='plotly')
+reverse_switch_sequential = create_reverse_switch('reverse-sequential')
+sort_sequential = create_sort_dropdown('sort-sequential', 'sequential')
+cvd_sequential = create_cvd_dropdown('cvd-sequential')
+builder_sequential = create_palette_builder('sequential', anchors=('#0d0887', '#cc4778', '#f0f921'), n_colors=9)
 
 # Create buttons and modal window
 btn_save_options_sequential = create_save_button('btn-save-options-sequential')
 modal_save_options_sequential = create_modal_save_options('modal-save-sequential', 
                                                            'code-sequential', 
                                                            'array-sequential', 
-                                                           'btn-close-sequential')
+                                                           'btn-close-sequential',
+                                                           export_kind='sequential')
 
 # Create page layout=================================================================
 layout = dbc.Container([ 
     dbc.Row([
-        dbc.Col(dropdown_sequential, width=5),
-        dbc.Col(dropdown_templates_sequential, width=4),
-        dbc.Col([btn_save_options_sequential, modal_save_options_sequential], width=3),            
+        dbc.Col([dropdown_sequential, sort_sequential], width=5),
+        dbc.Col(reverse_switch_sequential, width=2),
+        dbc.Col([dropdown_templates_sequential, cvd_sequential], width=3),
+        dbc.Col([btn_save_options_sequential, modal_save_options_sequential], width=2),            
         ]),
+    dbc.Row(dbc.Col(builder_sequential, width=12)),
     #dbc.Row(dbc.Col(dbc.Card(dcc.Graph(id='color-bar', config=config_mode), body=True), width=12, className='mb-3')),
     dbc.Row([        
         dbc.Col([            
             dbc.Card(dcc.Graph(id='area-plot', config=config_mode), body=True, className='mb-3'),            
+            dcc.Store(id='area-plot-window'),
         ], width=4),
         dbc.Col([
             dbc.Card(dcc.Graph(id='scatter-plot', config=config_mode), body=True,  class_name='mb-3 '),                        
@@ -98,52 +107,146 @@ def toggle_modal(n1, n2, is_open):
         return not is_open
     return is_open
 
+# Create figures for a palette and a template (also pre-rendered by figure_cache.py)
+def build_scatter_plot(palette_name, template):
+    return create_scatter_plot(df_tips, x='total_bill', y='tip', color_v='tip', size_v='total_bill', 
+                               col_scale=palette_colors('sequential', palette_name), 
+                               bg_color=templates_dict.get(template), template=template)
+
+def build_area_chart(palette_name, template, x_range=None):
+    return area_chart_with_gradient_spec(df_stock, x='date', y='AAPL', 
+                                         col_scale=palette_colors('sequential', palette_name), 
+                                         bg_color=templates_dict.get(template), template=template,
+                                         width_px=area_width_px, x_range=x_range)
+
+def build_treemap(palette_name, template):
+    path_c = [px.Constant('Europe'), 'European Union',  'Countries']
+    return create_treemap(df_europe, path_c=path_c, values='GDP per capita (US$)', color_v='Sex gap', 
+                          col_scale=palette_colors('sequential', palette_name), year=2023, 
+                          bg_color=templates_dict.get(template), template=template)
+
+def build_map(palette_name, template):
+    map_europe = create_map(df_europe, locations='iso_alpha3', color_v='GDP per capita (US$)', 
+                            col_scale=palette_colors('sequential', palette_name), 
+                            bg_color=templates_dict.get(template), width_px=map_width_px)
+    return map_europe.update_layout(margin=dict(l=0, r=0, t=0, b=0))
+
+sequential_colors = partial(palette_colors, 'sequential')
+register_chart('sequential', 'scatter-plot', build_scatter_plot, swatches, colors=sequential_colors, data=[df_tips],
+               reversible=True, on_demand=external_swatches)
+register_chart('sequential', 'area-plot', build_area_chart, swatches, colors=sequential_colors, data=[df_stock],
+               reversible=True, on_demand=external_swatches)
+register_chart('sequential', 'treemap-plot', build_treemap, swatches, colors=sequential_colors, data=[df_europe],
+               reversible=True, on_demand=external_swatches)
+register_chart('sequential', 'map-plot', build_map, swatches, colors=sequential_colors, data=[df_europe],
+               reversible=True, on_demand=external_swatches)
+
+# List the palettes that look like the selected one when the export modal opens
 @callback(
-   # Output('color-bar', 'figure'),
+    Output('similar-sequential', 'children'),
+    Input('modal-save-sequential', 'is_open'),
+    State('dropdown-sequential-scale', 'value'),
+    State('reverse-sequential', 'on'),
+    prevent_initial_call=True
+)
+def show_similar_sequential_palettes(is_open, palette_name, reverse):
+    if not is_open:
+        return no_update
+    return create_similar_palettes('sequential', reversed_palette(palette_name, reverse))
+
+# Search and sort the palettes on the server, so the layout only holds the first few
+@callback(
+    Output('dropdown-sequential-scale', 'options'),
+    Input('dropdown-sequential-scale', 'search_value'),
+    Input('dropdown-sequential-scale', 'value'),
+    Input('sort-sequential', 'value'),
+    prevent_initial_call=True
+)
+def search_sequential_palettes(search_value, palette_name, sort):
+    return palette_options('sequential', search_value, palette_name, sort)
+
+# Flip the swatches of the dropdown while the palette is reversed
+clientside_callback(
+    """function (reverse) {
+        return reverse ? 'mb-3 swatches-reversed' : 'mb-3';
+    }""",
+    Output('dropdown-sequential-scale', 'className'),
+    Input('reverse-sequential', 'on'),
+)
+
+# Show the figures as seen with a color vision deficiency; the cached figures give the paths
+# of their colors, so only the colors are patched and nothing is built again. While the builder
+# is open the charts show the built palette, so that palette is simulated
+@callback(
+    Output('area-plot', 'figure', allow_duplicate=True),
+    Output('scatter-plot', 'figure', allow_duplicate=True),
+    Output('treemap-plot', 'figure', allow_duplicate=True),
+    Output('map-plot', 'figure', allow_duplicate=True),
+    Input('cvd-sequential', 'value'),
+    State('dropdown-sequential-scale', 'value'),
+    State('reverse-sequential', 'on'),
+    State('dropdown-template-sequential', 'value'),
+    State('builder-sequential-collapse', 'is_open'),
+    State('builder-sequential-anchors', 'data'),
+    State('builder-sequential-n', 'value'),
+    State('builder-sequential-space', 'value'),
+    prevent_initial_call=True
+)
+def simulate_sequential_figures(deficiency, palette_name, reverse, template, builder_open, anchors, n_colors, space):
+    palette_name = reversed_palette(palette_name, reverse)
+    charts = ['area-plot', 'scatter-plot', 'treemap-plot', 'map-plot']
+    if builder_open:
+        colors, _ = build_palette(tuple(anchors), n_colors, space)
+        return palette_patches('sequential', charts, palette_name, template, simulate_colors(colors, deficiency))
+    return cvd_patches('sequential', charts, palette_name, template, deficiency)
+
+# Load the scatter plot, treemap and map from the figure API, which browsers and proxies can cache
+clientside_callback(
+    """function (palette, reverse, template, cvd) {
+        return window.dash_clientside.figure_api.load('sequential', ['scatter-plot', 'treemap-plot', 'map-plot'], 
+                                                      reverse ? palette + '_r' : palette, template, cvd);
+    }""",
     Output('scatter-plot', 'figure'),
-    Output('area-plot', 'figure'), 
     Output('treemap-plot', 'figure'), 
     Output('map-plot', 'figure'),    
+    Input('dropdown-sequential-scale', 'value'),
+    Input('reverse-sequential', 'on'),
+    Input('dropdown-template-sequential', 'value'),    
+    State('cvd-sequential', 'value'),
+)
+
+@callback(
+   # Output('color-bar', 'figure'),
+    Output('area-plot', 'figure'), 
     Output('array-sequential', 'children'),
     Output('code-sequential', 'children'),
     Input('dropdown-sequential-scale', 'value'),
+    Input('reverse-sequential', 'on'),
     Input('dropdown-template-sequential', 'value'),    
+    State('area-plot-window', 'data'),
+    State('cvd-sequential', 'value'),
 )
 
-def change_colorscale(palette_name, template):
-    # Access the selected colorscale dynamically
-    colorscale = getattr(px.colors.sequential, palette_name)     
+def change_colorscale(palette_name, reverse, template, area_window, deficiency):
+    # Access the selected colorscale dynamically, reversed if the switch is on
+    palette_name = reversed_palette(palette_name, reverse)
+    colorscale = palette_colors('sequential', palette_name)     
     
     # Construct the full name dynamically
-    full_palette_name = f'px.colors.sequential.{palette_name}'  
+    import_line, full_palette_name = palette_code('sequential', palette_name)
 
     # Get the number of colors
     n_colors = len(colorscale)
 
-    # Get the background color
-    bg_color = templates_dict.get(template)
-
     # Create the colorbar for the selected colorscale    
     #colorscale_bar = create_colorscale_bar_v(palette_name, colorscale, n_colors, bg_color, template)  
 
-    # Create the scatter plot figure
-    scatter_plot = create_scatter_plot(df_tips, x='total_bill',  y='tip',  color_v='tip',
-                                       size_v='total_bill', col_scale=colorscale, bg_color=bg_color, template=template)
-
-    # Create the area chart figure
-    area_chart = create_area_chart_with_gradient(df_stock, x='date', y='AAPL', 
-                                                 col_scale=colorscale, bg_color=bg_color, template=template)
-
-    # Create the treemap figure
-    path_c = [px.Constant('Europe'), 'European Union',  'Countries']
-    treemap = create_treemap(df_europe, path_c, values='GDP per capita (US$)', color_v='Sex gap', 
-                             col_scale=colorscale, year=2023, bg_color=bg_color, template=template)
-
-    # Create the map figure
-    map_europe = create_map(df_europe, locations='iso_alpha3', color_v='GDP per capita (US$)', 
-                            col_scale=colorscale, bg_color=bg_color
-                            ).update_layout(margin=dict(l=0, r=0, t=0, b=0))   
-           
+    # Get the area chart from the cache; a zoomed area chart is built for its window
+    if area_window is None:
+        area_chart = get_figure('sequential', 'area-plot', palette_name, template)
+    else:
+        area_chart = build_area_chart(palette_name, template, x_range=area_window)
+    area_chart = simulate_figure(area_chart, deficiency)
   
 # Create Markdown objects for saving options
     md_array = html.Div(
@@ -156,10 +259,93 @@ def change_colorscale(palette_name, template):
     md_code = html.Div(
         dcc.Markdown(f'''
             ```python
-            import plotly.express as px 
+            {import_line}
             {full_palette_name}
             ```
             '''))                             
     
-    return  scatter_plot, area_chart, treemap, map_europe, md_array, md_code
+    return  area_chart, md_array, md_code
+
+# Callback for refining the area chart to the zoomed window
+@callback(
+    Output('area-plot', 'figure', allow_duplicate=True),
+    Output('area-plot-window', 'data'),
+    Input('area-plot', 'relayoutData'),
+    prevent_initial_call=True
+)
+def refine_area_chart(relayout_data):
+    # Short series are sent in full, so there is nothing to refine
+    if not relayout_data or len(df_stock) <= area_width_px * LTTB_POINTS_PER_PX:
+        return no_update, no_update
+
+    changed, x_range = relayout_x_range(relayout_data)
+    if not changed:
+        return no_update, no_update
+
+    # The window gets the same point budget as the full series
+    data = get_area_data(df_stock, 'date', 'AAPL', area_width_px, x_range)
+    patch_area = Patch()
+    for key in ('x', 'y', 'customdata'):
+        patch_area['data'][0][key] = data[key]
+
+    return patch_area, x_range
+
+# Palette builder ===================================================================
+
+# Open and close the palette builder
+@callback(
+    Output('builder-sequential-collapse', 'is_open'),
+    Input('builder-sequential-toggle', 'n_clicks'),
+    State('builder-sequential-collapse', 'is_open'),
+    prevent_initial_call=True
+)
+def toggle_sequential_builder(n, is_open):
+    return not is_open
+
+# Edit the anchor colors: the picker changes the selected anchor, the buttons add and remove anchors
+@callback(
+    Output('builder-sequential-anchors', 'data'),
+    Output('builder-sequential-anchor', 'options'),
+    Output('builder-sequential-anchor', 'value'),
+    Output('builder-sequential-picker', 'value'),
+    Input('builder-sequential-picker', 'value'),
+    Input('builder-sequential-anchor', 'value'),
+    Input('builder-sequential-add', 'n_clicks'),
+    Input('builder-sequential-remove', 'n_clicks'),
+    State('builder-sequential-anchors', 'data'),
+    prevent_initial_call=True
+)
+def edit_sequential_anchors(picked, index, n_add, n_remove, anchors):
+    return edit_anchors(ctx.triggered_id, picked, index, anchors)
+
+# Build a palette from the anchors and show it on the charts; closing the builder brings the selected
+# palette back. The builds are cached per anchor set and only the colors of the charts are patched
+@callback(
+    Output('builder-sequential-preview', 'children'),
+    Output('builder-sequential-metrics', 'children'),
+    Output('builder-sequential-code', 'children'),
+    Output('area-plot', 'figure', allow_duplicate=True),
+    Output('scatter-plot', 'figure', allow_duplicate=True),
+    Output('treemap-plot', 'figure', allow_duplicate=True),
+    Output('map-plot', 'figure', allow_duplicate=True),
+    Input('builder-sequential-anchors', 'data'),
+    Input('builder-sequential-n', 'value'),
+    Input('builder-sequential-space', 'value'),
+    Input('builder-sequential-collapse', 'is_open'),
+    State('dropdown-sequential-scale', 'value'),
+    State('reverse-sequential', 'on'),
+    State('dropdown-template-sequential', 'value'),
+    State('cvd-sequential', 'value'),
+    prevent_initial_call=True
+)
+def build_sequential_palette(anchors, n_colors, space, is_open, palette_name, reverse, template, deficiency):
+    palette_name = reversed_palette(palette_name, reverse)
+    charts = ['area-plot', 'scatter-plot', 'treemap-plot', 'map-plot']
+    if not is_open:
+        colors = palette_colors('sequential', palette_name)
+        return (no_update, no_update, no_update,
+                *palette_patches('sequential', charts, palette_name, template, simulate_colors(colors, deficiency)))
 
+    colors, metrics = build_palette(tuple(anchors), n_colors, space)
+    return (*create_builder_output('sequential', colors, metrics),
+            *palette_patches('sequential', charts, palette_name, template, simulate_colors(colors, deficiency)))
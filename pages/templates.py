@@ -4,7 +4,9 @@ import dash_bootstrap_components as dbc
 import plotly.io as pio
 import pandas as pd
 import numpy as np
-from chart_functions import create_box_plot, create_colorscale_bar_for_template, config_mode, create_heatmap_temp
+from chart_functions import create_box_plot, config_mode
+from figure_specs import colorscale_bar_for_template_spec, heatmap_temp_spec
+from figure_cache import register_chart, get_figure
 from helper import *
 
 
@@ -15,7 +17,7 @@ dash.register_page(__name__, name='Templates')
 month_order_list = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'] 
 
 # Get data for the example plots
-df_seattle = pd.read_csv('.\data\seattle_weather_2014-2023.csv', usecols=['year','month','day','tmax'])
+df_seattle = pd.read_csv('./data/seattle_weather_2014-2023.csv', usecols=['year','month','day','tmax'])
 df_seattle['month'] = df_seattle['month'].astype("category").cat.set_categories(month_order_list)
 df_seattle_2023 = df_seattle[df_seattle['year'] == 2023]
 ct_whether = pd.crosstab(df_seattle_2023['month'], df_seattle_2023['day'], df_seattle_2023['tmax'], aggfunc='mean')
@@ -48,12 +50,12 @@ dropdown_templates = create_dropdown('dropdown-template', template_names[:6], va
 
 # Create color bar for each template
 fig_list = [dbc.Card(dcc.Graph(id=f'color-bar-{template}', 
-                               figure=create_colorscale_bar_for_template(template), 
+                               figure=colorscale_bar_for_template_spec(template), 
                                config=config_mode), body=True, className='mb-3') 
                                for template in template_names[:6]] 
 
 fig_list2 = [dbc.Card(dcc.Graph(id=f'color-bar2-{template}', 
-                               figure=create_colorscale_bar_for_template(template, type='colorscale'), 
+                               figure=colorscale_bar_for_template_spec(template, type='colorscale'), 
                                config=config_mode), body=True, className='mb-3') 
                                for template in template_names[:6]] 
 
@@ -75,6 +77,16 @@ layout = dbc.Container([
     ]),
 ])
 
+# Create figures for a template (also pre-rendered by figure_cache.py)
+def build_box_plot(palette_name, template):
+    return create_box_plot(df_seattle_2023, template)
+
+def build_heatmap(palette_name, template):
+    return heatmap_temp_spec(ct_whether, template=template, max_shape=(320, 1050))
+
+register_chart('templates', 'box-plot', build_box_plot, chart_templates=template_names[:6], data=[df_seattle_2023])
+register_chart('templates', 'heatmap-weather', build_heatmap, chart_templates=template_names[:6], data=[ct_whether])
+
 # Callbacks=========================================================================
 
 @callback(
@@ -85,12 +97,12 @@ layout = dbc.Container([
 )
 def update_box_plot(template, ac_tab):
     if ac_tab == 'tab-1':
-        box_plot = create_box_plot(df_seattle_2023, template)
+        box_plot = get_figure('templates', 'box-plot', None, template)
         bar_colors = dbc.Row([dbc.Col([*fig_list[i:i+2] ], width=4) for i in range(0, 5, 2)])
         return  box_plot, bar_colors
      
     elif ac_tab == 'tab-2':
-        hm_whether = create_heatmap_temp(ct_whether, template=template)
+        hm_whether = get_figure('templates', 'heatmap-weather', None, template)
         bar_colors2 = dbc.Row([dbc.Col([*fig_list2[i:i+2] ], width=4) for i in range(0, 5, 2)])
         return hm_whether , bar_colors2
          
@@ -0,0 +1,122 @@
+import argparse
+import time
+from functools import lru_cache
+import numpy as np
+from raster import colors_to_rgb
+from palette_catalog import get_palette_catalog, format_colors
+from palette_metrics import rgb_to_lab, lab_to_rgb
+from palette_similarity import parse_color
+
+
+# Largest number of categories colors are assigned to
+MAX_CATEGORIES = 1024
+
+# Colors closer than this ΔE to the background are only used when the others run out
+MIN_BACKGROUND_DELTA_E = 15
+
+# Lightness range of the variants made when there are more categories than colors
+VARIANT_LIGHTNESS = (20, 90)
+
+# Number of partial assignments kept by the beam search; 1 is the greedy search
+BEAM_WIDTH = 4
+
+
+# Colors a palette can give, with their distances ---------------------
+@lru_cache(maxsize=64)
+def color_pool(colors, n):
+    # colors is a tuple of color strings (hex or rgb()). Up to n colors the pool is the palette; with more,
+    # every color also gets variants of the same hue and chroma at evenly spaced lightness levels, enough
+    # for n colors. Returns the hex colors, their tier (0 for the palette, 1 for the variants), CIELAB and
+    # the matrix of ΔE between all of them
+    # The colors are written as hex first, so a color given twice in two formats is one color of the pool
+    colors = list(dict.fromkeys(format_colors(colors_to_rgb(list(colors)))))
+    lab = rgb_to_lab(colors_to_rgb(colors))
+    pool = dict.fromkeys(colors, 0)
+    if n > len(colors):
+        levels = -(-n // len(colors)) + 1
+        variants = np.repeat(lab, levels, axis=0)
+        variants[:, 0] = np.tile(np.linspace(*VARIANT_LIGHTNESS, levels), len(lab))
+        # Variants out of the sRGB gamut are clipped, so some of them end up the same color
+        for color in format_colors(lab_to_rgb(variants)):
+            pool.setdefault(color, 1)
+
+    lab = rgb_to_lab(colors_to_rgb(list(pool)))
+    squared = (lab**2).sum(axis=1)
+    distances = np.sqrt(np.maximum(squared[:, None] + squared[None] - 2 * lab @ lab.T, 0))
+    return tuple(pool), np.array(list(pool.values())), lab, distances
+
+# Beam search for the largest minimum ΔE ------------------------------
+def _beam_search(distances, tiers, placed, n, beam_width):
+    # Every partial assignment keeps the ΔE of every color to its nearest taken color (or to the
+    # background in placed) and its score, the smallest of those ΔE when its colors were taken.
+    # Each step tries the farthest colors of the lowest tier left on every assignment and keeps the
+    # best ones, so the colors come farthest first and any first k of them are far apart
+    m = len(distances)
+    nearest = placed[None].copy()
+    scores = np.array([np.inf])
+    orders = np.empty((1, 0), dtype=int)
+    # Random keys of the colors; their sums tell apart the sets of colors of the assignments
+    color_keys = np.random.default_rng(0).integers(1, 2**63, m, dtype=np.uint64)
+    set_keys = np.zeros(1, dtype=np.uint64)
+    for _ in range(min(n, m)):
+        # Only the lowest tier that has colors left is open to every assignment
+        left = nearest > -np.inf
+        lowest = np.where(left, tiers, tiers.max() + 1).min(axis=1)
+        priority = np.where(left & (tiers == lowest[:, None]), nearest, -np.inf)
+
+        # The first farthest colors are taken in palette order, so ties keep the order of the palette
+        candidates = np.argsort(-priority, axis=1, kind='stable')[:, :beam_width]
+        parents = np.repeat(np.arange(len(orders)), candidates.shape[1])
+        candidates = candidates.ravel()
+        gains = priority[parents, candidates]
+        children = np.minimum(scores[parents], gains)
+
+        # The best children by score, then by the ΔE of their new color, without the same set twice
+        child_keys = set_keys[parents] + color_keys[candidates]
+        ranked = np.lexsort((-gains, -children))
+        _, first = np.unique(child_keys[ranked], return_index=True)
+        kept = ranked[np.sort(first)][:beam_width]
+
+        parents, candidates = parents[kept], candidates[kept]
+        nearest = np.minimum(nearest[parents], distances[candidates])
+        nearest[np.arange(len(kept)), candidates] = -np.inf
+        scores, set_keys = children[kept], child_keys[kept]
+        orders = np.column_stack([orders[parents], candidates])
+    return orders[0]
+
+# Colors of a palette for n categories --------------------------------
+@lru_cache(maxsize=256)
+def assign_colors(colors, n, background=None, beam_width=BEAM_WIDTH):
+    # colors is a tuple of color strings and background a color string such as a template's plot_bgcolor.
+    # Returns the n colors in order, the smallest ΔE between them and the smallest ΔE to the background
+    # (None without one). With more categories than the pool has colors, the colors are used again in order
+    if not 1 <= n <= MAX_CATEGORIES:
+        raise ValueError(f'n must be between 1 and {MAX_CATEGORIES}, got {n!r}')
+    hex_colors, tiers, lab, distances = color_pool(colors, n)
+    if background is None:
+        placed = np.full(len(lab), np.inf)
+    else:
+        placed = np.linalg.norm(lab - rgb_to_lab(parse_color(background)), axis=1)
+        tiers = tiers + 2 * (placed < MIN_BACKGROUND_DELTA_E)
+
+    order = _beam_search(distances, tiers, placed, n, beam_width)
+    pairs = distances[np.ix_(order, order)][np.triu_indices(len(order), 1)]
+    min_delta_e = round(float(pairs.min()), 3) if len(pairs) else None
+    background_delta_e = round(float(placed[order].min()), 3) if background is not None else None
+    return tuple(hex_colors[i] for i in order[np.arange(n) % len(order)]), min_delta_e, background_delta_e
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Assign the most distinct colors of a palette to n categories.')
+    parser.add_argument('palette', help="a palette id such as 'qualitative/Bold'")
+    parser.add_argument('n', type=int)
+    parser.add_argument('--background', help="a background color such as 'white' or '#E5ECF6'")
+    parser.add_argument('--beam', type=int, default=BEAM_WIDTH)
+    args = parser.parse_args()
+
+    colors = tuple(format_colors(get_palette_catalog()[args.palette]['rgb']))
+    start = time.perf_counter()
+    assigned, min_delta_e, background_delta_e = assign_colors(colors, args.n, args.background, args.beam)
+    print(f'Assigned {args.n} colors in {1000 * (time.perf_counter() - start):.1f} ms: '
+          f'minimum ΔE {min_delta_e}, minimum ΔE to the background {background_delta_e}')
+    print(list(assigned))
@@ -0,0 +1,85 @@
+from functools import lru_cache
+import numpy as np
+from dash import Patch
+from raster import colors_to_rgb
+from palette_catalog import format_colors
+from palette_metrics import score_palettes, rgb_to_lab, lab_to_rgb, rgb_to_oklab, oklab_to_rgb
+from palette_cvd import figure_colors
+from figure_cache import get_figure
+
+
+# Spaces the anchors are interpolated in: name -> (label, from sRGB, to sRGB)
+BUILDER_SPACES = {'oklab': ('OKLab', rgb_to_oklab, oklab_to_rgb), 'lab': ('CIELAB', rgb_to_lab, lab_to_rgb)}
+
+# Limits of the builder
+MAX_ANCHORS = 8
+MAX_BUILDER_COLORS = 32
+
+# Below these ΔE, colors of a palette are hard to tell apart (with color blindness)
+MIN_DISTINCT_DELTA_E = 10
+MIN_CVD_DELTA_E = 5
+
+
+# Interpolate n colors through anchor colors -------------------------
+@lru_cache(maxsize=4096)
+def interpolate_palette(anchors, n, space='oklab'):
+    # anchors is a tuple of hex colors, evenly spaced along the palette; the colors in between
+    # are interpolated linearly in the perceptual space and clipped to the sRGB gamut
+    _, to_space, to_rgb = BUILDER_SPACES[space]
+    coords = to_space(colors_to_rgb(list(anchors)))
+    stops = np.linspace(0, 1, len(anchors))
+    t = np.linspace(0, 1, n)
+    mixed = np.stack([np.interp(t, stops, coords[:, k]) for k in range(3)], axis=1)
+    return tuple(format_colors(to_rgb(mixed)))
+
+# A palette with its metrics, cached per anchor set -------------------
+@lru_cache(maxsize=4096)
+def build_palette(anchors, n, space='oklab'):
+    colors = interpolate_palette(anchors, n, space)
+    return colors, score_palettes([colors_to_rgb(list(colors))])[0]
+
+# Problems of a built palette for a palette type ----------------------
+def validate_palette(kind, metrics):
+    warnings = []
+    if kind != 'qualitative' and metrics['lightness_monotonicity'] < 1:
+        warnings.append('The lightness goes up and down, so the order of the colors is hard to read.')
+    if kind == 'qualitative' and metrics['min_delta_e'] < MIN_DISTINCT_DELTA_E:
+        warnings.append('Some colors are close to each other.')
+    if metrics['cvd_min_delta_e'] < MIN_CVD_DELTA_E:
+        warnings.append('Some colors are hard to tell apart with color blindness.')
+    return warnings
+
+# Where a figure holds its palette -----------------------------------
+@lru_cache(maxsize=256)
+def palette_slots(page, chart, palette, template):
+    # (path, slot) of the colors of a cached figure: a whole colorscale, a list of colors,
+    # or a single color of a trace, which takes the color of the trace number
+    slots = {}
+    for path, _ in figure_colors(get_figure(page, chart, palette, template)):
+        if len(path) >= 3 and path[-3] == 'colorscale':
+            slots[path[:-2]] = 'colorscale'
+        elif isinstance(path[-1], int):
+            slots[path[:-1]] = 'list'
+        else:
+            slots[path] = path[1] if path[0] == 'data' else 0
+    return tuple(slots.items())
+
+# Patches that show charts of a page with other colors ----------------
+def palette_patches(page, charts, palette, template, colors):
+    colors = list(colors)
+    colorscale = [[i / (len(colors) - 1), color] for i, color in enumerate(colors)]
+    patches = []
+    for chart in charts:
+        patch = Patch()
+        for path, slot in palette_slots(page, chart, palette, template):
+            node = patch
+            for key in path[:-1]:
+                node = node[key]
+            if slot == 'colorscale':
+                node[path[-1]] = colorscale
+            elif slot == 'list':
+                node[path[-1]] = colors
+            else:
+                node[path[-1]] = colors[slot % len(colors)]
+        patches.append(patch)
+    return patches
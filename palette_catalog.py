@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+import numpy as np
+import plotly.colors as pc
+from raster import colors_to_rgb
+from external_palettes import load_external_palettes, color_hash
+
+
+# Palette types, as in plotly.colors and on the pages of the app
+PALETTE_KINDS = ('sequential', 'diverging', 'cyclical', 'qualitative')
+
+# Palettes left out of a type because the app shows them with another one
+EXCLUDED_PALETTES = {'sequential': ('RdBu', 'RdBu_r')}
+
+# Output formats of a palette
+COLOR_FORMATS = ('hex', 'rgb', 'float')
+
+# Largest number of colors a palette can be resampled to
+MAX_COLORS = 1024
+
+# Collections the plotly palettes come from, used as search tags
+PALETTE_SOURCES = ('carto', 'cmocean', 'colorbrewer', 'plotlyjs')
+
+# Number of palettes a search returns
+SEARCH_LIMIT = 50
+
+
+# Collection a plotly palette comes from -----------------------------
+def palette_source(name, colors):
+    for source in PALETTE_SOURCES:
+        if vars(getattr(pc, source)).get(name) == colors:
+            return source
+    return 'plotly'
+
+# Catalog of every palette, keyed by '<kind>/<name>' ---------------
+@lru_cache(maxsize=None)
+def get_palette_catalog():
+    catalog = {}
+    for kind in PALETTE_KINDS:
+        module = getattr(pc, kind)
+        for name, colors in vars(module).items():
+            if not isinstance(colors, list) or name.startswith('_') or name in EXCLUDED_PALETTES.get(kind, ()):
+                continue
+            # Reversed palettes share the swatch of their palette
+            swatch = f"/assets/{kind}_swatches/{name.removesuffix('_r')}.png"
+            source = palette_source(name, colors)
+            rgb = colors_to_rgb(colors)
+            catalog[f'{kind}/{name}'] = {
+                'id': f'{kind}/{name}', 'kind': kind, 'name': name,
+                'n_colors': len(colors), 'reversed': name.endswith('_r'),
+                'source': source, 'tags': [kind, source], 'external': False,
+                'code': f'px.colors.{kind}.{name}',
+                'swatch': swatch if os.path.exists(f'.{swatch}') else None,
+                'hash': color_hash(rgb), 'rgb': rgb}
+
+    # Palettes of the catalog files (external_palettes.py) follow, without copies of the plotly palettes
+    for palette in load_external_palettes(kinds=PALETTE_KINDS,
+                                          exclude_hashes={entry['hash'] for entry in catalog.values()},
+                                          taken_names={(entry['kind'], entry['name']) for entry in catalog.values()}):
+        palette_id = f"{palette['kind']}/{palette['name']}"
+        catalog[palette_id] = {
+            'id': palette_id, 'kind': palette['kind'], 'name': palette['name'],
+            'n_colors': len(palette['rgb']), 'reversed': False,
+            'source': palette['source'], 'tags': [palette['kind'], palette['source'], *palette['tags']], 'external': True,
+            'code': f"get_palette('{palette_id}')['colors']",
+            'swatch': None, 'hash': palette['hash'], 'rgb': palette['rgb']}
+    return catalog
+
+# Metadata of every palette, without the colors ---------------------
+def palette_metadata():
+    return [{key: value for key, value in entry.items() if key != 'rgb'}
+            for entry in get_palette_catalog().values()]
+
+# Search index of the catalog, in name order ------------------------
+@lru_cache(maxsize=None)
+def _search_index():
+    catalog = get_palette_catalog()
+    ids = sorted(catalog, key=lambda palette_id: catalog[palette_id]['name'])
+    # Every palette is searched as the lower-case text '<name> <tags>'
+    text = np.array([' '.join([catalog[palette_id]['name'], *catalog[palette_id]['tags']]).lower() for palette_id in ids])
+    kinds = np.array([catalog[palette_id]['kind'] for palette_id in ids])
+    reversed_ = np.array([catalog[palette_id]['reversed'] for palette_id in ids])
+    return np.array(ids), text, kinds, reversed_
+
+# Find palettes whose name or tags contain every word of a query ----
+def search_palettes(query='', kind=None, include_reversed=False, limit=SEARCH_LIMIT):
+    # Returns the ids of the first matches in name order and the number of matches;
+    # the words are matched as substrings, as the dropdowns filter their options
+    ids, text, kinds, reversed_ = _search_index()
+    mask = np.ones(len(ids), dtype=bool)
+    if kind is not None:
+        mask &= kinds == kind
+    if not include_reversed:
+        mask &= ~reversed_
+    for word in query.lower().split():
+        mask &= np.char.find(text, word) >= 0
+    matches = ids[mask]
+    return matches[:limit].tolist(), len(matches)
+
+# Version of the catalog, changes with the palettes ----------------
+@lru_cache(maxsize=None)
+def catalog_version():
+    content = [(entry['id'], entry['hash']) for entry in get_palette_catalog().values()]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+# Colors of a palette, resampled to n colors ------------------------
+def resample_palette(rgb, n, kind):
+    if n is None or n == len(rgb):
+        return rgb
+    if kind == 'qualitative':
+        # Categories take the colors in order and start over when they run out
+        return rgb[np.arange(n) % len(rgb)]
+    # Continuous palettes are interpolated in RGB between evenly spaced stops, as plotly.js does
+    stops = np.linspace(0, 1, len(rgb))
+    t = np.linspace(0, 1, n)
+    return np.stack([np.interp(t, stops, rgb[:, k]) for k in range(3)], axis=1)
+
+# Convert an (n, 3) array of 0-255 values to a color format ---------
+def format_colors(rgb, color_format='hex'):
+    if color_format == 'float':
+        return np.round(rgb / 255, 6).tolist()
+    rgb = np.round(rgb).astype(int)
+    if color_format == 'rgb':
+        return rgb.tolist()
+    return [f'#{r:02x}{g:02x}{b:02x}' for r, g, b in rgb]
+
+# Import and expression of the Python code that gives a palette ----
+def palette_code(kind, palette_name):
+    # '<name>_r' is the reversed palette; plotly has them, the external palettes are reversed in the code
+    entry = get_palette_catalog().get(f'{kind}/{palette_name}')
+    if entry is None and palette_name.endswith('_r'):
+        import_line, code = palette_code(kind, palette_name[:-2])
+        return import_line, f'{code}[::-1]'
+    if entry is not None and entry['external']:
+        return 'from palette_catalog import get_palette', entry['code']
+    return 'import plotly.express as px', f'px.colors.{kind}.{palette_name}'
+
+# A palette in a format, optionally resampled -----------------------
+def get_palette(palette_id, color_format='hex', n=None):
+    entry = get_palette_catalog()[palette_id]
+    colors = format_colors(resample_palette(entry['rgb'], n, entry['kind']), color_format)
+    return {'id': palette_id, 'kind': entry['kind'], 'name': entry['name'], 'format': color_format, 'colors': colors}
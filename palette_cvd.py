@@ -0,0 +1,131 @@
+import base64
+import json
+from functools import lru_cache
+import numpy as np
+from dash import Patch
+from raster import colors_to_rgb, decode_png, png_data_uri, PNG_DATA_PREFIX
+from palette_catalog import format_colors
+from palette_metrics import simulate_cvd, CVD_MATRICES
+from figure_cache import chart_registry, get_figure
+
+
+# Value of the color vision toggle of the pages for normal vision
+NORMAL_VISION = 'none'
+
+# Layout keys with palette colors; the rest of the layout (template, background, fonts) is left alone
+LAYOUT_COLOR_KEYS = ('colorway', 'piecolorway', 'treemapcolorway', 'sunburstcolorway', 'coloraxis')
+
+# Trace keys whose colors are shown as text (the hover shows the real color codes)
+TEXT_KEYS = ('customdata', 'text', 'hovertext', 'texttemplate', 'hovertemplate', 'meta', 'name')
+
+# Number of color sets whose simulated colors are kept
+SIMULATED_SETS = 1024
+
+# Number of simulated raster images kept
+SIMULATED_IMAGES = 32
+
+
+# Color strings of a figure with their paths -------------------------
+def _is_color(value):
+    return isinstance(value, str) and (value.startswith('rgb(') or (value.startswith('#') and len(value) == 7))
+
+def _color_leaves(node, path=()):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key not in TEXT_KEYS:
+                yield from _color_leaves(value, (*path, key))
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            yield from _color_leaves(value, (*path, i))
+    elif _is_color(node):
+        yield path, node
+
+def figure_colors(figure):
+    # Colors of the traces and of the palette keys of the layout, as (path, color)
+    layout = figure.get('layout', {})
+    palette_parts = {'data': figure.get('data', []),
+                     'layout': {key: layout[key] for key in LAYOUT_COLOR_KEYS if key in layout}}
+    return list(_color_leaves(palette_parts))
+
+# Simulate many color strings at once ---------------------------------
+@lru_cache(maxsize=SIMULATED_SETS)
+def _simulated_set(colors, deficiency):
+    # colors is a sorted tuple of distinct color strings, converted in one pass
+    return dict(zip(colors, format_colors(simulate_cvd(colors_to_rgb(list(colors)), deficiency)))) if colors else {}
+
+def simulated_colors(colors, deficiency):
+    # Returns a dict color -> simulated hex color; the figures of a palette share their color sets
+    return dict(_simulated_set(tuple(sorted(set(colors))), deficiency))
+
+def simulate_colors(colors, deficiency):
+    # A list of colors as seen with a deficiency, in the same order
+    if deficiency == NORMAL_VISION:
+        return list(colors)
+    mapping = simulated_colors(colors, deficiency)
+    return [mapping[color] for color in colors]
+
+# Simulate the image of a rasterized chart ----------------------------
+@lru_cache(maxsize=SIMULATED_IMAGES)
+def simulate_image_source(source, deficiency):
+    # Every pixel is a color of the lookup table the chart was drawn with, so simulating the pixels
+    # draws the chart again with the simulated lookup table; missing cells stay transparent
+    rgba = decode_png(base64.b64decode(source[len(PNG_DATA_PREFIX):]))
+    # The colors are packed into one integer each, so finding the distinct ones is a 1-d sort
+    packed = rgba[..., :3].astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32)
+    keys, index = np.unique(packed, return_inverse=True)
+    colors = np.stack([keys >> 16, (keys >> 8) & 255, keys & 255], axis=1).astype(float)
+    simulated = np.round(simulate_cvd(colors, deficiency)).astype(np.uint8)
+    rgba = rgba.copy()
+    rgba[..., :3] = simulated[index.reshape(rgba.shape[:2])]
+    return png_data_uri(rgba)
+
+def image_sources(figure):
+    # (path, source) of the raster images of a figure
+    return [(('data', i, 'source'), trace['source']) for i, trace in enumerate(figure.get('data', []))
+            if trace.get('type') == 'image' and str(trace.get('source', '')).startswith(PNG_DATA_PREFIX)]
+
+# Changes of a figure as seen with a deficiency -----------------------
+def cvd_updates(figure, deficiency):
+    # (path, value) of every palette color and raster image; normal vision gives the figure's own back
+    leaves, images = figure_colors(figure), image_sources(figure)
+    if deficiency == NORMAL_VISION:
+        return leaves + images
+    mapping = simulated_colors([color for _, color in leaves], deficiency)
+    return ([(path, mapping[color]) for path, color in leaves]
+            + [(path, simulate_image_source(source, deficiency)) for path, source in images])
+
+def simulate_figure(figure, deficiency):
+    # Changes the figure dict in place and returns it
+    for path, color in cvd_updates(figure, deficiency) if deficiency != NORMAL_VISION else ():
+        node = figure
+        for key in path[:-1]:
+            node = node[key]
+        node[path[-1]] = color
+    return figure
+
+@lru_cache(maxsize=256)
+def simulated_figure_json(key, page, chart, palette, template, deficiency):
+    # key is the figure key, so a variant is built again when its figure changes
+    return json.dumps(simulate_figure(get_figure(page, chart, palette, template), deficiency))
+
+# Patches that show charts of a page with a deficiency ----------------
+def cvd_patches(page, charts, palette, template, deficiency):
+    # The paths come from the cached figures, so only the colors are sent and nothing is built
+    patches = []
+    for chart in charts:
+        entry = chart_registry[page][chart]
+        figure = get_figure(page, chart, palette if entry['palettes'] != (None,) else None,
+                            template if entry['templates'] != (None,) else None)
+        patch = Patch()
+        for path, color in cvd_updates(figure, deficiency):
+            node = patch
+            for key in path[:-1]:
+                node = node[key]
+            node[path[-1]] = color
+        patches.append(patch)
+    return patches
+
+# Options of the color vision toggle ---------------------------------
+def cvd_options():
+    return [{'label': 'Normal vision', 'value': NORMAL_VISION}] + [
+        {'label': deficiency.capitalize(), 'value': deficiency} for deficiency in CVD_MATRICES]
@@ -0,0 +1,100 @@
+import io
+import json
+import zipfile
+from palette_catalog import get_palette_catalog, resample_palette, format_colors
+
+
+# Change when the content of the exported files changes, so cached archives are replaced
+EXPORT_VERSION = 1
+
+# Fixed time stamp of every file, so the same selection gives the same archive
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+# CSS custom properties ---------------------------------------------
+def palette_css(entry, colors):
+    prefix = f"--{entry['kind']}-{entry['name'].lower().replace('_', '-')}"
+    lines = [f"/* {entry['code']} */", ':root {']
+    lines += [f'  {prefix}-{i}: {color};' for i, color in enumerate(colors)]
+    if entry['kind'] != 'qualitative':
+        stops = ', '.join(f'{color} {100*i/max(len(colors)-1, 1):.4g}%' for i, color in enumerate(colors))
+        lines.append(f'  {prefix}-gradient: linear-gradient(to right, {stops});')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+# JSON with every color format --------------------------------------
+def palette_json(entry, rgb):
+    content = {'id': entry['id'], 'kind': entry['kind'], 'name': entry['name'], 'code': entry['code'],
+               'hex': format_colors(rgb, 'hex'), 'rgb': format_colors(rgb, 'rgb'), 'float': format_colors(rgb, 'float')}
+    return json.dumps(content, indent=2) + '\n'
+
+# Python module with a matplotlib colormap --------------------------
+def palette_matplotlib(entry, colors):
+    # Qualitative palettes keep their distinct colors; the others are interpolated
+    if entry['kind'] == 'qualitative':
+        class_name, cmap = 'ListedColormap', f"ListedColormap(colors, name={entry['name']!r})"
+    else:
+        class_name, cmap = 'LinearSegmentedColormap', f"LinearSegmentedColormap.from_list({entry['name']!r}, colors)"
+    color_lines = ''.join(f'    {color!r},\n' for color in colors)
+    return (f'"""{entry["name"]} palette ({entry["code"]}) as a matplotlib colormap."""\n'
+            f'from matplotlib.colors import {class_name}\n\n'
+            f'colors = [\n{color_lines}]\n\n'
+            f'cmap = {cmap}\n')
+
+# GIMP palette ------------------------------------------------------
+def palette_gpl(entry, rgb):
+    lines = ['GIMP Palette', f"Name: {entry['name']}", 'Columns: 0', f"# {entry['code']}"]
+    lines += [f'{r:3d} {g:3d} {b:3d}\t{color}' for (r, g, b), color in zip(format_colors(rgb, 'rgb'), format_colors(rgb, 'hex'))]
+    return '\n'.join(lines) + '\n'
+
+# Export formats: name -> (folder, extension, writer(entry, colors))
+EXPORT_FORMATS = {
+    'css': ('css', 'css', lambda entry, rgb: palette_css(entry, format_colors(rgb, 'hex'))),
+    'json': ('json', 'json', palette_json),
+    'mpl': ('mpl_colormaps', 'py', lambda entry, rgb: palette_matplotlib(entry, format_colors(rgb, 'hex'))),
+    'gpl': ('gpl', 'gpl', palette_gpl),
+}
+
+# Files of the archive, one palette at a time -----------------------
+def export_files(palette_ids, formats=tuple(EXPORT_FORMATS), n=None):
+    catalog = get_palette_catalog()
+    for palette_id in palette_ids:
+        entry = catalog[palette_id]
+        rgb = resample_palette(entry['rgb'], n, entry['kind'])
+        for name in formats:
+            folder, extension, writer = EXPORT_FORMATS[name]
+            yield f"{folder}/{entry['kind']}/{entry['name']}.{extension}", writer(entry, rgb)
+
+    manifest = {'version': EXPORT_VERSION, 'palettes': list(palette_ids), 'formats': list(formats), 'n': n}
+    yield 'manifest.json', json.dumps(manifest, indent=2) + '\n'
+
+# Write-only file that hands out what was written since the last call
+class _ZipStream(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+# Stream a ZIP archive of the files, one compressed file at a time --
+def stream_zip(files):
+    # The stream can not seek, so zipfile writes a data descriptor after every file
+    # and only one file is held in memory at a time
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            info = zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            archive.writestr(info, content)
+            yield stream.pop()
+    yield stream.pop()
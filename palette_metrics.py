@@ -0,0 +1,209 @@
+import argparse
+import time
+from functools import lru_cache
+import numpy as np
+from palette_catalog import get_palette_catalog
+
+
+# sRGB (D65) to CIE XYZ and the D65 white point
+SRGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                        [0.2126729, 0.7151522, 0.0721750],
+                        [0.0193339, 0.1191920, 0.9503041]])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+# Linear sRGB to LMS and LMS (cube root) to OKLab, from Björn Ottosson's OKLab
+SRGB_TO_LMS = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                        [0.2119034982, 0.6806995451, 0.1073969566],
+                        [0.0883024619, 0.2817188376, 0.6299787005]])
+LMS_TO_OKLAB = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                         [1.9779984951, -2.4285922050, 0.4505937099],
+                         [0.0259040371, 0.7827717662, -0.8086757660]])
+
+# The inverse transforms, back to sRGB
+XYZ_TO_SRGB = np.linalg.inv(SRGB_TO_XYZ)
+LMS_TO_SRGB = np.linalg.inv(SRGB_TO_LMS)
+OKLAB_TO_LMS = np.linalg.inv(LMS_TO_OKLAB)
+
+# Simulation of color vision deficiencies in linear sRGB: the matrices of Machado, Oliveira and
+# Fernandes (2009) at full severity; achromatopsia keeps the relative luminance only
+CVD_MATRICES = {
+    'protanopia': np.array([[0.152286, 1.052583, -0.204868],
+                            [0.114503, 0.786281, 0.099216],
+                            [-0.003882, -0.048116, 1.051998]]),
+    'deuteranopia': np.array([[0.367322, 0.860646, -0.227968],
+                              [0.280085, 0.672501, 0.047413],
+                              [-0.011820, 0.042940, 0.968881]]),
+    'tritanopia': np.array([[1.255528, -0.076749, -0.178779],
+                            [-0.078411, 0.930809, 0.147602],
+                            [0.004733, 0.691367, 0.303900]]),
+    'achromatopsia': np.tile([0.2126, 0.7152, 0.0722], (3, 1)),
+}
+
+# Deficiencies of the distinguishability score; without achromatopsia, which every palette fails
+CVD_SCORED = ('protanopia', 'deuteranopia', 'tritanopia')
+
+# Metrics of a palette: key -> (label, higher is better)
+METRICS = {
+    'lightness_monotonicity': ('Lightness monotonicity', True),
+    'lightness_range': ('Lightness range', True),
+    'step_delta_e': ('Mean ΔE between steps', True),
+    'step_delta_e_cv': ('Perceptual uniformity (ΔE step variation)', False),
+    'min_delta_e': ('Minimum ΔE between colors', True),
+    'symmetry': ('Midpoint asymmetry', False),
+    'cvd_min_delta_e': ('Minimum ΔE with color blindness', True),
+    **{f'min_delta_e_{deficiency}': (f'Minimum ΔE with {deficiency}', True) for deficiency in CVD_MATRICES},
+}
+
+# Metrics the palettes of a type can be sorted by on its page
+SORT_METRICS = {
+    'sequential': ('lightness_monotonicity', 'step_delta_e_cv', 'lightness_range', 'cvd_min_delta_e'),
+    'diverging': ('symmetry', 'step_delta_e_cv', 'lightness_range', 'cvd_min_delta_e'),
+    'cyclical': ('step_delta_e_cv', 'lightness_range', 'cvd_min_delta_e'),
+    'qualitative': ('min_delta_e', 'lightness_range', 'cvd_min_delta_e'),
+}
+
+# Largest number of color pairs compared at once for the minimum ΔE
+PAIR_CHUNK = 1 << 22
+
+# Metrics computed so far, keyed by the color hash of a palette
+_metrics_table = {}
+
+
+# Color spaces of (n, 3) arrays of 0-255 sRGB values ----------------
+def srgb_to_linear(rgb):
+    c = np.asarray(rgb, dtype=float) / 255
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def linear_to_srgb(linear):
+    c = np.clip(linear, 0, 1)
+    return 255 * np.where(c <= 0.0031308, 12.92 * c, 1.055 * c ** (1/2.4) - 0.055)
+
+def rgb_to_lab(rgb):
+    xyz = srgb_to_linear(rgb) @ SRGB_TO_XYZ.T / D65_WHITE
+    f = np.where(xyz > (6/29)**3, np.cbrt(xyz), xyz / (3 * (6/29)**2) + 4/29)
+    return np.stack([116*f[..., 1] - 16, 500*(f[..., 0] - f[..., 1]), 200*(f[..., 1] - f[..., 2])], axis=-1)
+
+def rgb_to_oklab(rgb):
+    return np.cbrt(srgb_to_linear(rgb) @ SRGB_TO_LMS.T) @ LMS_TO_OKLAB.T
+
+# Back to 0-255 sRGB; colors outside the sRGB gamut are clipped
+def lab_to_rgb(lab):
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    xyz = np.where(f > 6/29, f**3, 3 * (6/29)**2 * (f - 4/29)) * D65_WHITE
+    return linear_to_srgb(xyz @ XYZ_TO_SRGB.T)
+
+def oklab_to_rgb(oklab):
+    return linear_to_srgb((oklab @ OKLAB_TO_LMS.T) ** 3 @ LMS_TO_SRGB.T)
+
+# Colors as seen with a color vision deficiency, as 0-255 sRGB values
+def simulate_cvd(rgb, deficiency):
+    return linear_to_srgb(srgb_to_linear(rgb) @ CVD_MATRICES[deficiency].T)
+
+# OKLab is scaled by 100, so its ΔE and lightness are on the scale of CIELAB
+COLOR_SPACES = {'lab': rgb_to_lab, 'oklab': lambda rgb: 100 * rgb_to_oklab(rgb)}
+
+# Metrics of many palettes in one pass -------------------------------
+def compute_metrics(palettes, space='lab'):
+    # palettes is a list of (n, 3) arrays of 0-255 values with at least 2 colors each;
+    # they are concatenated and converted at once, and every metric is reduced per palette
+    lengths = np.array([len(rgb) for rgb in palettes])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    n_palettes, n_steps = len(palettes), lengths - 1
+    lab = COLOR_SPACES[space](np.concatenate(palettes))
+    lightness = lab[:, 0]
+
+    # Steps between neighbouring colors, without the ones between two palettes
+    within = np.ones(len(lab) - 1, dtype=bool)
+    within[starts[1:] - 1] = False
+    step_palette = np.repeat(np.arange(n_palettes), n_steps)
+    steps = np.linalg.norm(np.diff(lab, axis=0), axis=1)[within]
+    step_lightness = np.diff(lightness)[within]
+
+    # Uniformity: the variation of ΔE between steps relative to its mean
+    step_mean = np.bincount(step_palette, steps, n_palettes) / n_steps
+    step_std = np.sqrt(np.bincount(step_palette, (steps - step_mean[step_palette])**2, n_palettes) / n_steps)
+    step_cv = np.divide(step_std, step_mean, out=np.zeros(n_palettes), where=step_mean > 0)
+
+    # Monotonicity: the share of steps whose lightness moves from the first color towards the last one
+    direction = np.sign(lightness[starts + n_steps] - lightness[starts])
+    monotonic = np.bincount(step_palette, np.sign(step_lightness) == direction[step_palette], n_palettes) / n_steps
+    lightness_range = np.maximum.reduceat(lightness, starts) - np.minimum.reduceat(lightness, starts)
+
+    # Symmetry: the mean lightness and chroma difference of the colors mirrored at the midpoint
+    palette_of = np.repeat(np.arange(n_palettes), lengths)
+    mirror = 2*starts[palette_of] + lengths[palette_of] - 1 - np.arange(len(lab))
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    asymmetry = np.hypot(lightness - lightness[mirror], chroma - chroma[mirror])
+    symmetry = np.bincount(palette_of, asymmetry, n_palettes) / lengths
+
+    # Minimum pairwise ΔE: palettes of the same length are stacked and compared together
+    min_delta_e = np.empty(n_palettes)
+    for n in np.unique(lengths):
+        members = np.flatnonzero(lengths == n)
+        for chunk in np.array_split(members, max(len(members) * n * n // PAIR_CHUNK, 1)):
+            stack = lab[starts[chunk][:, None] + np.arange(n)]
+            distances = np.linalg.norm(stack[:, :, None] - stack[:, None], axis=-1)
+            distances[:, np.arange(n), np.arange(n)] = np.inf
+            min_delta_e[chunk] = distances.min(axis=(1, 2))
+
+    columns = {'lightness_monotonicity': monotonic, 'lightness_range': lightness_range, 'step_delta_e': step_mean,
+               'step_delta_e_cv': step_cv, 'min_delta_e': min_delta_e, 'symmetry': symmetry}
+    return [{key: round(float(values[i]), 4) for key, values in columns.items()} for i in range(n_palettes)]
+
+# Every metric of many palettes, with the color vision deficiencies -
+def score_palettes(palettes):
+    rows = compute_metrics(palettes)
+    # Distinguishability with a deficiency: the minimum ΔE of the simulated colors,
+    # simulated for every palette at once
+    offsets = np.cumsum([len(rgb) for rgb in palettes])[:-1]
+    for deficiency in CVD_MATRICES:
+        simulated = np.split(simulate_cvd(np.concatenate(palettes), deficiency), offsets)
+        for row, simulated_row in zip(rows, compute_metrics(simulated)):
+            row[f'min_delta_e_{deficiency}'] = simulated_row['min_delta_e']
+    for row in rows:
+        row['cvd_min_delta_e'] = min(row[f'min_delta_e_{deficiency}'] for deficiency in CVD_SCORED)
+    return rows
+
+# Metrics of catalog entries, computed once per color hash ----------
+def palette_metrics(entries):
+    missing = {}
+    for entry in entries:
+        if entry['hash'] not in _metrics_table:
+            missing[entry['hash']] = entry['rgb']
+    if missing:
+        _metrics_table.update(zip(missing, score_palettes(list(missing.values()))))
+    return {entry['id']: _metrics_table[entry['hash']] for entry in entries}
+
+@lru_cache(maxsize=None)
+def catalog_metrics():
+    return palette_metrics(get_palette_catalog().values())
+
+# Order palette ids by a metric, best first --------------------------
+def sort_palettes(palette_ids, metric):
+    # The sort is stable, so palettes with the same value keep their order
+    metrics = catalog_metrics()
+    values = np.array([metrics[palette_id][metric] for palette_id in palette_ids])
+    order = np.argsort(-values if METRICS[metric][1] else values, kind='stable')
+    return [palette_ids[i] for i in order]
+
+# Short text of the metrics of a palette, for tooltips ---------------
+def metrics_summary(palette_id, kind):
+    metrics = catalog_metrics()[palette_id]
+    return ' · '.join(f'{METRICS[key][0]}: {metrics[key]:.3g}' for key in SORT_METRICS[kind])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score every palette of the catalog.')
+    parser.add_argument('metric', nargs='?', choices=tuple(METRICS), default='step_delta_e_cv')
+    parser.add_argument('--kind', help='only the palettes of a type')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    catalog = get_palette_catalog()
+    start = time.perf_counter()
+    metrics = catalog_metrics()
+    print(f'Scored {len(metrics)} palettes in {1000 * (time.perf_counter() - start):.1f} ms')
+    ids = [palette_id for palette_id in catalog if args.kind in (None, catalog[palette_id]['kind'])]
+    for palette_id in sort_palettes(ids, args.metric)[:args.top]:
+        print(f'{palette_id:40} {metrics[palette_id][args.metric]:10.4f}')
@@ -0,0 +1,169 @@
+import argparse
+import re
+import time
+from functools import lru_cache
+import numpy as np
+from raster import colors_to_rgb
+from palette_catalog import get_palette_catalog, format_colors, SEARCH_LIMIT
+from palette_metrics import rgb_to_oklab
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    # scipy is optional; without it the index is searched by a vectorized scan
+    cKDTree = None
+
+
+# Number of colors a palette is resampled to for its feature vector
+FEATURE_STEPS = 16
+
+# Number of similar palettes returned by default
+SIMILAR_LIMIT = 10
+
+# Distance of a near color, as ΔE in OKLab scaled by 100
+NEAR_COLOR_RADIUS = 5.0
+
+# Color names the plotly templates use
+NAMED_COLORS = {'white': '#ffffff', 'black': '#000000'}
+
+
+# Nearest neighbours of a set of points ------------------------------
+class _NearestIndex:
+    # A KD-tree when scipy is installed, else squared distances from one matrix product
+    def __init__(self, points):
+        self.points = points
+        self.tree = cKDTree(points) if cKDTree is not None else None
+        self.squared_norms = (points**2).sum(axis=1)
+
+    def _squared_distances(self, x):
+        return np.maximum(self.squared_norms - 2 * x @ self.points.T + (x**2).sum(axis=-1, keepdims=True), 0)
+
+    def query(self, xs, k):
+        # Distances and indices of the k nearest points of every row of xs, nearest first
+        k = min(k, len(self.points))
+        if self.tree is not None:
+            distances, indices = self.tree.query(xs, k)
+            return distances.reshape(len(xs), k), indices.reshape(len(xs), k)
+        squared = self._squared_distances(xs)
+        indices = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        indices = np.take_along_axis(indices, np.argsort(np.take_along_axis(squared, indices, axis=1), axis=1), axis=1)
+        return np.sqrt(np.take_along_axis(squared, indices, axis=1)), indices
+
+    def within(self, x, radius):
+        # Distances and indices of the points within radius, in no order
+        if self.tree is not None:
+            indices = np.array(self.tree.query_ball_point(x, radius), dtype=int)
+            return np.linalg.norm(self.points[indices] - x, axis=1), indices
+        squared = self._squared_distances(x)
+        indices = np.flatnonzero(squared <= radius**2)
+        return np.sqrt(squared[indices]), indices
+
+# Feature vectors of palettes -----------------------------------------
+def palette_features(palettes, steps=FEATURE_STEPS):
+    # palettes is a list of (rgb, kind); every palette becomes steps colors in OKLab.
+    # Continuous palettes are interpolated and qualitative ones take evenly spaced colors.
+    # The vectors are scaled so their distance is the RMS ΔE between the resampled colors
+    t = np.linspace(0, 1, steps)
+    resampled = []
+    for rgb, kind in palettes:
+        if kind == 'qualitative':
+            resampled.append(rgb[np.round(t * (len(rgb) - 1)).astype(int)])
+        else:
+            stops = np.linspace(0, 1, len(rgb))
+            resampled.append(np.stack([np.interp(t, stops, rgb[:, k]) for k in range(3)], axis=1))
+    oklab = 100 * rgb_to_oklab(np.stack(resampled))
+    return oklab.reshape(len(palettes), -1) / np.sqrt(steps)
+
+# Index of the palettes and of their colors ---------------------------
+@lru_cache(maxsize=None)
+def similarity_index():
+    # Reversed '_r' palettes are left out; queries compare both orientations instead
+    catalog = get_palette_catalog()
+    ids = [palette_id for palette_id, entry in catalog.items() if not entry['reversed']]
+    features = palette_features([(catalog[palette_id]['rgb'], catalog[palette_id]['kind']) for palette_id in ids])
+
+    # Every color of every palette, with the palette it belongs to
+    colors = np.concatenate([catalog[palette_id]['rgb'] for palette_id in ids])
+    color_palette = np.repeat(np.arange(len(ids)), [len(catalog[palette_id]['rgb']) for palette_id in ids])
+    return np.array(ids), _NearestIndex(features), colors, color_palette, _NearestIndex(100 * rgb_to_oklab(colors))
+
+def _palette_entry(palette_id):
+    # A palette of the catalog, or the reverse of one for '<name>_r'; KeyError if there is none
+    catalog = get_palette_catalog()
+    if palette_id in catalog:
+        return catalog[palette_id]
+    entry = catalog[palette_id.removesuffix('_r')]
+    return {**entry, 'id': palette_id, 'rgb': entry['rgb'][::-1]}
+
+# Palettes that look like a palette, across all types ----------------
+def similar_palettes(palette_id, k=SIMILAR_LIMIT):
+    # Returns [{'id', 'distance', 'reversed'}], nearest first; reversed means the palette
+    # looks like this one when it is reversed. The distance is the RMS ΔE in OKLab (x 100)
+    entry = _palette_entry(palette_id)
+    ids, features, _, _, _ = similarity_index()
+    queries = palette_features([(entry['rgb'], entry['kind']), (entry['rgb'][::-1], entry['kind'])])
+
+    # One more than k, as the palette itself is among the nearest
+    found = {}
+    for reversed_, distances, indices in zip((False, True), *features.query(queries, k + 1)):
+        for distance, index in zip(distances, indices):
+            match = str(ids[index])
+            if match == palette_id.removesuffix('_r') or (match in found and found[match][0] <= distance):
+                continue
+            found[match] = (float(distance), reversed_)
+    nearest = sorted(found.items(), key=lambda item: item[1][0])[:k]
+    return [{'id': match, 'distance': round(distance, 3), 'reversed': reversed_}
+            for match, (distance, reversed_) in nearest]
+
+# Palettes with a color near a color ---------------------------------
+def parse_color(color):
+    # A hex color with or without '#', an rgb() color or a color name of NAMED_COLORS, as an (1, 3) array;
+    # ValueError if it is none of them
+    color = NAMED_COLORS.get(color.strip().lower(), color.strip())
+    if re.fullmatch(r'#?[0-9a-fA-F]{6}', color):
+        return colors_to_rgb([f"#{color.lstrip('#')}"])
+    match = re.fullmatch(r'rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)', color)
+    if match and all(int(value) <= 255 for value in match.groups()):
+        return np.array([[float(value) for value in match.groups()]])
+    raise ValueError(f'Unknown color {color!r}')
+
+def palettes_near_color(color, radius=NEAR_COLOR_RADIUS, kind=None, limit=SEARCH_LIMIT):
+    # Returns the first matches [{'id', 'color', 'index', 'distance'}] by the distance of their
+    # nearest color, and the number of matches
+    ids, _, colors, color_palette, color_index = similarity_index()
+    distances, indices = color_index.within(100 * rgb_to_oklab(parse_color(color))[0], radius)
+    if kind is not None:
+        keep = np.char.startswith(ids[color_palette[indices]], f'{kind}/')
+        distances, indices = distances[keep], indices[keep]
+
+    # The nearest color of every palette: sorted by palette, then distance, the first of each palette
+    order = np.lexsort((distances, color_palette[indices]))
+    distances, indices = distances[order], indices[order]
+    first = np.flatnonzero(np.diff(color_palette[indices], prepend=-1))
+    nearest = first[np.argsort(distances[first], kind='stable')]
+    starts = np.searchsorted(color_palette, color_palette[indices[nearest]])
+    matches = [{'id': str(ids[color_palette[indices[i]]]), 'color': hex_color, 'index': int(indices[i] - start),
+                'distance': round(float(distances[i]), 3)}
+               for i, start, hex_color in zip(nearest[:limit], starts[:limit],
+                                              format_colors(colors[indices[nearest[:limit]]]))]
+    return matches, len(nearest)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find the palettes that look like a palette or contain a color.')
+    parser.add_argument('query', help="a palette id such as 'sequential/Viridis', or a color such as '#ff0000'")
+    parser.add_argument('-k', type=int, default=SIMILAR_LIMIT)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    similarity_index()
+    print(f"Indexed {len(similarity_index()[0])} palettes in {1000 * (time.perf_counter() - start):.1f} ms "
+          f"({'KD-tree' if cKDTree is not None else 'scan'})")
+    start = time.perf_counter()
+    if '/' in args.query:
+        results = similar_palettes(args.query, args.k)
+    else:
+        results, _ = palettes_near_color(args.query, limit=args.k)
+    print(f'Query took {1000 * (time.perf_counter() - start):.3f} ms')
+    for result in results:
+        print(result)
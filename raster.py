@@ -0,0 +1,256 @@
+import base64
+import struct
+import zlib
+from functools import lru_cache
+import numpy as np
+import plotly.colors as pc
+from plotly.exceptions import PlotlyError
+from downsampling import pool_matrix, index_ticks, window_bounds
+
+
+# Number of entries in a colormap lookup table
+LUT_SIZE = 256
+
+# Resolution of the invisible trace that carries the hover values
+HOVER_SHAPE = (60, 80)
+
+# Number of colorscale stops sent for the colorbar
+COLORBAR_STOPS = 32
+
+# Start of the image source of a rasterized chart
+PNG_DATA_PREFIX = 'data:image/png;base64,'
+
+
+# Convert a list of hex or rgb() colors to an (n, 3) array --------
+def colors_to_rgb(colors):
+    return np.array([pc.hex_to_rgb(color) if color.startswith('#') else pc.unlabel_rgb(color)
+                     for color in colors], dtype=float)
+
+# Interpolate evenly spaced colors into a lookup table ------------
+def interpolate_lut(colors, size=LUT_SIZE, stops=None):
+    # plotly.js interpolates colorscales linearly in RGB between the stops, evenly spaced by default;
+    # colors are color strings or an (n, 3) array
+    rgb = colors if isinstance(colors, np.ndarray) else colors_to_rgb(colors)
+    stops = np.linspace(0, 1, len(rgb)) if stops is None else np.asarray(stops, dtype=float)
+    t = np.linspace(0, 1, size)
+    return np.stack([np.interp(t, stops, rgb[:, k]) for k in range(3)], axis=1).round().astype(np.uint8)
+
+# Build the lookup tables of every continuous palette once --------
+@lru_cache(maxsize=None)
+def get_palette_luts():
+    palettes = {name: colors
+                for module in (pc.sequential, pc.diverging, pc.cyclical)
+                for name, colors in vars(module).items()
+                if isinstance(colors, list) and not name.endswith('_r') and not name.startswith('_')}
+
+    # One (n_palettes, 256, 3) uint8 array; palettes are found by name or by their colors
+    luts = np.stack([interpolate_lut(colors) for colors in palettes.values()])
+    by_name = {name.lower(): i for i, name in enumerate(palettes)}
+    by_colors = {tuple(colors): i for i, colors in enumerate(palettes.values())}
+    return luts, by_name, by_colors
+
+# Build the lookup table of any other palette name on first use --
+@lru_cache(maxsize=256)
+def named_lut(name):
+    # name is lowercase. The palettes of the catalog (external and qualitative ones too) come first,
+    # then the named colorscales of plotly such as 'jet'; '<name>_r' is the palette reversed
+    from palette_catalog import get_palette_catalog    # palette_catalog imports this module
+    for entry in get_palette_catalog().values():
+        if entry['name'].lower() == name:
+            return interpolate_lut(entry['rgb'])
+    if name.endswith('_r'):
+        return named_lut(name[:-2])[::-1]
+    try:
+        colorscale = pc.get_colorscale(name)
+    except PlotlyError:
+        raise KeyError(f'Unknown palette {name!r}') from None
+    return interpolate_lut([color for _, color in colorscale], stops=[stop for stop, _ in colorscale])
+
+# Get the lookup table for a palette name or a list of colors -----
+def palette_lut(colorscale):
+    luts, by_name, by_colors = get_palette_luts()
+    if isinstance(colorscale, str):
+        name = colorscale.lower()
+        if name in by_name:
+            return luts[by_name[name]]
+        if name.endswith('_r') and name[:-2] in by_name:
+            return luts[by_name[name[:-2]]][::-1]
+        return named_lut(name)
+    if tuple(colorscale) in by_colors:
+        return luts[by_colors[tuple(colorscale)]]
+    return interpolate_lut(colorscale)
+
+# Colorscale for the colorbar, sampled from the lookup table ------
+def lut_colorscale(lut, n_stops=COLORBAR_STOPS):
+    positions = np.linspace(0, 1, n_stops)
+    rows = lut[(positions * (len(lut)-1)).round().astype(int)]
+    return [[float(p), f'rgb({r},{g},{b})'] for p, (r, g, b) in zip(positions, rows)]
+
+# Map values to RGBA pixels; missing values are transparent -------
+def colorize(z, lut, zmin, zmax):
+    z = np.asarray(z, dtype=float)
+    missing = np.isnan(z)
+    scale = (len(lut) - 1) / (zmax - zmin) if zmax > zmin else 0
+    index = np.clip(np.round((np.where(missing, zmin, z) - zmin) * scale), 0, len(lut)-1).astype(np.intp)
+
+    rgba = np.empty(z.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[index]
+    rgba[..., 3] = np.where(missing, 0, 255)
+    return rgba
+
+# Encode an RGBA array as a PNG file ------------------------------
+def encode_png(rgba, level=6):
+    height, width, channels = rgba.shape
+    rows = rgba.reshape(height, width*channels)
+
+    # Every row uses the Sub filter (difference to the pixel on the left), which suits smooth images
+    filtered = np.empty((height, width*channels + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:channels+1] = rows[:, :channels]
+    filtered[:, channels+1:] = rows[:, channels:] - rows[:, :-channels]
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(filtered.tobytes(), level)) + chunk(b'IEND', b''))
+
+# Decode a PNG file written by encode_png -------------------------
+def decode_png(data):
+    # Only 8-bit RGBA images with the None or Sub filter, as encode_png writes them
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('not a PNG file')
+    chunks, position = {}, 8
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position+4])
+        tag = data[position+4:position+8]
+        chunks[tag] = chunks.get(tag, b'') + data[position+8:position+8+length]
+        position += length + 12
+    width, height, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    if (depth, color_type) != (8, 6):
+        raise ValueError('only 8-bit RGBA PNG files are supported')
+
+    filtered = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, width*4 + 1)
+    if not np.isin(filtered[:, 0], (0, 1)).all():
+        raise ValueError('only the None and Sub PNG filters are supported')
+    pixels = filtered[:, 1:].reshape(height, width, 4)
+    # Sub rows are the running sum of their differences, modulo 256
+    summed = np.cumsum(pixels, axis=1, dtype=np.uint8)
+    return np.where((filtered[:, 0] == 1)[:, None, None], summed, pixels)
+
+def png_data_uri(rgba):
+    return PNG_DATA_PREFIX + base64.b64encode(encode_png(rgba)).decode('ascii')
+
+# Resample a grid to a shape: pool when larger, interpolate when smaller
+def resample_grid(z, shape):
+    z, _, _ = pool_matrix(z, *shape)
+    for axis, n in enumerate(shape):
+        if z.shape[axis] < n and z.shape[axis] > 1:
+            old = np.linspace(0, 1, z.shape[axis])
+            new = np.linspace(0, 1, n)
+            z = np.apply_along_axis(lambda line: np.interp(new, old, line), axis, z)
+    return z
+
+# Centres of the blocks a window is pooled into --------------------
+def block_centres(start, stop, n_blocks):
+    edges = np.linspace(start, stop, n_blocks+1)
+    return (edges[:-1] + edges[1:] - 1) / 2
+
+# Value range of a colorscale, as plotly.js computes it -----------
+def color_range(z, zmid=None):
+    zmin, zmax = float(np.nanmin(z)), float(np.nanmax(z))
+    if zmid is not None:
+        half = max(zmax - zmid, zmid - zmin)
+        zmin, zmax = zmid - half, zmid + half
+    return zmin, zmax
+
+# Image trace plus the traces that keep hover and the colorbar ----
+def raster_traces(rgba, x_centres, y_centres, hover_x, hover_y, hover_z, lut, zmin, zmax,
+                  hovertemplate, colorbar=None, zsmooth=False):
+    image = {'type': 'image', 'source': png_data_uri(rgba), 'zsmooth': zsmooth,
+             'x0': float(x_centres[0]), 'y0': float(y_centres[0]),
+             'dx': float(np.ptp(x_centres) / max(len(x_centres)-1, 1)) or 1.0,
+             'dy': float(np.ptp(y_centres) / max(len(y_centres)-1, 1)) or 1.0,
+             'hoverinfo': 'skip'}
+
+    # A transparent heatmap at a coarse resolution answers the hover
+    hover = {'type': 'heatmap', 'name': '',
+             'x': hover_x, 'y': hover_y, 'z': hover_z,
+             'colorscale': [[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']], 'showscale': False,
+             'hovertemplate': hovertemplate}
+
+    # An empty scatter draws the colorbar of the palette
+    scale = {'type': 'scatter', 'x': [None], 'y': [None], 'mode': 'markers',
+             'showlegend': False, 'hoverinfo': 'skip',
+             'marker': {'color': [zmin], 'cmin': zmin, 'cmax': zmax, 'showscale': True,
+                        'colorscale': lut_colorscale(lut), 'colorbar': colorbar or {}}}
+
+    return [image, hover, scale]
+
+# Rasterized heatmap of a DataFrame window --------------------------
+def raster_heatmap(df, colorscale, max_shape, hovertemplate, colorbar=None, zmid=None,
+                   x_range=None, y_range=None, pooling='mean'):
+    # Colors are scaled on the whole matrix, so they do not shift while zooming
+    zmin, zmax = color_range(df.values, zmid)
+    r0, r1 = window_bounds(y_range, df.shape[0])
+    c0, c1 = window_bounds(x_range, df.shape[1])
+    window = df.values[r0:r1, c0:c1]
+
+    lut = palette_lut(colorscale)
+    z, _, _ = pool_matrix(window, *max_shape, method=pooling)
+    hover_z, _, _ = pool_matrix(window, *HOVER_SHAPE)
+
+    traces = raster_traces(colorize(z, lut, zmin, zmax),
+                           block_centres(c0, c1, z.shape[1]), block_centres(r0, r1, z.shape[0]),
+                           block_centres(c0, c1, hover_z.shape[1]), block_centres(r0, r1, hover_z.shape[0]),
+                           hover_z, lut, zmin, zmax,
+                           hovertemplate.replace('%{x}', '%{x:.0f}').replace('%{y}', '%{y:.0f}'), colorbar)
+
+    # Axes are in matrix index units, as in the level-of-detail heatmap
+    return traces, {'xaxis': index_ticks(df.columns, c0, c1), 'yaxis': index_ticks(df.index, r0, r1),
+                    'uirevision': 'lod'}
+
+# Rasterized contour plot ------------------------------------------
+def raster_contour(x, y, z, colorscale, start, end, size, max_shape, hovertemplate,
+                   colorbar=None, coloring='fill', reversescale=False, transpose=False):
+    x, y, z = np.asarray(x, dtype=float), np.asarray(y, dtype=float), np.asarray(z, dtype=float)
+    if transpose:
+        x, y, z = y, x, z.T
+    lut = palette_lut(colorscale)
+    if reversescale:
+        lut = lut[::-1]
+
+    grid = resample_grid(z, max_shape)
+    zmin, zmax = float(np.nanmin(z)), float(np.nanmax(z))
+
+    # Levels start, start+size, ... split the values into bands, each drawn in its middle color
+    n_bands = max(int(np.ceil((end - start) / size)), 1)
+    band = np.clip(np.floor((grid - start) / size), -1, n_bands).astype(int)
+    band_values = start + (band + 0.5) * size
+    if coloring == 'heatmap':
+        rgba = colorize(grid, lut, zmin, zmax)
+    else:
+        rgba = colorize(np.clip(band_values, zmin, zmax), lut, zmin, zmax)
+        if coloring in ('lines', 'none'):
+            # Keep only the pixels where the band changes
+            edge = np.zeros(band.shape, dtype=bool)
+            edge[1:, :] |= band[1:, :] != band[:-1, :]
+            edge[:, 1:] |= band[:, 1:] != band[:, :-1]
+            if coloring == 'none':
+                rgba[..., :3] = 0
+            rgba[..., 3] = np.where(edge, 255, 0)
+
+    # Pixel centres in data coordinates
+    def centres(values, n_cells, n_pixels):
+        return np.interp(block_centres(0, n_cells, n_pixels) if n_pixels <= n_cells
+                         else np.linspace(0, n_cells-1, n_pixels), np.arange(n_cells), values)
+
+    hover_z = resample_grid(z, HOVER_SHAPE)
+    traces = raster_traces(rgba,
+                         centres(x, z.shape[1], grid.shape[1]), centres(y, z.shape[0], grid.shape[0]),
+                         centres(x, z.shape[1], hover_z.shape[1]), centres(y, z.shape[0], hover_z.shape[0]),
+                         hover_z, lut, zmin, zmax, hovertemplate, colorbar, zsmooth='fast')
+
+    # Image traces reverse the y axis unless its autorange is set
+    return traces, {'yaxis': {'autorange': True}}
@@ -0,0 +1,262 @@
+import argparse
+import gzip
+import importlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from dash import Dash, dcc, html, Input, Output, State
+import dash_bootstrap_components as dbc
+from chart_functions import config_mode
+from helper import create_swatch_label, create_reverse_switch
+from figure_cache import MAX_WORKERS
+import figure_cache
+
+
+# Folder of the exported site
+OUTPUT_DIR = './build/static'
+
+# Palette selected when a page opens, as on the pages of the app
+DEFAULT_PALETTES = {'sequential': 'Turbo', 'diverging': 'Spectral', 'qualitative': 'Bold',
+                    'cyclical': 'IceFire', 'contour': 'jet'}
+DEFAULT_REVERSED = {'cyclical'}
+DEFAULT_TEMPLATE = 'plotly'
+
+# Static hosts send extensionless files without a JSON content type, which the Dash renderer
+# needs; the layout and the callback definitions are exported as .json files instead
+FETCH_SHIM = '''
+(function () {
+    var fetch = window.fetch;
+    window.fetch = function (url, options) {
+        if (typeof url === 'string' && /_dash-(layout|dependencies)$/.test(url)) {
+            url += '.json';
+        }
+        return fetch.call(this, url, options);
+    };
+})();
+'''
+
+INDEX_STRING = '''<!DOCTYPE html>
+<html>
+    <head>
+        {%metas%}
+        <title>{%title%}</title>
+        {%favicon%}
+        {%css%}
+        <script>''' + FETCH_SHIM + '''</script>
+    </head>
+    <body>
+        {%app_entry%}
+        <footer>
+            {%config%}
+            {%scripts%}
+            {%renderer%}
+        </footer>
+    </body>
+</html>'''
+
+# Fetch the pre-rendered figures of the selected palette and template
+LOAD_FIGURES = '''
+async function (palette, reverse, template, charts) {
+    return Promise.all(charts.map(async function (chart) {
+        var name = (chart.palette ? palette + (reverse ? '_r' : '') : '_') + '.' + (chart.template ? template : '_') + '.json.gz';
+        var response = await fetch(chart.path + encodeURIComponent(name));
+        if (!response.ok) {
+            return window.dash_clientside.no_update;
+        }
+        var bytes = new Uint8Array(await response.arrayBuffer());
+        // Hosts that send the file with Content-Encoding: gzip have already decompressed it
+        if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+            var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return JSON.parse(await new Response(stream).text());
+        }
+        return JSON.parse(new TextDecoder().decode(bytes));
+    }));
+}
+'''
+
+
+# Flip the swatches of the dropdown while the palette is reversed
+FLIP_SWATCHES = '''
+function (reverse) {
+    return reverse ? 'mb-3 swatches-reversed' : 'mb-3';
+}
+'''
+
+
+# Path of a pre-rendered figure in the exported site ---------------
+def figure_file(page, chart, palette, template):
+    return f'figures/{page}/{chart}/{palette or "_"}.{template or "_"}.json.gz'
+
+# Point the bundled geometry of a figure at the base path of the site
+def rebase_figure(content, base_path):
+    # Maps link their GeoJSON from the root of the app
+    figure = json.loads(content)
+    for trace in figure.get('data', []):
+        if isinstance(trace.get('geojson'), str) and trace['geojson'].startswith('/'):
+            trace['geojson'] = base_path + trace['geojson'][1:]
+    return json.dumps(figure, separators=(',', ':'))
+
+# Write every figure of the registry as compressed JSON ------------
+def export_figures(output_dir, pages, base_path='/', cache_dir=figure_cache.CACHE_DIR, report=print):
+    start = time.perf_counter()
+    n_files, n_bytes = 0, 0
+    for page in pages:
+        for chart, entry in figure_cache.chart_registry[page].items():
+            for palette in entry['palettes']:
+                for template in entry['templates']:
+                    key = figure_cache.figure_key(page, chart, palette, template)
+                    content = (figure_cache.read_figure(key, cache_dir)
+                               or figure_cache.render_figure(page, chart, palette, template, cache_dir))
+                    if base_path != '/':
+                        content = rebase_figure(content, base_path)
+
+                    path = os.path.join(output_dir, figure_file(page, chart, palette, template))
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # mtime=0 keeps the files identical between builds, so hosts and browsers keep their caches
+                    data = gzip.compress(content.encode('utf-8'), mtime=0)
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                    n_files += 1
+                    n_bytes += len(data)
+    report(f'Wrote {n_files} figures ({n_bytes/1024**2:.1f} MB) in {time.perf_counter() - start:.1f} s')
+
+# Dropdown of the palettes of a page, with their swatches if there are any
+def palette_dropdown(page, palettes):
+    options = []
+    for name in palettes:
+        if os.path.exists(f'./assets/{page}_swatches/{name}.png'):
+            label = create_swatch_label(page, name)
+        else:
+            label = name
+        options.append({'label': label, 'value': name})
+    value = DEFAULT_PALETTES.get(page, palettes[0])
+    return dcc.Dropdown(id=f'static-{page}-palette', options=options, value=value if value in palettes else palettes[0],
+                        clearable=False, optionHeight=32, maxHeight=290, className='mb-3')
+
+# Dash app with one tab per page and only clientside callbacks ----
+def create_static_app(pages, base_path='/'):
+    static_app = Dash(__name__, requests_pathname_prefix=base_path, assets_folder=os.path.abspath('./assets'),
+                      title='Plotly Express Color Scales',
+                      external_stylesheets=[dbc.themes.CERULEAN, dbc.icons.BOOTSTRAP, dbc.icons.FONT_AWESOME])
+    static_app.index_string = INDEX_STRING
+    config = {**config_mode, 'topojsonURL': f'{base_path}assets/geo/'}
+
+    tabs = []
+    for page in pages:
+        entries = figure_cache.chart_registry[page]
+        palettes = list(dict.fromkeys(p for entry in entries.values() for p in entry['palettes'] if p is not None))
+        # Reversed palettes are chosen with a switch, as on the pages of the app
+        reversible = any(entry['reversible'] for entry in entries.values())
+        if reversible:
+            palettes = [p for p in palettes if not p.endswith('_r')]
+        chart_templates = list(dict.fromkeys(t for entry in entries.values() for t in entry['templates'] if t is not None))
+
+        # Pages without a palette or template choice get a fixed value instead of a dropdown
+        controls = []
+        palette_input = palette_dropdown(page, palettes) if palettes else dcc.Store(id=f'static-{page}-palette')
+        controls.append(dbc.Col(palette_input, width=6))
+        reverse_input = (create_reverse_switch(f'static-{page}-reverse', on=page in DEFAULT_REVERSED)
+                         if reversible else dcc.Store(id=f'static-{page}-reverse', data=False))
+        controls.append(dbc.Col(reverse_input, width=2))
+        template_input = (dcc.Dropdown(id=f'static-{page}-template', options=chart_templates, clearable=False,
+                                       value=DEFAULT_TEMPLATE if DEFAULT_TEMPLATE in chart_templates else chart_templates[0],
+                                       className='mb-3')
+                          if chart_templates else dcc.Store(id=f'static-{page}-template'))
+        controls.append(dbc.Col(template_input, width=3))
+
+        charts = [{'path': f"{base_path}figures/{page}/{chart}/",
+                   'palette': entry['palettes'] != (None,), 'template': entry['templates'] != (None,)}
+                  for chart, entry in entries.items()]
+        graphs = [dbc.Col(dbc.Card(dcc.Graph(id=f'static-{page}-{chart}', config=config), body=True),
+                          width=12 if len(entries) == 1 else 6, className='mb-3')
+                  for chart in entries]
+
+        tabs.append(dbc.Tab(dbc.Container([dbc.Row(controls, className='mt-3'), dbc.Row(graphs),
+                                           dcc.Store(id=f'static-{page}-charts', data=charts)], fluid=True),
+                            label=page.title(), tab_id=page))
+
+        static_app.clientside_callback(
+            LOAD_FIGURES,
+            [Output(f'static-{page}-{chart}', 'figure') for chart in entries],
+            Input(f'static-{page}-palette', 'data' if not palettes else 'value'),
+            Input(f'static-{page}-reverse', 'on' if reversible else 'data'),
+            Input(f'static-{page}-template', 'data' if not chart_templates else 'value'),
+            State(f'static-{page}-charts', 'data'),
+        )
+        if reversible:
+            static_app.clientside_callback(FLIP_SWATCHES, Output(f'static-{page}-palette', 'className'),
+                                           Input(f'static-{page}-reverse', 'on'))
+
+    header = dbc.Card([
+        dbc.CardImg(src='assets/header_img.png', top=True, style={'opacity': 0.9, 'height': '80px'}),
+        dbc.CardImgOverlay(html.H1('Interactive Plotly Express Color Scale Selection',
+                                   className='text-center text-white align-items-center')),
+    ], class_name='mb-3')
+    static_app.layout = dbc.Container([header, dbc.Tabs(tabs, active_tab=pages[0])])
+    return static_app
+
+# Save every file the browser loads from the static app -------------
+def export_site(static_app, output_dir, base_path='/', report=print):
+    client = static_app.server.test_client()
+
+    def save(url, name=None):
+        route = '/' + url[len(base_path):].split('?')[0]
+        response = client.get(route)
+        if response.status_code != 200:
+            raise RuntimeError(f'{route} returned {response.status_code}')
+        path = os.path.join(output_dir, name or route.lstrip('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(response.data)
+        return response.data
+
+    index = save(base_path, 'index.html').decode('utf-8')
+    save(f'{base_path}_dash-layout', '_dash-layout.json')
+    save(f'{base_path}_dash-dependencies', '_dash-dependencies.json')
+
+    # Scripts, stylesheets and the favicon of the page (assets are copied below)
+    urls = [url for url in re.findall(r'(?:src|href)="([^"]+)"', index)
+            if url.startswith(base_path) and not url.startswith(f'{base_path}assets/')]
+    for url in urls:
+        save(url)
+
+    # Scripts the component libraries load on demand (plotly.js, async chunks), under their plain
+    # names next to the main scripts; some libraries list chunks they do not ship
+    for package, paths in static_app.registered_paths.items():
+        package_dir = os.path.dirname(sys.modules[package].__file__)
+        for path in sorted(paths):
+            if not path.endswith('.map') and os.path.exists(os.path.join(package_dir, path)):
+                save(f'{base_path}_dash-component-suites/{package}/{path}')
+
+    shutil.copytree('./assets', os.path.join(output_dir, 'assets'), dirs_exist_ok=True)
+    report(f'Wrote the app ({len(urls)} scripts and stylesheets) and the assets to {output_dir}')
+
+# Build the whole static site ---------------------------------------
+def build_static_site(pages=None, output_dir=OUTPUT_DIR, base_path='/', max_workers=MAX_WORKERS,
+                      cache_dir=figure_cache.CACHE_DIR, report=print):
+    # The pages register their charts; the app also claims the page callbacks,
+    # so they do not end up in the static app
+    app = importlib.import_module('app').app
+    app.server.test_client().get('/')
+    pages = pages or list(figure_cache.chart_registry)
+
+    figure_cache.warm_up(pages, max_workers, cache_dir, report)
+    export_figures(output_dir, pages, base_path, cache_dir, report)
+    export_site(create_static_app(pages, base_path), output_dir, base_path, report)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the gallery as a static site that needs no Python server.')
+    parser.add_argument('pages', nargs='*', help='pages to export (default: all)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--base-path', default='/', help='URL path the site is served from, e.g. /gallery/')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--cache-dir', default=figure_cache.CACHE_DIR)
+    args = parser.parse_args()
+
+    os.environ.pop('WARM_FIGURE_CACHE', None)
+    base_path = '/' + args.base_path.strip('/') + '/' if args.base_path.strip('/') else '/'
+    build_static_site(args.pages, args.output_dir, base_path, args.workers, args.cache_dir)
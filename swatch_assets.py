@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import plotly
+import plotly.colors as pc
+from raster import colors_to_rgb, encode_png
+from figure_cache import MAX_WORKERS
+
+
+# Folder with one <kind>_swatches folder per palette type
+ASSETS_DIR = './assets'
+MANIFEST_FILE = 'swatches.json'
+
+# Sprite atlases of the swatches and their index; Dash loads every stylesheet of the assets folder
+ATLAS_DIR = 'swatch_atlas'
+ATLAS_INDEX = 'swatch_atlas.json'
+ATLAS_CSS = 'swatch_atlas.css'
+
+# One atlas per palette type, or one for every palette
+ATLAS_GROUPS = ('kind', 'all')
+
+# Width and height of a swatch in pixels; the palette name is shown next to it in the dropdowns
+SWATCH_SIZE = (400, 20)
+
+# Change when the drawing of a swatch changes, so every swatch is rendered again
+SWATCH_VERSION = 1
+
+# Palette types with a folder of swatches
+SWATCH_KINDS = ('sequential', 'diverging', 'cyclical', 'qualitative')
+
+
+# Every palette of plotly, keyed by '<kind>/<name>' -----------------
+def swatch_palettes(kinds=SWATCH_KINDS):
+    # Reversed '_r' palettes show the swatch of their palette flipped by CSS
+    return {f'{kind}/{name}': colors
+            for kind in kinds
+            for name, colors in vars(getattr(pc, kind)).items()
+            if isinstance(colors, list) and not name.startswith('_') and not name.endswith('_r')}
+
+# Hash of everything a swatch is drawn from -------------------------
+def swatch_hash(colors, size=SWATCH_SIZE):
+    content = [SWATCH_VERSION, list(size), colors_to_rgb(colors).tolist()]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+# Draw the colors of a palette as equally wide blocks ---------------
+def render_swatch(colors, size=SWATCH_SIZE):
+    width, height = size
+    rgb = colors_to_rgb(colors).round().astype(np.uint8)
+    block = np.arange(width) * len(rgb) // width
+
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[..., :3] = rgb[block]
+    rgba[..., 3] = 255
+    return rgba
+
+def swatch_file(palette_id):
+    kind, name = palette_id.split('/')
+    return f'{kind}_swatches/{name}.png'
+
+def _render_job(palette_id, colors, size, assets_dir):
+    path = os.path.join(assets_dir, swatch_file(palette_id))
+    data = encode_png(render_swatch(colors, size), level=9)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return palette_id, len(data)
+
+# Manifest of the rendered swatches ---------------------------------
+def read_manifest(assets_dir=ASSETS_DIR):
+    try:
+        with open(os.path.join(assets_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'swatches': {}}
+
+# Stack the swatches into sprite atlases with a CSS class per palette
+def build_atlas(assets_dir=ASSETS_DIR, size=SWATCH_SIZE, group='kind'):
+    width, height = size
+    palettes = swatch_palettes()
+    groups = {}
+    for palette_id in palettes:
+        groups.setdefault(palette_id.split('/')[0] if group == 'kind' else 'all', []).append(palette_id)
+
+    os.makedirs(os.path.join(assets_dir, ATLAS_DIR), exist_ok=True)
+    index = {'version': SWATCH_VERSION, 'size': list(size), 'atlases': {}, 'swatches': {}}
+    css = [f'.swatch {{ flex: none; width: {width}px; height: {height}px; background-repeat: no-repeat; }}']
+    for name, palette_ids in groups.items():
+        # The swatches are drawn again rather than decoded from their files; it takes milliseconds
+        data = encode_png(np.concatenate([render_swatch(palettes[palette_id], size) for palette_id in palette_ids]), level=9)
+        file = f'{ATLAS_DIR}/{name}.png'
+        with open(os.path.join(assets_dir, file), 'wb') as f:
+            f.write(data)
+
+        # The content hash in the URL replaces the cached image when a palette changes
+        version = hashlib.sha256(data).hexdigest()[:12]
+        index['atlases'][name] = {'file': file, 'version': version, 'bytes': len(data)}
+        kinds = sorted({palette_id.split('/')[0] for palette_id in palette_ids})
+        css.append(f"{', '.join(f'.swatch-{kind}' for kind in kinds)} {{ background-image: url({file}?v={version}); }}")
+        for row, palette_id in enumerate(palette_ids):
+            index['swatches'][palette_id] = {'atlas': name, 'x': 0, 'y': row * height}
+            css.append(f".swatch-{palette_id.replace('/', '-')} {{ background-position: 0 {-row * height}px; }}")
+
+    # Atlases of the other grouping are left over from an earlier build
+    for file in os.listdir(os.path.join(assets_dir, ATLAS_DIR)):
+        if file[:-4] not in groups:
+            os.remove(os.path.join(assets_dir, ATLAS_DIR, file))
+
+    with open(os.path.join(assets_dir, ATLAS_INDEX), 'w') as f:
+        json.dump(index, f, indent=1)
+        f.write('\n')
+    with open(os.path.join(assets_dir, ATLAS_CSS), 'w') as f:
+        f.write('/* Generated by swatch_assets.py */\n' + '\n'.join(css) + '\n')
+    return index
+
+# Render the swatches whose palette changed -------------------------
+def build_swatches(kinds=SWATCH_KINDS, assets_dir=ASSETS_DIR, size=SWATCH_SIZE, max_workers=MAX_WORKERS,
+                   force=False, atlas='kind', report=print):
+    start = time.perf_counter()
+    palettes = swatch_palettes(kinds)
+    old = read_manifest(assets_dir)['swatches']
+    hashes = {palette_id: swatch_hash(colors, size) for palette_id, colors in palettes.items()}
+
+    # A swatch is skipped when its manifest entry has the same hash and its file is still there
+    missing = [palette_id for palette_id in palettes
+               if force or old.get(palette_id, {}).get('hash') != hashes[palette_id]
+               or not os.path.exists(os.path.join(assets_dir, swatch_file(palette_id)))]
+    report(f'Rendering {len(missing)} of {len(palettes)} swatches with {max_workers} processes into {assets_dir}')
+
+    for kind in kinds:
+        os.makedirs(os.path.join(assets_dir, f'{kind}_swatches'), exist_ok=True)
+    sizes = {}
+    if missing:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            jobs = [(palette_id, palettes[palette_id], size, assets_dir) for palette_id in missing]
+            sizes = dict(pool.map(_render_job, *zip(*jobs), chunksize=max(len(jobs) // (4*max_workers), 1)))
+
+    # Swatches of palettes that plotly no longer has are removed
+    removed = [palette_id for palette_id in old
+               if palette_id.split('/')[0] in kinds and palette_id not in palettes]
+    for palette_id in removed:
+        path = os.path.join(assets_dir, swatch_file(palette_id))
+        if os.path.exists(path):
+            os.remove(path)
+
+    swatches = {palette_id: entry for palette_id, entry in old.items()
+                if palette_id.split('/')[0] not in kinds}
+    for palette_id, colors in palettes.items():
+        swatches[palette_id] = {'file': swatch_file(palette_id), 'hash': hashes[palette_id], 'n_colors': len(colors),
+                                'bytes': sizes.get(palette_id, old.get(palette_id, {}).get('bytes'))}
+    manifest = {'version': SWATCH_VERSION, 'plotly': plotly.__version__, 'size': list(size),
+                'swatches': dict(sorted(swatches.items()))}
+    with open(os.path.join(assets_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=1)
+        f.write('\n')
+
+    index = build_atlas(assets_dir, size, atlas)
+    report(f'Done in {time.perf_counter() - start:.2f} s; {len(missing)} rendered, {len(removed)} removed, '
+           f'{len(palettes) - len(missing)} unchanged; {len(index["atlases"])} atlases')
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the palette swatches of the dropdowns from plotly.colors.')
+    parser.add_argument('kinds', nargs='*', help=f'palette types among {", ".join(SWATCH_KINDS)} (default: all)')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--assets-dir', default=ASSETS_DIR)
+    parser.add_argument('--force', action='store_true', help='render every swatch, even if it is unchanged')
+    parser.add_argument('--atlas', choices=ATLAS_GROUPS, default='kind',
+                        help='one sprite atlas per palette type or one for every palette')
+    args = parser.parse_args()
+    if not set(args.kinds) <= set(SWATCH_KINDS):
+        parser.error(f'kinds must be among {SWATCH_KINDS}')
+
+    build_swatches(tuple(args.kinds) or SWATCH_KINDS, args.assets_dir, max_workers=args.workers, force=args.force,
+                   atlas=args.atlas)
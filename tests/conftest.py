@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+import plotly.io as pio
+import pytest
+
+# The modules of the app are imported from the repository root and read ./data and ./assets
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+# Figures as the JSON Dash sends, so go.Figure objects and dict specs compare equal
+@pytest.fixture(scope='session')
+def figure_json():
+    return lambda figure: json.loads(pio.to_json(figure, validate=False))
+
+@pytest.fixture(scope='session')
+def tips():
+    import plotly.express as px
+    return px.data.tips()
+
+@pytest.fixture(scope='session')
+def stocks():
+    import pandas as pd
+    import plotly.express as px
+    df = px.data.stocks()
+    df['date'] = pd.to_datetime(df['date'])
+    return df
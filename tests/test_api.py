@@ -0,0 +1,160 @@
+import io
+import json
+import zipfile
+import pytest
+
+
+@pytest.fixture(scope='module')
+def client():
+    # Creating the app registers the charts of its pages and the API blueprint
+    import app
+    return app.app.server.test_client()
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def zip_names(response):
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        return archive.namelist()
+
+
+# Caching headers -----------------------------------------------------
+@pytest.mark.parametrize('url', ['/api/palettes', '/api/palettes/metrics', '/api/palettes/sequential/Viridis',
+                                 '/api/palettes/sequential/Viridis/similar?k=3',
+                                 '/api/palettes/qualitative/Bold/assign?n=3',
+                                 '/api/palettes/near-color?color=ff0000',
+                                 '/api/palettes/batch?ids=sequential/Viridis',
+                                 '/api/palettes/export.zip?ids=sequential/Viridis',
+                                 '/api/figure/sequential/scatter-plot?palette=Viridis&template=plotly'])
+def test_responses_can_be_cached_and_revalidated(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    etag, _ = response.get_etag()
+    assert etag
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 3600 and response.cache_control.s_maxage == 86400
+
+    revalidated = client.get(url, headers={'If-None-Match': f'"{etag}"'})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    assert revalidated.get_etag() == (etag, False)
+    assert client.get(url, headers={'If-None-Match': '"other"'}).status_code == 200
+
+def test_etags_change_with_the_request(client):
+    etags = {client.get(url).get_etag()[0]
+             for url in ('/api/palettes/sequential/Viridis', '/api/palettes/sequential/Viridis?n=3',
+                         '/api/palettes/sequential/Viridis?format=rgb', '/api/palettes/sequential/Cividis')}
+    assert len(etags) == 4
+
+
+# Figures -------------------------------------------------------------
+def test_figure(client):
+    response = client.get('/api/figure/sequential/scatter-plot?palette=Viridis&template=plotly')
+    assert response.mimetype == 'application/json'
+    assert response.json['data'] and response.json['layout']
+    simulated = client.get('/api/figure/sequential/scatter-plot?palette=Viridis&template=plotly&cvd=deuteranopia')
+    assert simulated.status_code == 200
+    assert simulated.get_etag() != response.get_etag()
+    assert simulated.json != response.json
+
+@pytest.mark.parametrize('url, status', [
+    ('/api/figure/sequential/no-chart?palette=Viridis&template=plotly', 404),
+    ('/api/figure/no-page/scatter-plot', 404),
+    ('/api/figure/sequential/scatter-plot?palette=NoPalette&template=plotly', 404),
+    ('/api/figure/sequential/scatter-plot?palette=Viridis&template=no_template', 404),
+    ('/api/figure/sequential/scatter-plot?palette=Viridis&template=plotly&cvd=blue', 400)])
+def test_figure_errors(client, url, status):
+    response = client.get(url)
+    assert response.status_code == status
+    assert 'error' in response.json
+
+
+# Palettes ------------------------------------------------------------
+def test_palette_catalog(client):
+    palettes = client.get('/api/palettes').json
+    ids = [palette['id'] for palette in palettes]
+    assert 'sequential/Viridis' in ids and 'qualitative/Bold' in ids
+    assert set(client.get('/api/palettes/metrics').json) == set(ids)
+
+def test_palette(client):
+    response = client.get('/api/palettes/sequential/Viridis?format=rgb&n=3')
+    assert response.json == {'id': 'sequential/Viridis', 'kind': 'sequential', 'name': 'Viridis', 'format': 'rgb',
+                             'colors': [[68, 1, 84], [34, 144, 140], [253, 231, 37]]}
+
+@pytest.mark.parametrize('url, status', [
+    ('/api/palettes/sequential/NoPalette', 404),
+    ('/api/palettes/no-kind/Viridis', 404),
+    ('/api/palettes/sequential/NoPalette/similar', 404),
+    ('/api/palettes/qualitative/NoPalette/assign?n=3', 404),
+    ('/api/palettes/sequential/Viridis?format=cmyk', 400),
+    ('/api/palettes/sequential/Viridis?n=0', 400),
+    ('/api/palettes/sequential/Viridis?n=many', 400),
+    ('/api/palettes/sequential/Viridis/similar?k=0', 400),
+    ('/api/palettes/qualitative/Bold/assign', 400),
+    ('/api/palettes/qualitative/Bold/assign?n=1025', 400),
+    ('/api/palettes/qualitative/Bold/assign?n=3&background=nope', 400),
+    ('/api/palettes/near-color?color=nope', 400),
+    ('/api/palettes/near-color?color=ff0000&kind=nope', 400),
+    ('/api/palettes/near-color?color=ff0000&radius=100', 400)])
+def test_palette_errors(client, url, status):
+    response = client.get(url)
+    assert response.status_code == status
+    assert 'error' in response.json
+
+def test_similar_and_assigned_palettes(client):
+    similar = client.get('/api/palettes/sequential/Viridis_r/similar?k=3').json
+    assert len(similar) == 3 and all(match['id'] != 'sequential/Viridis' for match in similar)
+    assigned = client.get('/api/palettes/qualitative/Bold/assign?n=3&background=white').json
+    assert assigned['n'] == 3 and len(set(assigned['colors'])) == 3
+    assert assigned['background_delta_e'] is not None
+
+
+# Batches -------------------------------------------------------------
+def test_batch_streams_one_line_per_palette(client):
+    response = client.get('/api/palettes/batch?ids=sequential/Viridis,qualitative/Nope&ids=diverging/RdBu&n=4')
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    lines = ndjson(response)
+    assert [line['id'] for line in lines] == ['sequential/Viridis', 'qualitative/Nope', 'diverging/RdBu']
+    # Unknown palettes get an error line and the others still arrive
+    assert lines[1] == {'id': 'qualitative/Nope', 'error': 'Unknown palette'}
+    assert len(lines[0]['colors']) == len(lines[2]['colors']) == 4
+
+def test_batch_by_post(client):
+    ids = ['sequential/Viridis', 'sequential/Nope']
+    response = client.post('/api/palettes/batch', json={'ids': ids, 'format': 'float'})
+    lines = ndjson(response)
+    assert [line['id'] for line in lines] == ids
+    assert lines[0]['format'] == 'float' and 'error' in lines[1]
+
+@pytest.mark.parametrize('args', [{'ids': ''}, {'ids': ','.join(['sequential/Viridis'] * 501)},
+                                  {'ids': 'sequential/Viridis', 'n': '0'}])
+def test_batch_errors(client, args):
+    assert client.get('/api/palettes/batch', query_string=args).status_code == 400
+
+def test_batch_ids_must_be_a_list(client):
+    assert client.post('/api/palettes/batch', json={'ids': 'sequential/Viridis'}).status_code == 400
+
+
+# Exports -------------------------------------------------------------
+def test_export_zip(client):
+    response = client.get('/api/palettes/export.zip?ids=sequential/Viridis,qualitative/Bold&formats=css,gpl&n=16')
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=palettes.zip'
+    assert zip_names(response) == ['css/sequential/Viridis.css', 'gpl/sequential/Viridis.gpl',
+                                   'css/qualitative/Bold.css', 'gpl/qualitative/Bold.gpl', 'manifest.json']
+
+def test_export_zip_of_a_type(client):
+    names = zip_names(client.get('/api/palettes/export.zip?kinds=cyclical&formats=json'))
+    palettes = [palette['id'] for palette in client.get('/api/palettes').json if palette['kind'] == 'cyclical']
+    assert names == [f'json/{palette_id}.json' for palette_id in palettes] + ['manifest.json']
+    # POST takes the same fields, and every format by default
+    names = zip_names(client.post('/api/palettes/export.zip', json={'ids': ['cyclical/IceFire']}))
+    assert names == ['css/cyclical/IceFire.css', 'json/cyclical/IceFire.json',
+                     'mpl_colormaps/cyclical/IceFire.py', 'gpl/cyclical/IceFire.gpl', 'manifest.json']
+
+@pytest.mark.parametrize('url, status', [('/api/palettes/export.zip?ids=sequential/NoPalette', 404),
+                                         ('/api/palettes/export.zip?kinds=nope', 400),
+                                         ('/api/palettes/export.zip?formats=pdf', 400),
+                                         ('/api/palettes/export.zip?kinds=cyclical&n=0', 400)])
+def test_export_zip_errors(client, url, status):
+    assert client.get(url).status_code == status
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+from downsampling import (decimate_points, pool_matrix, window_bounds, heatmap_window, relayout_ranges,
+                          heatmap_lod_updates, lttb_indices, range_bounds, relayout_x_range)
+
+
+# Level of detail for heatmaps ----------------------------------------
+def test_pool_matrix_ignores_missing_values():
+    z = np.array([[np.nan, np.nan, 1, 2],
+                  [np.nan, np.nan, 3, np.nan],
+                  [1, 2, 5, 6],
+                  [3, 4, 7, 8]])
+    mean, row_edges, col_edges = pool_matrix(z, 2, 2)
+    assert row_edges.tolist() == [0, 2, 4] and col_edges.tolist() == [0, 2, 4]
+    # A block with no value stays missing; the others average or take the largest of their values
+    assert np.isnan(mean[0, 0]) and mean[0, 1] == 2 and mean[1, 0] == 2.5 and mean[1, 1] == 6.5
+    maximum, _, _ = pool_matrix(z, 2, 2, method='max')
+    assert np.isnan(maximum[0, 0]) and maximum[0, 1] == 3 and maximum[1, 0] == 4 and maximum[1, 1] == 8
+
+def test_pool_matrix_keeps_smaller_matrices_and_checks_the_method():
+    z = np.arange(6.0).reshape(2, 3)
+    assert (pool_matrix(z, 10, 10)[0] == z).all()
+    with pytest.raises(ValueError):
+        pool_matrix(z, 1, 1, method='median')
+
+@pytest.mark.parametrize('axis_range, bounds', [
+    (None, (0, 10)), ([2.2, 5.7], (2, 7)), ([5.7, 2.2], (2, 7)), ([-20, 50], (0, 10)), ([20, 30], (9, 10)),
+    ([-30, -20], (0, 1))])
+def test_window_bounds(axis_range, bounds):
+    # Cell i covers [i-0.5, i+0.5]; reversed ranges are sorted and the window keeps at least one cell
+    assert window_bounds(axis_range, 10) == bounds
+
+def test_heatmap_window_puts_cells_at_the_centre_of_their_block():
+    df = pd.DataFrame(np.arange(48.0).reshape(6, 8), index=list('abcdef'), columns=list('ABCDEFGH'))
+    trace, xaxis, yaxis = heatmap_window(df, (3, 4))
+    assert trace['x'].tolist() == [0.5, 2.5, 4.5, 6.5] and trace['y'].tolist() == [0.5, 2.5, 4.5]
+    assert trace['z'][0, 0] == np.mean([0, 1, 8, 9])
+
+    # A zoomed window is small enough to be sent cell by cell, at its own positions
+    trace, xaxis, yaxis = heatmap_window(df, (3, 4), x_range=[2, 5.4], y_range=[4, 5])
+    assert trace['x'].tolist() == [2, 3, 4, 5] and trace['y'].tolist() == [4, 5]
+    assert trace['z'].tolist() == [[34, 35, 36, 37], [42, 43, 44, 45]]
+    assert xaxis['ticktext'] == ['C', 'D', 'E', 'F'] and yaxis['ticktext'] == ['e', 'f']
+
+def test_relayout_ranges():
+    window = {'xaxis': [1, 3], 'yaxis': [0, 2]}
+    # An event on one axis keeps the range of the other
+    assert relayout_ranges({'xaxis.range[0]': 4, 'xaxis.range[1]': 6}, window) == (
+        {'xaxis': [4, 6], 'yaxis': [0, 2]}, True)
+    assert relayout_ranges({'yaxis.range': (5, 1)}, window) == ({'xaxis': [1, 3], 'yaxis': [5, 1]}, True)
+    # Autorange resets an axis
+    assert relayout_ranges({'xaxis.autorange': True}, window) == ({'xaxis': None, 'yaxis': [0, 2]}, True)
+    assert relayout_ranges({'xaxis.autorange': True, 'yaxis.autorange': True}, window) == (
+        {'xaxis': None, 'yaxis': None}, True)
+    # Other events change nothing, and the previous window is not modified
+    assert relayout_ranges({'dragmode': 'pan'}, window) == (window, False)
+    assert relayout_ranges({'xaxis.range[0]': 1, 'xaxis.range[1]': 2}, None) == ({'xaxis': [1, 2]}, True)
+    assert window == {'xaxis': [1, 3], 'yaxis': [0, 2]}
+
+def test_heatmap_lod_updates():
+    df = pd.DataFrame(np.arange(48.0).reshape(6, 8))
+    trace, layout = heatmap_lod_updates(df, (3, 4), 'max', 'x: %{x}<br>y: %{y}<br>z: %{z}')
+    assert trace['hovertemplate'] == 'x: %{x:.0f}<br>y: %{y:.0f}<br>z: %{z} (max)'
+    assert trace['z'][0, 0] == 9 and layout['uirevision'] == 'lod'
+    assert set(layout) == {'xaxis', 'yaxis', 'uirevision'}
+
+
+# Line downsampling ---------------------------------------------------
+@pytest.mark.parametrize('n, n_out', [(1_000, 50), (1_001, 3), (10_000, 700), (100, 99)])
+def test_lttb_keeps_the_ends_and_the_order(n, n_out):
+    x = np.arange(n)
+    y = np.random.default_rng(0).normal(size=n).cumsum()
+    selected = lttb_indices(x, y, n_out)
+    assert len(selected) == n_out
+    assert selected[0] == 0 and selected[-1] == n - 1
+    assert (np.diff(selected) > 0).all()
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1_000)
+    y[437] = 100
+    assert 437 in lttb_indices(np.arange(1_000), y, 50)
+
+def test_lttb_keeps_short_series_and_dates():
+    assert lttb_indices(np.arange(10), np.arange(10), 20).tolist() == list(range(10))
+    assert lttb_indices(np.arange(10), np.arange(10), 2).tolist() == list(range(10))
+    dates = pd.date_range('2020-01-01', periods=500, freq='h').values
+    selected = lttb_indices(dates, np.sin(np.arange(500) / 20), 40)
+    assert len(selected) == 40 and selected[-1] == 499
+
+def test_range_bounds_on_dates_pads_one_row_on_each_side():
+    dates = pd.date_range('2020-01-01', periods=10, freq='D').values
+    assert range_bounds(dates, None) == (0, 10)
+    assert range_bounds(dates, ['2020-01-03', '2020-01-05']) == (1, 6)
+    # Ranges between rows and reversed ranges keep the rows around them
+    assert range_bounds(dates, ['2020-01-05 12:00', '2020-01-03 12:00']) == (2, 6)
+    # At the edges there is no row to pad with
+    assert range_bounds(dates, ['2019-12-01', '2020-01-02']) == (0, 3)
+    assert range_bounds(dates, ['2020-01-09', '2020-03-01']) == (7, 10)
+
+def test_relayout_x_range():
+    assert relayout_x_range({'xaxis.range[0]': '2020-01-03', 'xaxis.range[1]': '2020-01-05'}) == (
+        True, ['2020-01-03', '2020-01-05'])
+    assert relayout_x_range({'xaxis.range': ('a', 'b')}) == (True, ['a', 'b'])
+    assert relayout_x_range({'xaxis.autorange': True}) == (True, None)
+    assert relayout_x_range({'yaxis.range[0]': 1, 'yaxis.range[1]': 2}) == (False, None)
+
+
+# Scatter decimation --------------------------------------------------
+
+
+@pytest.mark.parametrize('n, budget', [(100_000, 50_000), (5_000, 997), (1_000, 10), (1_000, 2), (1_000, 1)])
+def test_decimate_points_keeps_the_budget_and_color_extremes(n, budget):
+    rng = np.random.default_rng(0)
+    x, y, color = rng.normal(size=n), rng.normal(size=n), rng.normal(size=n)
+    kept = decimate_points(x, y, budget, color)
+    assert len(kept) <= budget and len(np.unique(kept)) == len(kept)
+    assert color.argmin() in kept and (budget < 2 or color.argmax() in kept)
+    assert len(decimate_points(x, y, budget)) <= budget
+
+def test_decimate_points_with_missing_colors():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(size=1_000), rng.normal(size=1_000)
+    kept = decimate_points(x, y, 100, np.full(1_000, np.nan))
+    assert 0 in kept and len(kept) <= 100
@@ -0,0 +1,91 @@
+import json
+import os
+import numpy as np
+import pytest
+import external_palettes
+from external_palettes import load_external_palettes, parse_file, color_hash, normalize_colors
+
+
+KINDS = ('sequential', 'diverging', 'cyclical', 'qualitative')
+
+@pytest.fixture
+def palette_dir(tmp_path):
+    folder = tmp_path / 'palettes'
+    (folder / 'cat' / 'diverging').mkdir(parents=True)
+    (folder / 'cat' / 'a.json').write_text(json.dumps({'palettes': [
+        {'name': 'Fire', 'colors': ['#000000', '#ff0000', '#ffff00'], 'tags': ['warm']},
+        {'name': 'Bad', 'colors': ['not a color', '#ffffff']}]}))
+    (folder / 'cat' / 'diverging' / 'b.csv').write_text(
+        'name,color\nBlue Red,#0000ff\nBlue Red,#ffffff\nBlue Red,#ff0000\n')
+    (folder / 'mine.gpl').write_text('GIMP Palette\nName: Mine\n#\n255 0 0 red\n0 255 0 green\n')
+    np.save(folder / 'cm.npy', np.array([[0, 0, 0, 1], [1, 1, 1, 1.]]))
+    return str(folder)
+
+
+# Parsing -------------------------------------------------------------
+@pytest.mark.parametrize('colors, expected', [(['#ff0000', 'rgb(0, 0, 255)'], [[255, 0, 0], [0, 0, 255]]),
+                                              ([[255, 0, 0], [0, 0, 255]], [[255, 0, 0], [0, 0, 255]]),
+                                              ([[1, 0, 0, 1], [0, 0, 0.5, 1]], [[255, 0, 0], [0, 0, 127.5]])])
+def test_normalize_colors(colors, expected):
+    np.testing.assert_array_equal(normalize_colors(colors), expected)
+
+def test_every_format_is_parsed(palette_dir, tmp_path):
+    palettes = load_external_palettes(palette_dir, str(tmp_path / 'index.npz'), KINDS)
+    summary = {(palette['kind'], palette['name'], palette['source'], palette['file']): palette['rgb'].tolist()
+               for palette in palettes}
+    assert summary == {
+        ('sequential', 'Fire', 'cat', 'cat/a.json'): [[0, 0, 0], [255, 0, 0], [255, 255, 0]],
+        # The folder of a file sets its type; names are cleaned for file names and URLs
+        ('diverging', 'Blue_Red', 'cat', 'cat/diverging/b.csv'): [[0, 0, 255], [255, 255, 255], [255, 0, 0]],
+        ('sequential', 'cm', 'cm', 'cm.npy'): [[0, 0, 0], [255, 255, 255]],
+        ('qualitative', 'Mine', 'mine', 'mine.gpl'): [[255, 0, 0], [0, 255, 0]]}
+    assert palettes[0]['tags'] == ['warm']
+
+def test_malformed_palettes_and_files_are_skipped(palette_dir, caplog):
+    with open(os.path.join(palette_dir, 'broken.json'), 'w') as f:
+        f.write('{"palettes": [')
+    names = [palette['name'] for palette in parse_file(os.path.join(palette_dir, 'cat', 'a.json'), palette_dir, KINDS)]
+    assert names == ['Fire']
+    assert parse_file(os.path.join(palette_dir, 'broken.json'), palette_dir, KINDS) == []
+    assert 'Bad' in caplog.text and 'broken.json' in caplog.text
+
+def test_palettes_of_other_types_are_left_out(palette_dir, tmp_path):
+    palettes = load_external_palettes(palette_dir, str(tmp_path / 'index.npz'), ('qualitative',))
+    assert [palette['name'] for palette in palettes] == ['Mine']
+
+
+# Duplicates and names ------------------------------------------------
+def test_duplicates_and_taken_names(palette_dir, tmp_path):
+    fire = np.array([[0, 0, 0], [255, 0, 0], [255, 255, 0]], dtype=float)
+    palettes = load_external_palettes(palette_dir, str(tmp_path / 'index.npz'), KINDS,
+                                      exclude_hashes={color_hash(fire)},
+                                      taken_names={('qualitative', 'Mine'), ('qualitative', 'mine.Mine')})
+    names = {palette['name'] for palette in palettes}
+    assert 'Fire' not in names
+    assert 'mine.Mine.2' in names
+
+
+# Binary index --------------------------------------------------------
+def test_unchanged_files_are_read_from_the_index(palette_dir, tmp_path, monkeypatch):
+    index_file = str(tmp_path / 'cache' / 'index.npz')
+    first = load_external_palettes(palette_dir, index_file, KINDS)
+    assert os.path.exists(index_file)
+
+    parsed = []
+    for extension, parser in external_palettes.PARSERS.items():
+        monkeypatch.setitem(external_palettes.PARSERS, extension,
+                            lambda path, parser=parser: parsed.append(os.path.basename(path)) or parser(path))
+    second = load_external_palettes(palette_dir, index_file, KINDS)
+    assert parsed == []
+    assert [{**palette, 'rgb': palette['rgb'].tolist()} for palette in second] == \
+           [{**palette, 'rgb': palette['rgb'].tolist()} for palette in first]
+
+    # Only the changed file is parsed again
+    with open(os.path.join(palette_dir, 'mine.gpl'), 'a') as f:
+        f.write('0 0 255 blue\n')
+    third = load_external_palettes(palette_dir, index_file, KINDS)
+    assert parsed == ['mine.gpl']
+    assert len(third[-1]['rgb']) == 3
+
+def test_missing_folder(tmp_path):
+    assert load_external_palettes(str(tmp_path / 'missing'), str(tmp_path / 'index.npz'), KINDS) == []
@@ -0,0 +1,47 @@
+import sqlite3
+import figure_cache as fc
+
+
+def test_only_one_process_claims_the_warm_up(tmp_path, monkeypatch):
+    assert fc.claim_warm_up(str(tmp_path))
+    assert not fc.claim_warm_up(str(tmp_path))
+    fc.release_warm_up(str(tmp_path))
+    assert fc.claim_warm_up(str(tmp_path))
+
+    # A claim that was never released is taken over after the timeout
+    monkeypatch.setattr(fc, 'WARM_UP_TIMEOUT', 0)
+    assert fc.claim_warm_up(str(tmp_path))
+
+def test_reads_write_counts_in_batches(tmp_path):
+    cache_dir = str(tmp_path)
+    fc.write_figure('key', 'page', 'chart', '{"data": []}', cache_dir)
+    written = fc._connect(cache_dir).execute('SELECT accessed FROM figures').fetchone()[0]
+    for _ in range(5):
+        assert fc.read_figure('key', cache_dir) == '{"data": []}'
+        fc._count('disk_hits', cache_dir=cache_dir)
+
+    # Nothing is written before the flush, and the fresh access time is kept
+    other = sqlite3.connect(tmp_path / fc.CACHE_FILE)
+    assert other.execute('SELECT hits, accessed FROM figures').fetchone() == (0, written)
+    assert other.execute('SELECT * FROM counters').fetchall() == []
+    fc.flush_counts(force=True)
+    assert other.execute('SELECT hits FROM figures').fetchone() == (5,)
+    assert other.execute('SELECT * FROM counters').fetchall() == [('disk_hits', 5)]
+
+def test_figure_key_follows_the_builder_code(monkeypatch):
+    monkeypatch.setattr(fc, 'chart_registry', {})
+    build = lambda palette, template: {'data': []}
+    fc.register_chart('page', 'chart', build, ['Viridis'])
+    key = fc.figure_key('page', 'chart', 'Viridis', 'plotly')
+    build = lambda palette, template: {'data': [], 'layout': {}}
+    fc.register_chart('page', 'chart', build, ['Viridis'])
+    assert fc.figure_key('page', 'chart', 'Viridis', 'plotly') != key
+
+def test_figure_key_follows_the_chart_modules(monkeypatch):
+    monkeypatch.setattr(fc, 'chart_registry', {})
+    build = lambda palette, template: {'data': []}
+    fc.register_chart('page', 'chart', build, ['Viridis'])
+    key = fc.figure_key('page', 'chart', 'Viridis', 'plotly')
+    monkeypatch.setattr(fc, 'chart_modules_fingerprint', lambda: 'changed chart_functions.py')
+    fc.register_chart('page', 'chart', build, ['Viridis'])
+    assert fc.figure_key('page', 'chart', 'Viridis', 'plotly') != key
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import plotly.colors as pc
+import plotly.graph_objs as go
+import pytest
+import chart_functions as cf
+import figure_specs as fs
+from chart_functions import templates_dict
+
+# The specs are checked once here against the go.Figure builders they replace, so they need no validation at runtime
+
+PALETTES = [pc.sequential.Viridis, pc.diverging.RdBu, pc.qualitative.Bold, pc.cyclical.IceFire]
+TEMPLATES = list(templates_dict)
+
+
+def assert_same_figure(spec, fig, figure_json):
+    assert figure_json(spec) == figure_json(fig)
+    # The plotly schema accepts every property of the spec
+    go.Figure(spec)
+
+
+@pytest.fixture(scope='module')
+def cpi():
+    df = pd.read_csv('./data/Consumer Price Index for All Urban Consumers (CPI-U) Gasoline 2013-2023.csv',
+                     low_memory=False, index_col=0)
+    df.index = df.index.astype(str)
+    return df
+
+@pytest.fixture(scope='module')
+def seattle():
+    df = pd.read_csv('./data/seattle_weather_2014-2023.csv')
+    return df[df['year'] == 2023].pivot_table(values='tmax', index='n_month', columns='day')
+
+@pytest.fixture(scope='module')
+def contour_grid():
+    pivot = pd.read_csv('./data/seattle_weather_2014-2023.csv').pivot_table(values='tmax', index='day', columns='n_month')
+    pivot = pivot.fillna(pivot.mean())
+    return pivot.columns, pivot.index, pivot.values
+
+
+@pytest.mark.parametrize('template', TEMPLATES)
+@pytest.mark.parametrize('colors', PALETTES)
+def test_colorscale_bar(colors, template, figure_json):
+    args = ('Name', colors, len(colors), templates_dict[template], template)
+    assert_same_figure(fs.colorscale_bar_spec(*args), cf.create_colorscale_bar(*args), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+@pytest.mark.parametrize('colors', PALETTES)
+def test_colorscale_bar_v(colors, template, figure_json):
+    args = ('Name', colors, len(colors), templates_dict[template], template)
+    assert_same_figure(fs.colorscale_bar_v_spec(*args), cf.create_colorscale_bar_v(*args), figure_json)
+
+@pytest.mark.parametrize('kind', ['colorway', 'colorscale'])
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_colorscale_bar_for_template(template, kind, figure_json):
+    assert_same_figure(fs.colorscale_bar_for_template_spec(template, kind),
+                       cf.create_colorscale_bar_for_template(template, kind), figure_json)
+
+@pytest.mark.parametrize('width_px', [None, 100])
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_area_chart_with_gradient(stocks, template, width_px, figure_json):
+    args = (stocks, 'date', 'AAPL', pc.sequential.Plasma, templates_dict[template], template, width_px)
+    assert_same_figure(fs.area_chart_with_gradient_spec(*args), cf.create_area_chart_with_gradient(*args), figure_json)
+
+@pytest.mark.parametrize('options', [{}, {'max_shape': (5, 6)}, {'max_shape': (5, 6), 'pooling': 'max'},
+                                     {'max_shape': (8, 8), 'x_range': (2, 9), 'y_range': (1, 7)}, {'raster': True}])
+@pytest.mark.parametrize('template', ['plotly', 'plotly_dark'])
+def test_heatmap(cpi, template, options, figure_json):
+    args = (cpi, pc.diverging.RdBu, templates_dict[template], template)
+    assert_same_figure(fs.heatmap_spec(*args, **options), cf.create_heatmap(*args, **options), figure_json)
+
+@pytest.mark.parametrize('max_shape', [None, (6, 10)])
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_heatmap_temp(seattle, template, max_shape, figure_json):
+    assert_same_figure(fs.heatmap_temp_spec(seattle, template, max_shape),
+                       cf.create_heatmap_temp(seattle, template, max_shape), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+@pytest.mark.parametrize('colors', PALETTES)
+def test_pie_chart(tips, colors, template, figure_json):
+    args = (tips, 'tip', 'day', colors, templates_dict[template], template)
+    assert_same_figure(fs.pie_chart_spec(*args), cf.create_pie_chart(*args), figure_json)
+
+def test_polar_subplots(figure_json):
+    names = [trace.name for trace in pc.cyclical.swatches_cyclical().data]
+    assert_same_figure(fs.polar_subplots_spec(names), cf.create_polar_subplots(names), figure_json)
+
+@pytest.mark.parametrize('options', [{}, {'size': 4, 'reversescale': True}, {'transpose': True, 'coloring': 'lines'},
+                                     {'raster': True, 'max_shape': (60, 90)}])
+@pytest.mark.parametrize('colorscale', ['jet', 'viridis_r', pc.sequential.Plasma])
+def test_contour_plot(contour_grid, colorscale, options, figure_json):
+    x, y, z = contour_grid
+    assert_same_figure(fs.contour_plot_spec(x, y, z, colorscale, **options),
+                       cf.create_contour_plot(x, y, z, colorscale, **options), figure_json)
@@ -0,0 +1,55 @@
+import numpy as np
+import plotly.colors as pc
+import pytest
+from raster import colors_to_rgb
+from palette_catalog import format_colors
+from palette_metrics import rgb_to_lab
+from palette_assignment import assign_colors, MAX_CATEGORIES
+
+
+BOLD = tuple(pc.qualitative.Bold)
+
+def min_delta_e(colors):
+    lab = rgb_to_lab(colors_to_rgb(list(colors)))
+    distances = np.linalg.norm(lab[:, None] - lab[None], axis=-1)
+    return distances[np.triu_indices(len(colors), 1)].min()
+
+
+# Colors for n categories ---------------------------------------------
+@pytest.mark.parametrize('n', [2, 5, len(BOLD)])
+def test_colors_of_the_palette(n):
+    colors, delta_e, background_delta_e = assign_colors(BOLD, n)
+    assert len(colors) == len(set(colors)) == n
+    assert set(colors) <= set(format_colors(colors_to_rgb(list(BOLD))))
+    assert delta_e == pytest.approx(min_delta_e(colors), abs=1e-3)
+    assert background_delta_e is None
+
+@pytest.mark.parametrize('n', [len(BOLD) + 1, 30, 100])
+def test_more_categories_than_colors(n):
+    # The palette comes first, then variants of its colors at other lightness levels
+    colors, delta_e, _ = assign_colors(BOLD, n)
+    assert len(colors) == len(set(colors)) == n
+    assert set(colors[:len(BOLD)]) == set(format_colors(colors_to_rgb(list(BOLD))))
+    assert delta_e == pytest.approx(min_delta_e(colors), abs=1e-3)
+
+def test_the_first_colors_are_the_farthest_apart():
+    colors, _, _ = assign_colors(BOLD, len(BOLD))
+    assert min_delta_e(colors[:3]) >= min_delta_e(colors)
+    # One color has nothing to be far from, so it is the first color of the palette
+    assert assign_colors(BOLD, 1) == ((format_colors(colors_to_rgb([BOLD[0]]))[0],), None, None)
+
+def test_colors_near_the_background_come_last():
+    colors, _, background_delta_e = assign_colors(('#fdfdfd', '#ff0000', '#0000ff'), 2, 'white')
+    assert set(colors) == {'#ff0000', '#0000ff'}
+    assert background_delta_e > 15
+    colors, _, _ = assign_colors(('#fdfdfd', '#ff0000', '#0000ff'), 3, 'white')
+    assert colors[-1] == '#fdfdfd'
+
+def test_a_color_given_twice_is_one_color():
+    colors, _, _ = assign_colors(('#ff0000', 'rgb(255, 0, 0)', '#0000ff'), 2)
+    assert set(colors) == {'#ff0000', '#0000ff'}
+
+@pytest.mark.parametrize('n', [0, -1, MAX_CATEGORIES + 1])
+def test_number_of_categories_out_of_range(n):
+    with pytest.raises(ValueError):
+        assign_colors(BOLD, n)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from raster import colors_to_rgb
+from palette_metrics import rgb_to_oklab, rgb_to_lab
+from palette_builder import interpolate_palette, build_palette, validate_palette, BUILDER_SPACES
+
+
+# Interpolation -------------------------------------------------------
+@pytest.mark.parametrize('space', BUILDER_SPACES)
+def test_interpolation_passes_through_the_anchors(space):
+    anchors = ('#440154', '#21918c', '#fde725')
+    colors = interpolate_palette(anchors, 9, space)
+    assert len(colors) == 9
+    assert colors[::4] == anchors
+
+def test_interpolation_is_linear_in_oklab():
+    colors = interpolate_palette(('#000000', '#ffffff'), 5)
+    lightness = rgb_to_oklab(colors_to_rgb(list(colors)))[:, 0]
+    np.testing.assert_allclose(np.diff(lightness), 0.25, atol=0.005)
+    lab_lightness = rgb_to_lab(colors_to_rgb(list(interpolate_palette(('#000000', '#ffffff'), 5, 'lab'))))[:, 0]
+    np.testing.assert_allclose(np.diff(lab_lightness), 25, atol=0.5)
+
+def test_interpolation_stays_in_the_gamut():
+    colors = interpolate_palette(('#0000ff', '#ffff00'), 32)
+    assert all(len(color) == 7 and color.startswith('#') for color in colors)
+
+
+# Validation ----------------------------------------------------------
+def test_build_palette_returns_colors_and_metrics():
+    colors, metrics = build_palette(('#000000', '#ffffff'), 5)
+    assert colors == interpolate_palette(('#000000', '#ffffff'), 5)
+    assert metrics['lightness_monotonicity'] == 1
+    assert validate_palette('sequential', metrics) == []
+
+def test_lightness_going_up_and_down_is_rejected():
+    _, metrics = build_palette(('#000000', '#ffffff', '#000000'), 5)
+    warnings = validate_palette('sequential', metrics)
+    assert any('lightness' in warning for warning in warnings)
+    # A qualitative palette has no order, so its lightness may go up and down
+    assert not any('lightness' in warning for warning in validate_palette('qualitative', metrics))
+
+def test_close_colors_are_rejected_in_qualitative_palettes():
+    _, metrics = build_palette(('#ff0000', '#fe0101', '#0000ff'), 3)
+    assert 'Some colors are close to each other.' in validate_palette('qualitative', metrics)
+    assert 'Some colors are close to each other.' not in validate_palette('sequential', metrics)
+
+def test_red_to_green_is_rejected_for_color_blindness():
+    _, metrics = build_palette(('#ff0000', '#00c000'), 5)
+    assert validate_palette('sequential', metrics) == ['Some colors are hard to tell apart with color blindness.']
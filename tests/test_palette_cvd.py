@@ -0,0 +1,43 @@
+import base64
+import json
+import numpy as np
+import pandas as pd
+import plotly.colors as pc
+from figure_specs import heatmap_spec
+from palette_cvd import simulate_figure, cvd_updates, simulate_colors
+from palette_metrics import simulate_cvd
+from raster import decode_png, PNG_DATA_PREFIX
+
+
+def image_pixels(figure):
+    [source] = [trace['source'] for trace in figure['data'] if trace['type'] == 'image']
+    return decode_png(base64.b64decode(source[len(PNG_DATA_PREFIX):]))
+
+def raster_figure():
+    z = np.linspace(-10, 10, 40 * 50).reshape(40, 50)
+    z[:5, :5] = np.nan
+    figure = heatmap_spec(pd.DataFrame(z), pc.diverging.RdBu, 'white', 'plotly', max_shape=(20, 25), raster=True)
+    return json.loads(json.dumps(figure, default=lambda value: value.tolist()))
+
+def test_raster_image_is_simulated_with_its_colorbar():
+    figure = raster_figure()
+    original = image_pixels(figure)
+    simulated = simulate_figure(raster_figure(), 'deuteranopia')
+    pixels = image_pixels(simulated)
+
+    # Every pixel is drawn with the simulated lookup table and missing cells stay transparent
+    expected = np.round(simulate_cvd(original[..., :3].reshape(-1, 3).astype(float), 'deuteranopia'))
+    assert (pixels[..., :3].reshape(-1, 3) == expected).all()
+    assert (pixels[..., 3] == original[..., 3]).all() and (original[..., 3] == 0).any()
+
+    # The colorbar above the image is simulated the same way
+    [scale] = [trace for trace in simulated['data'] if trace['type'] == 'scatter']
+    [original_scale] = [trace for trace in figure['data'] if trace['type'] == 'scatter']
+    colors = [color for _, color in original_scale['marker']['colorscale']]
+    assert [color for _, color in scale['marker']['colorscale']] == simulate_colors(colors, 'deuteranopia')
+
+def test_normal_vision_gives_the_raster_image_back():
+    figure = raster_figure()
+    updates = dict(cvd_updates(figure, 'none'))
+    [path] = [path for path in updates if path[-1] == 'source']
+    assert updates[path] == figure['data'][path[1]]['source']
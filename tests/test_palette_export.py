@@ -0,0 +1,57 @@
+import io
+import json
+import zipfile
+import pytest
+from palette_export import export_files, stream_zip, palette_css, palette_gpl, EXPORT_FORMATS, EXPORT_VERSION
+from palette_catalog import get_palette_catalog, format_colors
+
+
+def archive(chunks):
+    return zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+
+# Files of the export -------------------------------------------------
+def test_export_files():
+    files = dict(export_files(['sequential/Viridis', 'qualitative/Bold'], ('css', 'json'), n=4))
+    assert list(files) == ['css/sequential/Viridis.css', 'json/sequential/Viridis.json',
+                           'css/qualitative/Bold.css', 'json/qualitative/Bold.json', 'manifest.json']
+    assert json.loads(files['manifest.json']) == {'version': EXPORT_VERSION, 'n': 4, 'formats': ['css', 'json'],
+                                                  'palettes': ['sequential/Viridis', 'qualitative/Bold']}
+    viridis = json.loads(files['json/sequential/Viridis.json'])
+    assert viridis['hex'] == ['#440154', '#31688e', '#35b779', '#fde725']
+    assert len(viridis['rgb']) == len(viridis['float']) == 4
+
+def test_css_gradients_only_for_continuous_palettes():
+    catalog = get_palette_catalog()
+    viridis = palette_css(catalog['sequential/Viridis'], ['#000000', '#ffffff'])
+    assert '--sequential-viridis-0: #000000;' in viridis
+    assert 'linear-gradient(to right, #000000 0%, #ffffff 100%)' in viridis
+    assert 'gradient' not in palette_css(catalog['qualitative/Bold'], ['#000000', '#ffffff'])
+
+def test_gimp_palette():
+    entry = get_palette_catalog()['qualitative/Bold']
+    lines = palette_gpl(entry, entry['rgb']).splitlines()
+    assert lines[:2] == ['GIMP Palette', 'Name: Bold']
+    assert lines[4] == f"127  60 141\t{format_colors(entry['rgb'][:1])[0]}"
+    assert len(lines) == 4 + len(entry['rgb'])
+
+
+# ZIP archive ---------------------------------------------------------
+def test_stream_zip_writes_every_file():
+    files = list(export_files(['cyclical/IceFire'], tuple(EXPORT_FORMATS)))
+    with archive(stream_zip(files)) as zipped:
+        assert zipped.testzip() is None
+        assert zipped.namelist() == [name for name, _ in files]
+        assert all(zipped.read(name).decode() == content for name, content in files)
+        assert {info.date_time for info in zipped.infolist()} == {(1980, 1, 1, 0, 0, 0)}
+
+def test_stream_zip_is_streamed_and_reproducible():
+    files = list(export_files(['sequential/Viridis', 'diverging/RdBu'], ('css', 'mpl')))
+    chunks = list(stream_zip(files))
+    # One chunk per file, then the central directory
+    assert len(chunks) == len(files) + 1
+    assert b''.join(chunks) == b''.join(stream_zip(files))
+
+def test_export_of_an_unknown_palette():
+    with pytest.raises(KeyError):
+        list(export_files(['sequential/NoPalette']))
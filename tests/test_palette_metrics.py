@@ -0,0 +1,64 @@
+import numpy as np
+import plotly.colors as pc
+import pytest
+from raster import colors_to_rgb
+from palette_metrics import (compute_metrics, score_palettes, sort_palettes, rgb_to_lab, lab_to_rgb, rgb_to_oklab,
+                             oklab_to_rgb, CVD_SCORED)
+
+
+BLACK_WHITE = np.array([[0, 0, 0], [255, 255, 255]], dtype=float)
+
+
+# Color spaces --------------------------------------------------------
+@pytest.mark.parametrize('to_space, to_rgb', [(rgb_to_lab, lab_to_rgb), (rgb_to_oklab, oklab_to_rgb)])
+def test_color_spaces_round_trip(to_space, to_rgb):
+    rgb = np.random.default_rng(0).integers(0, 256, size=(100, 3)).astype(float)
+    np.testing.assert_allclose(to_rgb(to_space(rgb)), rgb, atol=1e-6)
+
+def test_lab_of_black_and_white():
+    np.testing.assert_allclose(rgb_to_lab(BLACK_WHITE), [[0, 0, 0], [100, 0, 0]], atol=1e-4)
+
+
+# Metrics of known palettes -------------------------------------------
+@pytest.mark.parametrize('space', ['lab', 'oklab'])
+def test_metrics_of_black_and_white(space):
+    [metrics] = compute_metrics([BLACK_WHITE], space)
+    assert metrics['lightness_monotonicity'] == 1
+    assert metrics['lightness_range'] == pytest.approx(100, abs=1e-3)
+    assert metrics['min_delta_e'] == metrics['step_delta_e'] == pytest.approx(100, abs=1e-3)
+    assert metrics['step_delta_e_cv'] == 0
+
+def test_metrics_of_plotly_palettes():
+    greys, jet, rdbu = compute_metrics([colors_to_rgb(pc.sequential.Greys), colors_to_rgb(pc.sequential.Jet),
+                                        colors_to_rgb(pc.diverging.RdBu)])
+    assert greys['lightness_monotonicity'] == 1 and greys['lightness_range'] == pytest.approx(100, abs=1e-3)
+    # Jet goes up and down in lightness; a diverging palette is lightest in the middle
+    assert jet['lightness_monotonicity'] < 1
+    assert rdbu['lightness_monotonicity'] == 0.5
+    assert rdbu['symmetry'] < greys['symmetry']
+
+def test_metrics_of_many_palettes_match_one_at_a_time():
+    palettes = [colors_to_rgb(colors) for colors in (pc.sequential.Viridis, pc.qualitative.Bold, pc.diverging.RdBu,
+                                                     pc.qualitative.Set1, pc.sequential.Greys, pc.cyclical.IceFire)]
+    assert compute_metrics(palettes) == [compute_metrics([rgb])[0] for rgb in palettes]
+
+
+# Color vision deficiencies -------------------------------------------
+def test_greys_look_the_same_with_color_blindness():
+    [metrics] = score_palettes([colors_to_rgb(pc.sequential.Greys)])
+    for deficiency in CVD_SCORED:
+        assert metrics[f'min_delta_e_{deficiency}'] == pytest.approx(metrics['min_delta_e'], abs=1e-3)
+
+def test_red_and_green_are_close_with_deuteranopia():
+    [metrics] = score_palettes([colors_to_rgb(['#ff0000', '#00ff00'])])
+    assert metrics['min_delta_e_deuteranopia'] < metrics['min_delta_e'] / 4
+    assert metrics['cvd_min_delta_e'] == min(metrics[f'min_delta_e_{deficiency}'] for deficiency in CVD_SCORED)
+
+
+# Sorting -------------------------------------------------------------
+def test_sort_palettes_best_first():
+    ids = ['sequential/Jet', 'sequential/Greys']
+    assert sort_palettes(ids, 'lightness_monotonicity') == ['sequential/Greys', 'sequential/Jet']
+    # Lower is better for the variation of the steps
+    ordered = sort_palettes(['sequential/Jet', 'sequential/Viridis'], 'step_delta_e_cv')
+    assert ordered == ['sequential/Viridis', 'sequential/Jet']
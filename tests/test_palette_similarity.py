@@ -0,0 +1,84 @@
+import numpy as np
+import plotly.colors as pc
+import pytest
+import palette_similarity
+from palette_similarity import (similar_palettes, palettes_near_color, parse_color, similarity_index, _NearestIndex,
+                                SIMILAR_LIMIT)
+
+
+# Nearest neighbours --------------------------------------------------
+def brute_force(points, xs, k):
+    distances = np.linalg.norm(xs[:, None] - points[None], axis=-1)
+    indices = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(distances, indices, axis=1), indices
+
+@pytest.mark.parametrize('use_tree', [False, True])
+def test_nearest_index_matches_brute_force(use_tree, monkeypatch):
+    if use_tree:
+        pytest.importorskip('scipy')
+    else:
+        monkeypatch.setattr(palette_similarity, 'cKDTree', None)
+    rng = np.random.default_rng(0)
+    points, xs = rng.normal(size=(500, 48)), rng.normal(size=(7, 48))
+    index = _NearestIndex(points)
+    assert (index.tree is not None) == use_tree
+
+    distances, indices = index.query(xs, 5)
+    expected_distances, expected_indices = brute_force(points, xs, 5)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances, atol=1e-6)
+
+    radius = np.sort(expected_distances[0])[2] + 1e-9
+    distances, indices = index.within(xs[0], radius)
+    np.testing.assert_array_equal(np.sort(indices), np.sort(expected_indices[0, :3]))
+    np.testing.assert_allclose(distances, np.linalg.norm(points[indices] - xs[0], axis=1))
+
+def test_every_palette_is_its_own_nearest_palette():
+    ids, features, _, _, _ = similarity_index()
+    distances, indices = features.query(features.points, 1)
+    np.testing.assert_array_equal(indices[:, 0], np.arange(len(ids)))
+    # The scan expands the squared distance, which loses a few digits near zero
+    np.testing.assert_allclose(distances[:, 0], 0, atol=1e-4)
+
+
+# Similar palettes ----------------------------------------------------
+def test_similar_palettes_leave_out_the_palette_itself():
+    similar = similar_palettes('sequential/Viridis')
+    assert len(similar) == SIMILAR_LIMIT
+    assert 'sequential/Viridis' not in [match['id'] for match in similar]
+    distances = [match['distance'] for match in similar]
+    assert distances == sorted(distances) and distances[0] > 0
+
+def test_similar_palettes_of_a_reversed_palette_are_reversed():
+    similar = similar_palettes('sequential/Viridis', 5)
+    reversed_ = similar_palettes('sequential/Viridis_r', 5)
+    assert [(match['id'], match['distance']) for match in reversed_] == \
+           [(match['id'], match['distance']) for match in similar]
+    assert [match['reversed'] for match in reversed_] == [not match['reversed'] for match in similar]
+
+def test_similar_palettes_of_an_unknown_palette():
+    with pytest.raises(KeyError):
+        similar_palettes('sequential/NotAPalette')
+
+
+# Palettes near a color -----------------------------------------------
+@pytest.mark.parametrize('color, expected', [('#ff0000', [255, 0, 0]), ('00FF00', [0, 255, 0]),
+                                             ('rgb(1, 2, 3)', [1, 2, 3]), (' White ', [255, 255, 255])])
+def test_parse_color(color, expected):
+    np.testing.assert_array_equal(parse_color(color), [expected])
+
+@pytest.mark.parametrize('color', ['#ff00', 'rgb(256, 0, 0)', 'red'])
+def test_parse_color_rejects_other_colors(color):
+    with pytest.raises(ValueError):
+        parse_color(color)
+
+def test_palettes_near_a_color_of_a_palette():
+    matches, count = palettes_near_color(pc.qualitative.Bold[1])
+    assert matches[0] == {'id': 'qualitative/Bold', 'color': '#11a579', 'index': 1, 'distance': 0.0}
+    assert count == len(matches)
+    distances = [match['distance'] for match in matches]
+    assert distances == sorted(distances) and max(distances) <= palette_similarity.NEAR_COLOR_RADIUS
+    # One match per palette, and only palettes of the type asked for
+    assert len({match['id'] for match in matches}) == len(matches)
+    qualitative, _ = palettes_near_color(pc.qualitative.Bold[1], kind='qualitative')
+    assert qualitative == [match for match in matches if match['id'].startswith('qualitative/')]
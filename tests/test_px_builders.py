@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import plotly.colors as pc
+import plotly.express as px
+import pytest
+import chart_functions as cf
+from chart_functions import templates_dict
+from benchmarks.px_reference import (px_scatter_plot, px_treemap, px_map, px_map_with_avg_values, px_pie_chart,
+                                     px_scatter_plot_with_colorbar, px_bar_polar_wind, px_scatter_temp)
+
+# The graph_objects builders of chart_functions replace plotly express calls; the px versions they replaced
+# are kept as references in benchmarks/px_reference.py, and the figures must match them. The maps also load
+# the bundled geometry instead of plotly's scope, so their geometry keys are left out of the comparison; the
+# weighted means of the treemap's parent nodes are summed in another order, so numbers are compared to 12 digits
+
+TEMPLATES = ['plotly', 'plotly_dark', 'ggplot2']
+GEOMETRY_KEYS = {'geojson', 'featureidkey', 'locationmode', 'scope', 'fitbounds'}
+
+
+def comparable(node):
+    if isinstance(node, dict):
+        return {key: comparable(value) for key, value in node.items() if key not in GEOMETRY_KEYS}
+    if isinstance(node, list):
+        return [comparable(value) for value in node]
+    if isinstance(node, float):
+        return float(f'{node:.12g}')
+    return node
+
+def assert_same_figure(fig, reference, figure_json):
+    fig, reference = figure_json(fig), figure_json(reference)
+    # Trace data and hovertemplates first, so a failure points at the trace
+    assert len(fig['data']) == len(reference['data'])
+    for trace, reference_trace in zip(fig['data'], reference['data']):
+        assert comparable(trace) == comparable(reference_trace)
+    assert comparable(fig['layout']) == comparable(reference['layout'])
+
+
+# Datasets of the pages -----------------------------------------------
+@pytest.fixture(scope='module')
+def sorted_tips(tips):
+    df = tips.copy()
+    df['day'] = pd.Categorical(df['day'], categories=['Thur', 'Fri', 'Sat', 'Sun'], ordered=True)
+    return df.sort_values('day')
+
+@pytest.fixture(scope='module')
+def europe():
+    return pd.read_csv('./data/All_Europe_2023.csv')
+
+@pytest.fixture(scope='module')
+def life_expectancy():
+    return pd.read_csv('./data/Life_Expectancy_Europe_2023.csv', low_memory=False)
+
+@pytest.fixture(scope='module')
+def wind():
+    rng = np.random.default_rng(1)
+    return pd.DataFrame({'direction': np.linspace(0, 360, 24), 'speed': rng.uniform(5, 10, 24)})
+
+@pytest.fixture(scope='module')
+def temperature():
+    hours = np.arange(0, 24, 1)
+    return pd.DataFrame({'hour': hours, 'temperature': 8 + 9 * (1 + np.sin((hours - 6) * np.pi / 12))})
+
+
+# Equivalence ---------------------------------------------------------
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_scatter_plot(tips, template, figure_json):
+    args = (tips, 'total_bill', 'tip', 'tip', 'total_bill', pc.sequential.Viridis, templates_dict[template], template)
+    assert_same_figure(cf.create_scatter_plot(*args), px_scatter_plot(*args), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_treemap(europe, template, figure_json):
+    args = (europe, [px.Constant('Europe'), 'European Union', 'Countries'], 'GDP per capita (US$)', 'Sex gap',
+            pc.sequential.Plasma, 2023, templates_dict[template], template)
+    assert_same_figure(cf.create_treemap(*args), px_treemap(*args), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_map(europe, template, figure_json):
+    args = (europe, 'iso_alpha3', 'GDP per capita (US$)', pc.sequential.Viridis, templates_dict[template])
+    assert_same_figure(cf.create_map(*args), px_map(*args), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_map_with_avg_values(life_expectancy, template, figure_json):
+    args = (life_expectancy, 'iso_alpha3', 'All', pc.diverging.RdBu, templates_dict[template], template,
+            life_expectancy['All'].mean(), 'Life expectancy', [75, 80, 85])
+    assert_same_figure(cf.create_map_with_avg_values(*args), px_map_with_avg_values(*args), figure_json)
+
+@pytest.mark.parametrize('colors', [pc.qualitative.Bold, pc.qualitative.Plotly])
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_pie_chart(tips, template, colors, figure_json):
+    args = (tips, 'tip', 'day', colors, templates_dict[template], template)
+    assert_same_figure(cf.create_pie_chart(*args), px_pie_chart(*args), figure_json)
+
+@pytest.mark.parametrize('colors', [pc.qualitative.Bold, pc.qualitative.Set1[:3]])
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_scatter_plot_with_colorbar(sorted_tips, template, colors, figure_json):
+    args = (sorted_tips, 'total_bill', 'tip', 'day', 'tip', colors, templates_dict[template], template)
+    assert_same_figure(cf.create_scatter_plot_with_colorbar(*args), px_scatter_plot_with_colorbar(*args), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_bar_polar_wind(wind, template, figure_json):
+    args = (wind, 'speed', 'direction', pc.cyclical.IceFire, template, templates_dict[template])
+    assert_same_figure(cf.create_bar_polar_wind(*args), px_bar_polar_wind(*args), figure_json)
+
+@pytest.mark.parametrize('template', TEMPLATES)
+def test_scatter_temp(temperature, template, figure_json):
+    args = (temperature, pc.cyclical.Twilight, template, templates_dict[template])
+    assert_same_figure(cf.create_scatter_temp(*args), px_scatter_temp(*args), figure_json)
@@ -0,0 +1,88 @@
+import struct
+import zlib
+import numpy as np
+import plotly.colors as pc
+import pytest
+import palette_catalog
+from raster import (encode_png, decode_png, png_data_uri, colorize, interpolate_lut, named_lut, palette_lut,
+                    PNG_DATA_PREFIX, LUT_SIZE)
+
+
+# PNG encoding --------------------------------------------------------
+def png_chunks(data):
+    chunks, position = [], 8
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position+4])
+        tag, body = data[position+4:position+8], data[position+8:position+8+length]
+        crc, = struct.unpack('>I', data[position+8+length:position+12+length])
+        chunks.append((tag, body, crc))
+        position += length + 12
+    return chunks
+
+def test_png_is_valid_and_round_trips():
+    rgba = np.random.default_rng(0).integers(0, 256, size=(17, 23, 4), dtype=np.uint8)
+    data = encode_png(rgba)
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks = png_chunks(data)
+    assert [tag for tag, _, _ in chunks] == [b'IHDR', b'IDAT', b'IEND']
+    assert all(zlib.crc32(tag + body) == crc for tag, body, crc in chunks)
+    assert struct.unpack('>IIBBBBB', chunks[0][1]) == (23, 17, 8, 6, 0, 0, 0)
+    # Every row is its filter byte followed by the row pixels
+    assert len(zlib.decompress(chunks[1][1])) == 17 * (23*4 + 1)
+    np.testing.assert_array_equal(decode_png(data), rgba)
+
+def test_png_data_uri():
+    rgba = np.zeros((2, 3, 4), dtype=np.uint8)
+    assert png_data_uri(rgba).startswith(PNG_DATA_PREFIX)
+
+def test_decode_png_rejects_other_files():
+    with pytest.raises(ValueError):
+        decode_png(b'GIF89a' + bytes(20))
+
+
+# Colors of the pixels ------------------------------------------------
+def test_colorize_makes_missing_values_transparent():
+    lut = interpolate_lut(['#000000', '#ffffff'])
+    z = np.array([[0, 5, np.nan], [10, np.nan, 20]])
+    rgba = colorize(z, lut, 0, 10)
+    np.testing.assert_array_equal(rgba[..., 3], [[255, 255, 0], [255, 0, 255]])
+    assert rgba[0, 0, :3].tolist() == [0, 0, 0]
+    # Values beyond the range take the colors at its ends
+    assert rgba[1, 0, :3].tolist() == rgba[1, 2, :3].tolist() == [255, 255, 255]
+
+def test_colorize_constant_grid():
+    rgba = colorize(np.full((2, 2), 3.0), interpolate_lut(['#000000', '#ffffff']), 3, 3)
+    assert (rgba[..., :3] == 0).all() and (rgba[..., 3] == 255).all()
+
+
+# Palette lookup tables -----------------------------------------------
+def test_palette_lut_of_named_and_reversed_palettes():
+    viridis = palette_lut('Viridis')
+    assert viridis.shape == (LUT_SIZE, 3) and viridis.dtype == np.uint8
+    np.testing.assert_array_equal(viridis, interpolate_lut(pc.sequential.Viridis))
+    np.testing.assert_array_equal(palette_lut('viridis'), viridis)
+    np.testing.assert_array_equal(palette_lut('Viridis_r'), viridis[::-1])
+    np.testing.assert_array_equal(palette_lut(pc.sequential.Viridis), viridis)
+    np.testing.assert_array_equal(palette_lut(['#000000', '#ffffff'])[[0, -1]], [[0, 0, 0], [255, 255, 255]])
+
+def test_palette_lut_of_other_palettes():
+    # Qualitative palettes come from the catalog, 'jet' from the named colorscales of plotly
+    np.testing.assert_array_equal(palette_lut('Bold'), interpolate_lut(pc.qualitative.Bold))
+    np.testing.assert_array_equal(palette_lut('Bold_r'), interpolate_lut(pc.qualitative.Bold)[::-1])
+    jet = pc.get_colorscale('jet')
+    np.testing.assert_array_equal(palette_lut('Jet'), interpolate_lut([color for _, color in jet],
+                                                                      stops=[stop for stop, _ in jet]))
+    with pytest.raises(KeyError):
+        palette_lut('not a palette')
+
+def test_palette_lut_of_external_palettes(monkeypatch):
+    rgb = np.array([[255, 0, 0], [0, 0, 255]], dtype=float)
+    catalog = {'sequential/RedBlue': {'name': 'RedBlue', 'rgb': rgb}}
+    monkeypatch.setattr(palette_catalog, 'get_palette_catalog', lambda: catalog)
+    named_lut.cache_clear()
+    try:
+        lut = palette_lut('redblue')
+        np.testing.assert_array_equal(lut, interpolate_lut(rgb))
+        np.testing.assert_array_equal(palette_lut('RedBlue_r'), lut[::-1])
+    finally:
+        named_lut.cache_clear()
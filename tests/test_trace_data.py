@@ -0,0 +1,35 @@
+import chart_functions as cf
+
+
+def test_second_call_skips_the_build_and_the_fingerprint(tips, monkeypatch):
+    calls = {'build': 0, 'fingerprint': 0}
+    fingerprint = cf.dataset_fingerprint
+
+    def counted_fingerprint(*datasets):
+        calls['fingerprint'] += 1
+        return fingerprint(*datasets)
+
+    def counted_pie_data(df, values, names):
+        calls['build'] += 1
+        return cf.pie_data(df, values, names)
+
+    monkeypatch.setattr(cf, 'dataset_fingerprint', counted_fingerprint)
+    monkeypatch.setattr(cf, '_trace_data_cache', type(cf._trace_data_cache)())
+    monkeypatch.setattr(cf, '_frame_fingerprints', type(cf._frame_fingerprints)())
+    first = cf.get_trace_data(counted_pie_data, tips, 'tip', 'day')
+    assert cf.get_trace_data(counted_pie_data, tips, 'tip', 'day') is first
+    assert calls == {'build': 1, 'fingerprint': 1}
+
+    # An equal copy is fingerprinted once and shares the entry; other content is built again
+    assert cf.get_trace_data(counted_pie_data, tips.copy(), 'tip', 'day') is first
+    changed = tips.copy()
+    changed.loc[0, 'tip'] += 1
+    assert cf.get_trace_data(counted_pie_data, changed, 'tip', 'day') is not first
+    assert calls == {'build': 2, 'fingerprint': 3}
+
+def test_trace_data_cache_is_bounded(tips, monkeypatch):
+    monkeypatch.setattr(cf, 'TRACE_DATA_ITEMS', 3)
+    monkeypatch.setattr(cf, '_trace_data_cache', type(cf._trace_data_cache)())
+    for names in ('day', 'sex', 'smoker', 'time', 'size'):
+        cf.get_trace_data(cf.pie_data, tips, 'tip', names)
+    assert len(cf._trace_data_cache) == 3